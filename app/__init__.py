@@ -4,7 +4,6 @@ from flask_migrate import Migrate
 from flask_cors import CORS
 from .config import Config
 from flask_jwt_extended import JWTManager
-from flask import send_from_directory
 import os
 import pymysql
 import logging
@@ -50,13 +49,27 @@ def create_app(test_config=None):
 
     os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 
-    @app.route("/uploads/<path:filename>")
-    def uploaded_file(filename):
-        return send_from_directory(app.config["UPLOAD_FOLDER"], filename)
-
     from . import models
     from .routes import register_routes
+    from .commands import register_commands
+    from .utils.search import init_search
+    from .utils.cache import init_cache
+    from .utils.compression import init_compression
+    from .utils.storage import init_storage
+    from .utils.image_pipeline import init_image_pipeline
+    from .utils.uploads import init_uploads
+    from .utils.view_buffer import init_view_buffer
+    from .utils.view_dedupe import init_view_dedupe
 
     register_routes(app)
+    register_commands(app)
+    init_search(app)
+    init_cache(app)
+    init_compression(app)
+    init_storage(app)
+    init_image_pipeline(app)
+    init_uploads(app)
+    init_view_buffer(app)
+    init_view_dedupe(app)
 
     return app
@@ -0,0 +1,117 @@
+# app/commands.py
+"""Maintenance commands exposed through the ``flask`` CLI."""
+import click
+from flask.cli import AppGroup
+
+from app import db
+
+ratings_cli = AppGroup("ratings", help="صيانة ملخص التقييمات المخزن على الشقق.")
+search_cli = AppGroup("search", help="إدارة فهرس البحث في الشقق.")
+views_cli = AppGroup("views", help="ملخصات مشاهدات الشقق.")
+images_cli = AppGroup("images", help="رفع صور الشقق المعلقة وتنظيف الملفات غير المستخدمة.")
+
+
+@ratings_cli.command("rebuild")
+@click.option(
+    "--apartment-id",
+    "apartment_ids",
+    multiple=True,
+    type=int,
+    help="Only rebuild these apartments (repeatable). Default: all.",
+)
+def rebuild_ratings(apartment_ids):
+    """Recompute rating_sum / rating_count / histogram from the reviews."""
+    from app.utils.ratings import rebuild_rating_aggregates
+
+    updated = rebuild_rating_aggregates(apartment_ids or None)
+    db.session.commit()
+    click.echo(f"Rebuilt rating aggregates for {updated} apartment(s).")
+
+
+@search_cli.command("reindex")
+def reindex_search():
+    """Rebuild the apartment search index from the database."""
+    from app.utils.search import reindex_all
+
+    count = reindex_all()
+    db.session.commit()
+    click.echo(f"Indexed {count} apartment(s).")
+
+
+@images_cli.command("process")
+@click.option("--retry-failed", is_flag=True, help="Also retry failed uploads.")
+@click.option("--limit", type=int, default=None, help="At most this many images.")
+def process_images(retry_failed, limit):
+    """Upload the images still pending (e.g. after a restart)."""
+    from app.models.image import Image
+    from app.utils.image_pipeline import process_pending
+
+    statuses = (Image.PENDING, Image.FAILED) if retry_failed else (Image.PENDING,)
+    count = process_pending(statuses, limit=limit)
+    click.echo(f"Processed {count} image(s).")
+
+
+@images_cli.command("gc")
+def collect_image_garbage():
+    """Recount image blob references and delete unused blobs and files."""
+    from app.utils.image_blobs import collect_garbage
+
+    count = collect_garbage()
+    click.echo(f"Deleted {count} unused image blob(s).")
+
+
+@views_cli.command("rollup")
+@click.option(
+    "--since",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    default=None,
+    help="First day to rebuild (YYYY-MM-DD). Default: all days.",
+)
+@click.option(
+    "--apartment-id",
+    "apartment_ids",
+    multiple=True,
+    type=int,
+    help="Only rebuild these apartments (repeatable). Default: all.",
+)
+def rollup_views(since, apartment_ids):
+    """Recompute the daily view rollups from the raw views."""
+    from app.utils.view_rollups import rebuild_daily_views
+
+    count = rebuild_daily_views(since.date() if since else None, apartment_ids or None)
+    db.session.commit()
+    click.echo(f"Rebuilt {count} daily view rollup(s).")
+
+
+@views_cli.command("compact")
+@click.option(
+    "--older-than",
+    "retention_days",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Keep this many days of raw views. Default: VIEW_RETENTION_DAYS.",
+)
+@click.option("--batch-size", type=int, default=None, help="Rows per delete. Default: VIEW_COMPACT_BATCH.")
+@click.option("--pause-ms", type=int, default=None, help="Pause between delete batches.")
+@click.option(
+    "--archive-dir",
+    default=None,
+    help="Append deleted rows to <dir>/apartment_views-<day>.jsonl.gz. Default: VIEW_ARCHIVE_DIR.",
+)
+@click.option("--dry-run", is_flag=True, help="Only report what would be compacted.")
+def compact_views_command(retention_days, batch_size, pause_ms, archive_dir, dry_run):
+    """Fold raw views older than the retention window into the rollups and delete them."""
+    from app.utils.view_retention import compact_views
+
+    result = compact_views(retention_days, batch_size, archive_dir, pause_ms, dry_run=dry_run)
+    for day in result["days"]:
+        click.echo(f"{day['day']}: {day['deleted']} view(s)")
+    verb = "Would compact" if dry_run else "Compacted"
+    click.echo(f"{verb} {len(result['days'])} day(s) before {result['cutoff']}.")
+
+
+def register_commands(app):
+    app.cli.add_command(ratings_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(images_cli)
+    app.cli.add_command(views_cli)
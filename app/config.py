@@ -41,6 +41,103 @@ class Config:
     UPLOAD_FOLDER = os.path.join(basedir, "uploads")
     ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
 
+    # حجم صفحات قوائم الشقق (cursor pagination)
+    APARTMENTS_PAGE_SIZE = int(os.getenv("APARTMENTS_PAGE_SIZE", "20"))
+    APARTMENTS_MAX_PAGE_SIZE = int(os.getenv("APARTMENTS_MAX_PAGE_SIZE", "100"))
+    # الحد الأقصى للصفوف في الطلبات غير المقسمة لصفحات
+    APARTMENTS_UNPAGINATED_LIMIT = int(os.getenv("APARTMENTS_UNPAGINATED_LIMIT", "500"))
+
+    # البحث: auto تختار fts5 مع SQLite و fulltext مع MySQL و memory لغير ذلك
+    SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+    SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "500"))
+    SEARCH_VERIFIED_BOOST = float(os.getenv("SEARCH_VERIFIED_BOOST", "0.2"))
+    SEARCH_RATING_BOOST = float(os.getenv("SEARCH_RATING_BOOST", "0.3"))
+
+    # استعلامات الخريطة (nearby / in-bounds)
+    GEO_DEFAULT_RADIUS_KM = float(os.getenv("GEO_DEFAULT_RADIUS_KM", "2"))
+    GEO_MAX_RADIUS_KM = float(os.getenv("GEO_MAX_RADIUS_KM", "50"))
+    GEO_MAX_CELLS = int(os.getenv("GEO_MAX_CELLS", "16"))
+
+    # كاش الاستجابات العامة: local (LRU داخل العملية) أو shared أو redis
+    RESPONSE_CACHE_ENABLED = (
+        os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    )
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "local")
+    CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    CACHE_DEFAULT_TTL = int(os.getenv("CACHE_DEFAULT_TTL", "60"))
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+
+    # ضغط الاستجابات (gzip دائماً، و brotli لو المكتبة متثبتة)
+    COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+    COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+
+    # عدد الصفوف في كل دفعة عند تصدير ?stream= من لوحة الأدمن
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+
+    # استيراد الشقق بالجملة (CSV / JSON Lines)
+    IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+    IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "50000"))
+    IMPORT_MAX_REPORTED_ERRORS = int(os.getenv("IMPORT_MAX_REPORTED_ERRORS", "100"))
+    # نقل الصور المستوردة إلى التخزين الخاص بنا في الخلفية بعد الـ commit
+    IMPORT_REHOST_IMAGES = os.getenv("IMPORT_REHOST_IMAGES", "false").lower() == "true"
+
+    # تخزين الصور: cloudinary أو local (ملفات UPLOAD_FOLDER عبر /uploads)
+    # و auto تختار cloudinary لو CLOUDINARY_CLOUD_NAME موجود
+    IMAGE_STORAGE = os.getenv("IMAGE_STORAGE", "auto")
+    LOCAL_STORAGE_BASE_URL = os.getenv("LOCAL_STORAGE_BASE_URL", "/uploads")
+    # رفع الصور في الخلفية: thread (مجموعة عمال) أو sync (بعد الـ commit مباشرة)
+    IMAGE_PIPELINE_MODE = os.getenv("IMAGE_PIPELINE_MODE", "thread")
+    IMAGE_SPOOL_FOLDER = os.getenv("IMAGE_SPOOL_FOLDER", os.path.join(basedir, "spool"))
+    IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "4"))
+    IMAGE_UPLOAD_RETRIES = int(os.getenv("IMAGE_UPLOAD_RETRIES", "3"))
+    IMAGE_RETRY_BACKOFF = float(os.getenv("IMAGE_RETRY_BACKOFF", "0.5"))
+    # معالجة الصور عند الرفع (Pillow): نسخ بعرض ثابت بدون EXIF
+    IMAGE_VARIANT_WIDTHS = [
+        int(width) for width in os.getenv("IMAGE_VARIANT_WIDTHS", "320,640,1280").split(",")
+    ]
+    IMAGE_VARIANT_FORMATS = os.getenv("IMAGE_VARIANT_FORMATS", "webp,jpeg").split(",")
+    IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "2048"))
+    IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "82"))
+    IMAGE_WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+    # نفس الصورة بترميز أو مقاس آخر (نفس الـ dHash) تستخدم الـ blob الموجود
+    IMAGE_PHASH_DEDUPE = os.getenv("IMAGE_PHASH_DEDUPE", "false").lower() == "true"
+    # تقديم /uploads: none (التطبيق) أو x-accel (nginx) أو x-sendfile (Apache)
+    UPLOADS_SENDFILE = os.getenv("UPLOADS_SENDFILE", "none")
+    UPLOADS_ACCEL_PREFIX = os.getenv("UPLOADS_ACCEL_PREFIX", "/protected-uploads")
+    UPLOADS_MAX_AGE = int(os.getenv("UPLOADS_MAX_AGE", "3600"))
+    # الملفات المسماة بالـ hash لا يتغير محتواها
+    UPLOADS_IMMUTABLE_MAX_AGE = int(os.getenv("UPLOADS_IMMUTABLE_MAX_AGE", "31536000"))
+    # عدد الملفات التي تُرفع بالتوازي في /images/upload-image
+    IMAGE_UPLOAD_CONCURRENCY = int(os.getenv("IMAGE_UPLOAD_CONCURRENCY", "8"))
+
+    # عدد التقييمات مع تفاصيل الشقة (?include_reviews=true)
+    DETAIL_REVIEWS_PAGE_SIZE = int(os.getenv("DETAIL_REVIEWS_PAGE_SIZE", "5"))
+
+    # تسجيل المشاهدات: thread (buffer يُكتب على دفعات في الخلفية) أو sync (في نفس الطلب)
+    VIEW_BUFFER_MODE = os.getenv("VIEW_BUFFER_MODE", "thread")
+    VIEW_FLUSH_BATCH = int(os.getenv("VIEW_FLUSH_BATCH", "500"))
+    VIEW_FLUSH_INTERVAL_MS = int(os.getenv("VIEW_FLUSH_INTERVAL_MS", "1000"))
+    VIEW_BUFFER_MAX_EVENTS = int(os.getenv("VIEW_BUFFER_MAX_EVENTS", "50000"))
+    # ملف append-only للمشاهدات التي لم تُكتب بعد (فارغ = بدون)، ملف لكل process
+    VIEW_SPOOL_PATH = os.getenv("VIEW_SPOOL_PATH", "")
+    # عدد ربطات uuid -> id المحفوظة في الذاكرة لتسجيل المشاهدات
+    VIEW_ID_CACHE_SIZE = int(os.getenv("VIEW_ID_CACHE_SIZE", "10000"))
+    # منع تكرار المشاهدة لنفس الزائر (مستخدم أو IP) بدون قاعدة البيانات: local أو shared أو redis
+    VIEW_DEDUPE_BACKEND = os.getenv("VIEW_DEDUPE_BACKEND", "local")
+    VIEW_DEDUPE_REDIS_URL = os.getenv("VIEW_DEDUPE_REDIS_URL", CACHE_REDIS_URL)
+    VIEW_DEDUPE_TTL = int(os.getenv("VIEW_DEDUPE_TTL", "360"))
+    # 0 = بدون انتهاء: المستخدم المسجل تُحسب مشاهدته مرة واحدة (نفس القاعدة القديمة)
+    VIEW_DEDUPE_USER_TTL = int(os.getenv("VIEW_DEDUPE_USER_TTL", "0"))
+    VIEW_DEDUPE_MAX_ENTRIES = int(os.getenv("VIEW_DEDUPE_MAX_ENTRIES", "100000"))
+    # المشاهدات الخام الأقدم من كده تُجمع في الملخصات وتُحذف (flask views compact)
+    VIEW_RETENTION_DAYS = int(os.getenv("VIEW_RETENTION_DAYS", "90"))
+    VIEW_COMPACT_BATCH = int(os.getenv("VIEW_COMPACT_BATCH", "5000"))
+    VIEW_COMPACT_PAUSE_MS = int(os.getenv("VIEW_COMPACT_PAUSE_MS", "0"))
+    # مجلد لأرشفة المشاهدات المحذوفة (jsonl.gz لكل يوم)، فارغ = بدون أرشيف
+    VIEW_ARCHIVE_DIR = os.getenv("VIEW_ARCHIVE_DIR", "")
+
 
 # ضبط cloudinary باستخدام متغيرات البيئة
 cloudinary.config(
@@ -2,6 +2,13 @@ from .user import User
 from .apartment import Apartment
 from .review import Review
 from .image import Image  # ✅ لازم تستورد ده قبل استخدامه
+from .image_blob import ImageBlob
+from .apartment_view import ApartmentView
+from .apartment_view_daily import (
+    ApartmentViewCompaction,
+    ApartmentViewDaily,
+    ApartmentViewTotal,
+)
 from .neighborhood import Neighborhood
 from .favorite import Favorite
 from .messenger import Conversation, Message
@@ -16,6 +23,11 @@ __all__ = [
     "User",
     "Apartment",
     "Image",
+    "ImageBlob",
+    "ApartmentView",
+    "ApartmentViewDaily",
+    "ApartmentViewTotal",
+    "ApartmentViewCompaction",
     "Review",
     "Conversation",
     "Message",
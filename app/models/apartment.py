@@ -1,11 +1,51 @@
-from flask import request
 from .. import db
+from ..utils.fields import build_dict, wants
+from ..utils.geo import encode_geohash
+from .image import Image
+from .neighborhood import Neighborhood
+from .review import Review
+from .user import User
 import uuid
 import os
 from datetime import datetime
+from sqlalchemy.orm import object_session
+
+
+# المميزات: (العمود، الاسم المعروض) بنفس ترتيب قائمة features في to_dict.
+# ترتيب العنصر هو رقم الـ bit الخاص به في features_mask، فلا تغيّر الترتيب.
+FEATURE_FLAGS = (
+    ("has_wifi", "واي فاي"),
+    ("has_ac", "تكييف"),
+    ("has_balcony", "بلكونة"),
+    ("has_elevator", "مصعد"),
+    ("has_washing_machine", "غسالة"),
+    ("has_oven", "بوتجاز/فرن"),
+    ("has_gas", "غاز طبيعي"),
+    ("near_transport", "قريب من المواصلات"),
+)
+FEATURE_BITS = {column: 1 << bit for bit, (column, _) in enumerate(FEATURE_FLAGS)}
+
+# جدول جاهز: mask -> قائمة أسماء المميزات (256 عنصر)
+FEATURE_LABELS_BY_MASK = tuple(
+    tuple(label for bit, (_, label) in enumerate(FEATURE_FLAGS) if mask >> bit & 1)
+    for mask in range(1 << len(FEATURE_FLAGS))
+)
+
+
+def features_mask_of(flags):
+    """Mask for a mapping/object of ``has_*`` booleans."""
+    get = flags.get if isinstance(flags, dict) else lambda key: getattr(flags, key)
+    return sum(bit for column, bit in FEATURE_BITS.items() if get(column))
 
 
 class Apartment(db.Model):
+    # فهرس ترتيب القوائم (created_at, id) للـ cursor pagination
+    __table_args__ = (
+        db.Index("ix_apartment_created_at_id", "created_at", "id"),
+        db.Index("ix_apartment_rating_avg_id", "rating_avg", "id"),
+        db.Index("ix_apartment_updated_at", "updated_at"),
+    )
+
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     uuid = db.Column(
         db.String(36), unique=True, nullable=False, default=lambda: str(uuid.uuid4())
@@ -22,6 +62,8 @@ class Apartment(db.Model):
     available_beds = db.Column(db.Integer, nullable=False)
     latitude = db.Column(db.Float, nullable=True)
     longitude = db.Column(db.Float, nullable=True)
+    # يُحسب تلقائياً من الإحداثيات (انظر sync_geohash) لاستعلامات الخريطة
+    geohash = db.Column(db.String(12), nullable=True, index=True)
 
     # نوع السكن (شقة كاملة، غرفة، استوديو، مشترك)
     residence_type = db.Column(db.String(50), nullable=False)
@@ -48,6 +90,10 @@ class Apartment(db.Model):
     has_oven = db.Column(db.Boolean, default=False)  # بوتجاز/فرن
     has_gas = db.Column(db.Boolean, default=False)  # غاز طبيعي
     near_transport = db.Column(db.Boolean, default=False)  # قريب من المواصلات
+    # نفس المميزات كـ bitmask (FEATURE_BITS)، يُحدَّث تلقائياً قبل كل حفظ
+    features_mask = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0", index=True
+    )
 
     # مدة الإيجار المفضلة
     # (ترم واحد، سنة دراسية، شهر، مرن)
@@ -59,6 +105,20 @@ class Apartment(db.Model):
     # تاريخ إضافة الشقة
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # يزيد مع كل تعديل على الشقة أو صورها أو تقييماتها (ETag / Last-Modified)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # --- ملخص التقييمات (يُحدَّث مع كل إضافة/تعديل/حذف تقييم، انظر app/utils/ratings.py) ---
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_avg = db.Column(db.Float, nullable=False, default=0.0, server_default="0")
+    rating_1_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_2_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_3_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_4_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_5_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
     # --- العلاقات ---
     owner_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     owner = db.relationship("User", back_populates="apartments")
@@ -78,75 +138,194 @@ class Apartment(db.Model):
         "Favorite", back_populates="apartment", lazy=True, cascade="all, delete-orphan"
     )
 
+    def sync_geohash(self):
+        """Normalize the coordinates (forms send strings) and recompute geohash."""
+        for attr in ("latitude", "longitude"):
+            value = getattr(self, attr)
+            if isinstance(value, str):
+                try:
+                    value = float(value) if value.strip() else None
+                except ValueError:
+                    value = None
+                setattr(self, attr, value)
+
+        if (
+            self.latitude is None
+            or self.longitude is None
+            or not -90 <= self.latitude <= 90
+            or not -180 <= self.longitude <= 180
+        ):
+            self.geohash = None
+        else:
+            self.geohash = encode_geohash(self.latitude, self.longitude)
+
+    @classmethod
+    def touch_values(cls):
+        """Column values that mark a row as changed, for bulk ``update()``
+        statements that bypass the ORM."""
+        return {"version": cls.version + 1, "updated_at": datetime.utcnow()}
+
+    @classmethod
+    def has_features(cls, mask):
+        """SQL predicate: the apartment has every feature in ``mask``."""
+        return cls.features_mask.op("&")(mask) == mask
+
     # --- الخصائص المحسوبة ---
     @property
     def review_count(self):
-        return len(self.reviews)
+        return self.rating_count or 0
 
     @property
     def average_rating(self):
-        if not self.reviews:
-            return 0.0
-        total = sum(r.rating for r in self.reviews if r.rating is not None)
-        count = len(self.reviews)
-        return round(total / count, 1) if count > 0 else 0.0
+        return round(self.rating_avg or 0.0, 1)
+
+    @property
+    def rating_histogram(self):
+        return {
+            star: getattr(self, f"rating_{star}_count") or 0 for star in range(1, 6)
+        }
 
     # --- دالة التحويل لقاموس ---
-    def to_dict(self, user_favorite_apartment_ids=None, include_all_images=False):
-        base_url = request.host_url.rstrip("/")
-
-        # قائمة المميزات
-        features = []
-        if self.has_wifi:
-            features.append("واي فاي")
-        if self.has_ac:
-            features.append("تكييف")
-        if self.has_balcony:
-            features.append("بلكونة")
-        if self.has_elevator:
-            features.append("مصعد")
-        if self.has_washing_machine:
-            features.append("غسالة")
-        if self.has_oven:
-            features.append("بوتجاز/فرن")
-        if self.has_gas:
-            features.append("غاز طبيعي")
-        if self.near_transport:
-            features.append("قريب من المواصلات")
-
-        data = {
-            "id": self.id,
-            "uuid": self.uuid,
-            "title": self.title,
-            "description": self.description,
-            "address": self.address,
-            "price": self.price,
-            "bedrooms": self.rooms,
-            "bathrooms": self.bathrooms,
-            "kitchens": self.kitchens,
-            "totalBeds": self.total_beds,
-            "availableBeds": self.available_beds,
-            "residenceType": self.residence_type,
-            "whatsappNumber": self.whatsapp_number,
-            "isVerified": self.is_verified,
-            "ownerName": self.owner.full_name if self.owner else "مالك غير معروف",
-            "neighborhood": (
+    # المفاتيح المتاحة لـ ?fields= (images مع include_all_images و main_image بدونه)
+    DICT_FIELDS = (
+        "id", "uuid", "title", "description", "address", "price", "bedrooms",
+        "bathrooms", "kitchens", "totalBeds", "availableBeds", "residenceType",
+        "whatsappNumber", "isVerified", "ownerName", "neighborhood", "area",
+        "preferred_tenant_type", "floorNumber", "features", "createdAt", "rating",
+        "reviewCount", "isFavorite", "images", "main_image", "main_image_set",
+    )
+
+    @classmethod
+    def load_options(cls, fields=None):
+        """Eager-loading options for ``to_dict(fields=...)``: relationships
+        behind skipped fields are not loaded at all."""
+        options = []
+        if wants(fields, "ownerName"):
+            options.append(db.joinedload(cls.owner))
+        if wants(fields, "neighborhood"):
+            options.append(db.joinedload(cls.neighborhood))
+        if wants(fields, "images", "main_image"):
+            options.append(db.selectinload(cls.images))
+        return options
+
+    @property
+    def ready_images(self):
+        """Images whose upload finished, in display order."""
+        return [img for img in (self.images or []) if img.is_ready]
+
+    def to_dict(
+        self,
+        user_favorite_apartment_ids=None,
+        include_all_images=False,
+        fields=None,
+        image_urls=None,
+        image_sets=None,
+    ):
+        """``image_urls`` (and ``image_sets``, their
+        ``Image.responsive_dict``) replace ``self.images`` when the caller
+        already loaded them (see ``app.schemas.apartment_detail``)."""
+
+        def images():
+            if image_urls is not None:
+                return image_urls
+            return [img.url for img in self.ready_images]
+
+        builders = {
+            "id": lambda: self.id,
+            "uuid": lambda: self.uuid,
+            "title": lambda: self.title,
+            "description": lambda: self.description,
+            "address": lambda: self.address,
+            "price": lambda: self.price,
+            "bedrooms": lambda: self.rooms,
+            "bathrooms": lambda: self.bathrooms,
+            "kitchens": lambda: self.kitchens,
+            "totalBeds": lambda: self.total_beds,
+            "availableBeds": lambda: self.available_beds,
+            "residenceType": lambda: self.residence_type,
+            "whatsappNumber": lambda: self.whatsapp_number,
+            "isVerified": lambda: self.is_verified,
+            "ownerName": lambda: self.owner.full_name if self.owner else "مالك غير معروف",
+            "neighborhood": lambda: (
                 self.neighborhood.name if self.neighborhood else "منطقة غير محددة"
             ),
-            "area": self.area,
-            "preferred_tenant_type": self.preferred_tenant_type,
-            "floorNumber": self.floor_number,
-            "features": features,
-            "createdAt": self.created_at.isoformat() if self.created_at else None,
-            "rating": self.average_rating,
-            "reviewCount": self.review_count,
-            "isFavorite": self.id in (user_favorite_apartment_ids or []),
+            "area": lambda: self.area,
+            "preferred_tenant_type": lambda: self.preferred_tenant_type,
+            "floorNumber": lambda: self.floor_number,
+            # قائمة المميزات
+            "features": lambda: list(FEATURE_LABELS_BY_MASK[self.features_mask or 0]),
+            "createdAt": lambda: self.created_at.isoformat() if self.created_at else None,
+            "rating": lambda: self.average_rating,
+            "reviewCount": lambda: self.review_count,
+            # يُفضّل تمرير set لأن الدالة تُستدعى لكل شقة في القائمة
+            "isFavorite": lambda: self.id in (user_favorite_apartment_ids or ()),
         }
 
+        def main_image_set():
+            if image_sets is not None:
+                return next(iter(image_sets), None)
+            first = next(iter(self.ready_images), None)
+            return Image.responsive_dict(first) if first is not None else None
+
         if include_all_images:
-            data["images"] = [img.url for img in (self.images or [])]
+            builders["images"] = images
         else:
-            first_image = self.images[0] if self.images else None
-            data["main_image"] = first_image.url if first_image else None
+            builders["main_image"] = lambda: next(iter(images()), None)
+            builders["main_image_set"] = main_image_set
+
+        return build_dict(builders, fields)
+
+
+@db.event.listens_for(Apartment, "before_insert")
+@db.event.listens_for(Apartment, "before_update")
+def _apartment_before_write(mapper, connection, target):
+    target.sync_geohash()
+    target.features_mask = features_mask_of(target)
+
+
+@db.event.listens_for(Apartment, "before_update")
+def _apartment_bump_version(mapper, connection, target):
+    if object_session(target).is_modified(target, include_collections=False):
+        # تعبير SQL وليس قيمة من الذاكرة، حتى لا نفقد زيادات الـ bulk updates
+        for key, value in Apartment.touch_values().items():
+            setattr(target, key, value)
+
+
+def _touch_apartments(connection, condition):
+    connection.execute(
+        db.update(Apartment.__table__)
+        .where(condition)
+        .values(
+            version=Apartment.__table__.c.version + 1, updated_at=datetime.utcnow()
+        )
+    )
+
+
+@db.event.listens_for(Image, "after_insert")
+@db.event.listens_for(Image, "after_update")
+@db.event.listens_for(Image, "after_delete")
+def _image_touch_apartment(mapper, connection, target):
+    _touch_apartments(connection, Apartment.__table__.c.id == target.apartment_id)
+
+
+@db.event.listens_for(Review, "after_insert")
+@db.event.listens_for(Review, "after_update")
+@db.event.listens_for(Review, "after_delete")
+def _review_touch_apartment(mapper, connection, target):
+    # أول صفحة تقييمات جزء من بيانات التفاصيل، حتى تعديل التعليق وحده
+    _touch_apartments(connection, Apartment.__table__.c.id == target.apartment_id)
+
+
+@db.event.listens_for(User, "after_update")
+def _owner_touch_apartments(mapper, connection, target):
+    # اسم ورقم المالك يظهران في بيانات الشقة
+    state = db.inspect(target)
+    if state.attrs.full_name.history.has_changes() or state.attrs.phone.history.has_changes():
+        _touch_apartments(connection, Apartment.__table__.c.owner_id == target.id)
+
 
-        return data
+@db.event.listens_for(Neighborhood, "after_update")
+def _neighborhood_touch_apartments(mapper, connection, target):
+    # اسم الحي جزء من بيانات كل شقة فيه، فيتغير الـ ETag بتاعها
+    if db.inspect(target).attrs.name.history.has_changes():
+        _touch_apartments(connection, Apartment.__table__.c.neighborhood_id == target.id)
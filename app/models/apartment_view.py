@@ -4,6 +4,12 @@ import datetime
 
 class ApartmentView(db.Model):
     __tablename__ = "apartment_views"
+    # مشاهدات شقة في فترة زمنية (الإحصائيات والتنظيف)
+    __table_args__ = (
+        db.Index("ix_apartment_views_apartment_id_created_at", "apartment_id", "created_at"),
+        # الأيام الأقدم من فترة الاحتفاظ (app.utils.view_retention)
+        db.Index("ix_apartment_views_created_at", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     apartment_id = db.Column(
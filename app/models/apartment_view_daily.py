@@ -0,0 +1,40 @@
+from app import db
+
+
+class ApartmentViewDaily(db.Model):
+    """Views of one apartment on one (UTC) day, kept up to date by the view
+    buffer (``app.utils.view_rollups``); dashboards read only these rows."""
+
+    __tablename__ = "apartment_view_daily"
+
+    apartment_id = db.Column(db.Integer, db.ForeignKey("apartment.id"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    total_views = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # زوار مختلفين في اليوم (مستخدم، أو IP للزائر غير المسجل): تقدير visitors_hll
+    unique_visitors = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # HyperLogLog لزوار اليوم، يُدمج مع أيام أخرى لأي فترة (app.utils.hyperloglog)
+    visitors_hll = db.Column(db.LargeBinary, nullable=True)
+
+
+class ApartmentViewTotal(db.Model):
+    """All-time views and unique visitors of one apartment."""
+
+    __tablename__ = "apartment_view_total"
+
+    apartment_id = db.Column(db.Integer, db.ForeignKey("apartment.id"), primary_key=True)
+    total_views = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    unique_visitors = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    visitors_hll = db.Column(db.LargeBinary, nullable=True)
+
+
+class ApartmentViewCompaction(db.Model):
+    """A day whose raw views were folded into the rollups and are being (or
+    were) deleted from ``apartment_views`` (``app.utils.view_retention``)."""
+
+    __tablename__ = "apartment_view_compaction"
+
+    day = db.Column(db.Date, primary_key=True)
+    raw_views = db.Column(db.Integer, nullable=False, default=0)
+    folded_at = db.Column(db.DateTime, nullable=False)
+    # فارغ = الحذف لم يكتمل (يكمل في التشغيل التالي)
+    finished_at = db.Column(db.DateTime, nullable=True)
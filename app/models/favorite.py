@@ -1,4 +1,5 @@
 from .. import db
+from .user import User
 
 
 class Favorite(db.Model):
@@ -10,6 +11,19 @@ class Favorite(db.Model):
         db.UniqueConstraint("user_id", "apartment_id", name="unique_favorite"),
     )
 
+    @classmethod
+    def flag_for(cls, apartment_id, viewer_id=None, viewer_uuid=None):
+        """SQL boolean: the viewer (by id or uuid) saved ``apartment_id``."""
+        if viewer_id is None and viewer_uuid is None:
+            return db.false()
+        if viewer_id is None:
+            viewer_id = (
+                db.select(User.id).where(User.uuid == viewer_uuid).scalar_subquery()
+            )
+        return db.exists().where(
+            cls.apartment_id == apartment_id, cls.user_id == viewer_id
+        )
+
     def to_dict(self):
         return {
             "id": self.id,
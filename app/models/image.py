@@ -3,11 +3,70 @@ from .. import db
 
 
 class Image(db.Model):
+    # أول صورة لكل شقة (main_image) تُقرأ بـ index range scan
+    __table_args__ = (db.Index("ix_image_apartment_id_id", "apartment_id", "id"),)
+
+    # حالة الرفع (app.utils.image_pipeline): الصور المعلقة لا تظهر في الـ API
+    PENDING = "pending"
+    READY = "ready"
+    FAILED = "failed"
+
     id = db.Column(db.Integer, primary_key=True)
-    url = db.Column(db.String(255), nullable=False)
+    # فارغ حتى ينتهي الرفع
+    url = db.Column(db.String(255), nullable=True)
+    status = db.Column(
+        db.String(16), nullable=False, default=READY, server_default=READY, index=True
+    )
+    # الملف المؤقت على القرص قبل الرفع
+    spool_path = db.Column(db.String(512), nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    last_error = db.Column(db.String(255), nullable=True)
+
+    # من app.utils.image_processing: المقاس ولون/blurhash للـ placeholder
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    color = db.Column(db.String(7), nullable=True)
+    blurhash = db.Column(db.String(64), nullable=True)
+    # {"webp": {"320": url, ...}, "jpeg": {...}}
+    variants = db.Column(db.JSON, nullable=True)
+
+    # الملف المخزن المشترك (app.models.image_blob)؛ فارغ للصور القديمة والمستوردة
+    blob_id = db.Column(db.Integer, db.ForeignKey("image_blob.id"), nullable=True, index=True)
 
     apartment_id = db.Column(db.Integer, db.ForeignKey("apartment.id"), nullable=False)
     apartment = db.relationship("Apartment", back_populates="images")
 
+    @property
+    def is_ready(self):
+        return self.status == self.READY and self.url is not None
+
+    # الأعمدة اللازمة لـ responsive_dict (يستخدمها الـ loaders اللي بتختار أعمدة فقط)
+    RESPONSIVE_COLUMNS = ("url", "width", "height", "color", "blurhash", "variants")
+
+    @staticmethod
+    def responsive_dict(row):
+        """What a client needs to lay out and pick a size for the image:
+        ``srcset`` is ``{format: "url 320w, url 640w"}`` for ``<source>``.
+        ``row`` is an ``Image`` or a row with its ``RESPONSIVE_COLUMNS``."""
+        return {
+            "url": row.url,
+            "width": row.width,
+            "height": row.height,
+            "color": row.color,
+            "blurhash": row.blurhash,
+            "srcset": {
+                fmt: ", ".join(
+                    f"{url} {width}w"
+                    for width, url in sorted(by_width.items(), key=lambda item: int(item[0]))
+                )
+                for fmt, by_width in (row.variants or {}).items()
+            },
+        }
+
     def to_dict(self):
-        return {"id": self.id, "url": self.url, "apartment_id": self.apartment_id}
+        return {
+            "id": self.id,
+            "apartment_id": self.apartment_id,
+            "status": self.status,
+            **self.responsive_dict(self),
+        }
@@ -0,0 +1,85 @@
+# app/models/image_blob.py
+from datetime import datetime
+
+from sqlalchemy.orm import object_session
+
+from .. import db
+from .image import Image
+
+
+class ImageBlob(db.Model):
+    """One stored upload, shared by every ``Image`` made from the same
+    bytes (see ``app.utils.image_blobs``)."""
+
+    __tablename__ = "image_blob"
+
+    id = db.Column(db.Integer, primary_key=True)
+    # SHA-256 للملف كما رُفع: نفس الملف = نفس الـ blob
+    sha256 = db.Column(db.String(64), nullable=False, unique=True)
+    # dHash (64 bit) لاكتشاف نفس الصورة بترميز أو مقاس مختلف
+    phash = db.Column(db.String(16), nullable=True, index=True)
+    size = db.Column(db.Integer, nullable=True)
+
+    # نفس أعمدة Image (تُنسخ إليها حتى لا تحتاج القوائم join)
+    url = db.Column(db.String(255), nullable=False)
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    color = db.Column(db.String(7), nullable=True)
+    blurhash = db.Column(db.String(64), nullable=True)
+    variants = db.Column(db.JSON, nullable=True)
+
+    # عدد صفوف Image التي تشير إليه؛ يُحذف هو وملفاته عند الصفر
+    ref_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    IMAGE_COLUMNS = ("url", "width", "height", "color", "blurhash", "variants")
+
+    def image_values(self):
+        """Column values for an ``Image`` that shows this blob."""
+        return {
+            "blob_id": self.id,
+            **{name: getattr(self, name) for name in self.IMAGE_COLUMNS},
+        }
+
+
+def _adjust_ref_count(connection, blob_id, delta):
+    table = ImageBlob.__table__
+    connection.execute(
+        db.update(table)
+        .where(table.c.id == blob_id)
+        .values(ref_count=table.c.ref_count + delta)
+    )
+
+
+def _release(target, blob_id):
+    # يُراجع بعد الـ flush (app.utils.image_blobs) ويُحذف لو لم يعد له مراجع
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("released_blobs", set()).add(blob_id)
+
+
+@db.event.listens_for(Image, "after_insert")
+def _image_blob_acquired(mapper, connection, target):
+    if target.blob_id is not None:
+        _adjust_ref_count(connection, target.blob_id, 1)
+
+
+@db.event.listens_for(Image, "after_delete")
+def _image_blob_released(mapper, connection, target):
+    if target.blob_id is not None:
+        _adjust_ref_count(connection, target.blob_id, -1)
+        _release(target, target.blob_id)
+
+
+@db.event.listens_for(Image, "after_update")
+def _image_blob_changed(mapper, connection, target):
+    history = db.inspect(target).attrs.blob_id.history
+    if not history.has_changes():
+        return
+    for old in history.deleted or ():
+        if old is not None:
+            _adjust_ref_count(connection, old, -1)
+            _release(target, old)
+    for new in history.added or ():
+        if new is not None:
+            _adjust_ref_count(connection, new, 1)
@@ -1,4 +1,5 @@
 from .. import db
+from ..utils.fields import build_dict, wants
 from datetime import datetime
 
 
@@ -15,13 +16,29 @@ class Review(db.Model):
     user = db.relationship("User", back_populates="reviews")
     apartment = db.relationship("Apartment", back_populates="reviews")
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "rating": self.rating,
-            "comment": self.comment,
-            "date": self.created_at.strftime("%Y-%m-%d") if self.created_at else None,
-            # نفترض أن لديك علاقة مع كاتب المراجعة (user)
-            "user": self.user.full_name if self.user else "مستخدم غير معروف",
-            "avatar": getattr(self.user, "avatar_url", None) if self.user else None,
-        }
+    # المفاتيح المتاحة لـ ?fields=
+    DICT_FIELDS = ("id", "rating", "comment", "date", "user", "avatar")
+
+    @classmethod
+    def load_options(cls, fields=None):
+        if wants(fields, "user", "avatar"):
+            return [db.joinedload(cls.user)]
+        return []
+
+    def to_dict(self, fields=None):
+        return build_dict(
+            {
+                "id": lambda: self.id,
+                "rating": lambda: self.rating,
+                "comment": lambda: self.comment,
+                "date": lambda: (
+                    self.created_at.strftime("%Y-%m-%d") if self.created_at else None
+                ),
+                # نفترض أن لديك علاقة مع كاتب المراجعة (user)
+                "user": lambda: self.user.full_name if self.user else "مستخدم غير معروف",
+                "avatar": lambda: (
+                    getattr(self.user, "avatar_url", None) if self.user else None
+                ),
+            },
+            fields,
+        )
@@ -7,6 +7,7 @@ favorites = db.relationship("Favorite", backref="user", lazy=True)
 from datetime import datetime
 import uuid
 from .. import db
+from ..utils.fields import build_dict, wants
 from werkzeug.security import generate_password_hash, check_password_hash
 
 
@@ -51,35 +52,73 @@ class User(db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "uuid": self.uuid,
-            "full_name": self.full_name,
-            "email": self.email,
-            "phone": self.phone,
-            # ✅ (التصحيح رقم 3) تحويل التاريخ إلى نص
-            "avatar": getattr(self, "avatar_url", None),
-            "joinDate": (
-                self.created_at.strftime("%Y-%m-%d") if self.created_at else None
-            ),
-            "propertiesCount": len(self.apartments),
-            "rating": getattr(self, "rating", 4.9),  # مثال
-            "responseTime": getattr(self, "response_time", "خلال ساعة"),  # مثال
-            "birth_date": self.birth_date.isoformat() if self.birth_date else None,
-            "gender": self.gender,
-            "role": self.role,
-            "academicYear": self.academic_year,
-            "college": self.college,
-            "university": self.university,
-            # الآن كل هذه الأسطر ستعمل بشكل صحيح
-            "favorites": [favorite.to_dict() for favorite in self.favorites],
-            "reviews": [review.to_dict() for review in self.reviews],
-            "apartments": [apartment.to_dict() for apartment in self.apartments],
-            # يمكنك إرسال العدد مباشرة لتسهيل الأمر على الـ Frontend
-            "favorites_count": len(self.favorites),
-            "reviews_count": len(self.reviews),
-            "apartments_count": len(self.apartments),
-            # سيتم استدعاء الخاصية is_admin التي عرفناها في الأعلى
-            "is_admin": self.is_admin,
-        }
+    # المفاتيح المتاحة لـ ?fields=
+    DICT_FIELDS = (
+        "id", "uuid", "full_name", "email", "phone", "avatar", "joinDate",
+        "propertiesCount", "rating", "responseTime", "birth_date", "gender", "role",
+        "academicYear", "college", "university", "favorites", "reviews",
+        "apartments", "favorites_count", "reviews_count", "apartments_count",
+        "is_admin",
+    )
+
+    @classmethod
+    def load_options(cls, fields=None):
+        """Eager-load only the collections the requested fields need."""
+        options = []
+        if wants(fields, "favorites", "favorites_count"):
+            options.append(db.selectinload(cls.favorites))
+        if wants(fields, "reviews", "reviews_count"):
+            options.append(db.selectinload(cls.reviews))
+        if wants(fields, "apartments"):
+            from .apartment import Apartment
+
+            # بيانات الشقق المتداخلة تحتاج الحي والصور أيضاً
+            options.append(
+                db.selectinload(cls.apartments).options(
+                    db.joinedload(Apartment.neighborhood),
+                    db.selectinload(Apartment.images),
+                )
+            )
+        elif wants(fields, "apartments_count", "propertiesCount"):
+            options.append(db.selectinload(cls.apartments))
+        return options
+
+    def to_dict(self, fields=None):
+        return build_dict(
+            {
+                "id": lambda: self.id,
+                "uuid": lambda: self.uuid,
+                "full_name": lambda: self.full_name,
+                "email": lambda: self.email,
+                "phone": lambda: self.phone,
+                # ✅ (التصحيح رقم 3) تحويل التاريخ إلى نص
+                "avatar": lambda: getattr(self, "avatar_url", None),
+                "joinDate": lambda: (
+                    self.created_at.strftime("%Y-%m-%d") if self.created_at else None
+                ),
+                "propertiesCount": lambda: len(self.apartments),
+                "rating": lambda: getattr(self, "rating", 4.9),  # مثال
+                "responseTime": lambda: getattr(self, "response_time", "خلال ساعة"),  # مثال
+                "birth_date": lambda: (
+                    self.birth_date.isoformat() if self.birth_date else None
+                ),
+                "gender": lambda: self.gender,
+                "role": lambda: self.role,
+                "academicYear": lambda: self.academic_year,
+                "college": lambda: self.college,
+                "university": lambda: self.university,
+                # الآن كل هذه الأسطر ستعمل بشكل صحيح
+                "favorites": lambda: [favorite.to_dict() for favorite in self.favorites],
+                "reviews": lambda: [review.to_dict() for review in self.reviews],
+                "apartments": lambda: [
+                    apartment.to_dict() for apartment in self.apartments
+                ],
+                # يمكنك إرسال العدد مباشرة لتسهيل الأمر على الـ Frontend
+                "favorites_count": lambda: len(self.favorites),
+                "reviews_count": lambda: len(self.reviews),
+                "apartments_count": lambda: len(self.apartments),
+                # سيتم استدعاء الخاصية is_admin التي عرفناها في الأعلى
+                "is_admin": lambda: self.is_admin,
+            },
+            fields,
+        )
@@ -1,6 +1,3 @@
-from flask import send_from_directory
-import os
-
 from .auth_routes import auth_bp
 from .apartment_routes import apartment_bp
 from .reviews_routes import review_bp
@@ -10,14 +7,17 @@ from .image_routes import image_bp
 from .neighborhood_routes import neighborhood_bp
 from .admin_routes import admin_bp
 from .views_routes import views_bp
+from .owner_routes import owner_views_bp
 from .messenger_routes import messenger_bp
 
 
 def register_static_routes(app):
+    from app.utils.uploads import serve_upload
 
-    @app.route("/uploads/<path:filename>")
-    def serve_uploaded_file(filename):
-        return send_from_directory(app.config["UPLOAD_FOLDER"], filename)
+    # المسار الوحيد لملفات UPLOAD_FOLDER (الكاش و Range و X-Accel في app/utils/uploads.py)
+    app.add_url_rule(
+        "/uploads/<path:filename>", "serve_uploaded_file", serve_upload, methods=["GET"]
+    )
 
 
 def register_routes(app):
@@ -45,6 +45,7 @@ def register_routes(app):
 
     # Views
     app.register_blueprint(views_bp)
+    app.register_blueprint(owner_views_bp)
 
     # Static uploads
     register_static_routes(app)
\ No newline at end of file
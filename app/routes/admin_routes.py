@@ -6,6 +6,14 @@ from ..models.review import Review
 from ..models.favorite import Favorite
 from ..models.neighborhood import Neighborhood
 from ..models.admin import Admin
+from ..utils.ratings import apply_rating_change, rebuild_rating_aggregates
+from ..utils.cache import get_response_cache
+from ..utils.view_buffer import forget_apartment, get_view_buffer
+from ..utils.view_dedupe import get_view_deduper
+from ..utils.fields import InvalidFields, invalid_fields_response, requested_fields
+from ..utils.export import export_format, export_response
+from ..utils.bulk_import import import_response
+from sqlalchemy.exc import SQLAlchemyError
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt, datetime, uuid
 from functools import wraps
@@ -121,18 +129,45 @@ def get_stats():
     )
 
 
+@admin_bp.route("/stats/cache", methods=["GET"])
+@admin_required
+def get_cache_stats():
+    cache = get_response_cache()
+    if cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **cache.stats()})
+
+
+@admin_bp.route("/stats/views", methods=["GET"])
+@admin_required
+def get_view_buffer_stats():
+    # أرقام هذا الـ process فقط (لكل worker buffer خاص به)
+    return jsonify({**get_view_buffer().stats(), "dedupe": get_view_deduper().stats()})
+
+
 # =========================
 # Users
 # =========================
 @admin_bp.route("/users", methods=["GET"])
 @admin_required
 def get_users():
-    query = User.query.order_by(User.created_at.desc())
+    try:
+        fields = requested_fields(User.DICT_FIELDS)
+    except InvalidFields as e:
+        return invalid_fields_response(e)
+
+    query = User.query.options(*User.load_options(fields)).order_by(
+        User.created_at.desc()
+    )
+    if export_format():
+        return export_response(
+            query, lambda u: u.to_dict(fields=fields), export_format(), "users"
+        )
     if wants_pagination():
         page, per_page = parse_pagination_args()
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
         return jsonify({
-            "items": [u.to_dict() for u in pagination.items],
+            "items": [u.to_dict(fields=fields) for u in pagination.items],
             "pagination": {
                 "page": page,
                 "per_page": per_page,
@@ -142,7 +177,7 @@ def get_users():
         })
 
     users = query.all()
-    return jsonify([u.to_dict() for u in users])
+    return jsonify([u.to_dict(fields=fields) for u in users])
 
 
 @admin_bp.route("/users/<string:user_uuid>", methods=["DELETE"])
@@ -151,7 +186,12 @@ def delete_user(user_uuid):
     user = User.query.filter_by(uuid=user_uuid).first()
     if not user:
         return jsonify({"error": "User not found"}), 404
+    # تقييمات المستخدم تُحذف معه، فنعيد حساب ملخص الشقق المتأثرة
+    reviewed_apartment_ids = {r.apartment_id for r in user.reviews}
     db.session.delete(user)
+    db.session.flush()
+    if reviewed_apartment_ids:
+        rebuild_rating_aggregates(reviewed_apartment_ids)
     db.session.commit()
     return jsonify({"message": "User deleted"})
 
@@ -162,12 +202,29 @@ def delete_user(user_uuid):
 @admin_bp.route("/apartments", methods=["GET"])
 @admin_required
 def get_apartments():
-    query = Apartment.query.order_by(Apartment.created_at.desc())
+    try:
+        fields = requested_fields(Apartment.DICT_FIELDS)
+    except InvalidFields as e:
+        return invalid_fields_response(e)
+
+    query = Apartment.query.options(*Apartment.load_options(fields)).order_by(
+        Apartment.created_at.desc()
+    )
+    if export_format():
+        return export_response(
+            query,
+            lambda a: a.to_dict(include_all_images=True, fields=fields),
+            export_format(),
+            "apartments",
+        )
     if wants_pagination():
         page, per_page = parse_pagination_args()
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
         return jsonify({
-            "items": [a.to_dict(include_all_images=True) for a in pagination.items],
+            "items": [
+                a.to_dict(include_all_images=True, fields=fields)
+                for a in pagination.items
+            ],
             "pagination": {
                 "page": page,
                 "per_page": per_page,
@@ -177,7 +234,17 @@ def get_apartments():
         })
 
     apartments = query.all()
-    return jsonify([a.to_dict(include_all_images=True) for a in apartments])
+    return jsonify([a.to_dict(include_all_images=True, fields=fields) for a in apartments])
+
+
+# استيراد بالجملة: owner_id في كل صف أو ?owner_id= للكل، و ?verified=true
+@admin_bp.route("/apartments/import", methods=["POST"])
+@admin_required
+def import_apartments():
+    return import_response(
+        default_owner_id=request.args.get("owner_id", type=int),
+        is_verified=request.args.get("verified", "false").lower() == "true",
+    )
 
 
 @admin_bp.route("/apartments/<string:apartment_uuid>", methods=["DELETE"])
@@ -188,7 +255,8 @@ def delete_apartment(apartment_uuid):
         if not apartment:
             return jsonify({"error": "Apartment not found"}), 404
 
-        # حذف الشقة مع كل العلاقات المربوطة عليها cascade
+        # المشاهدات وملخصاتها بدون cascade، والباقي cascade مع الشقة
+        forget_apartment(apartment)
         db.session.delete(apartment)
         db.session.commit()
 
@@ -204,12 +272,23 @@ def delete_apartment(apartment_uuid):
 @admin_bp.route("/reviews", methods=["GET"])
 @admin_required
 def get_reviews():
-    query = Review.query.order_by(Review.created_at.desc())
+    try:
+        fields = requested_fields(Review.DICT_FIELDS)
+    except InvalidFields as e:
+        return invalid_fields_response(e)
+
+    query = Review.query.options(*Review.load_options(fields)).order_by(
+        Review.created_at.desc()
+    )
+    if export_format():
+        return export_response(
+            query, lambda r: r.to_dict(fields=fields), export_format(), "reviews"
+        )
     if wants_pagination():
         page, per_page = parse_pagination_args()
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
         return jsonify({
-            "items": [r.to_dict() for r in pagination.items],
+            "items": [r.to_dict(fields=fields) for r in pagination.items],
             "pagination": {
                 "page": page,
                 "per_page": per_page,
@@ -219,7 +298,7 @@ def get_reviews():
         })
 
     reviews = query.all()
-    return jsonify([r.to_dict() for r in reviews])
+    return jsonify([r.to_dict(fields=fields) for r in reviews])
 
 
 @admin_bp.route("/reviews/<int:review_id>", methods=["DELETE"])
@@ -228,6 +307,7 @@ def delete_review(review_id):
     review = Review.query.get(review_id)
     if not review:
         return jsonify({"error": "Review not found"}), 404
+    apply_rating_change(review.apartment_id, removed=review.rating)
     db.session.delete(review)
     db.session.commit()
     return jsonify({"message": "Review deleted"})
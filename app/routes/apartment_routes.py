@@ -1,17 +1,52 @@
 import os
+from urllib.parse import urlsplit
 
-import cloudinary.uploader
 from flask import Blueprint, current_app, g, jsonify, request
 from flask_jwt_extended import get_jwt_identity, jwt_required
+from werkzeug.security import safe_join
 
 from app import db
 from app.models.apartment import Apartment
-from app.models.apartment_view import ApartmentView
 from app.models.favorite import Favorite
 from app.models.image import Image
 from app.models.review import Review
 from app.models.user import User
-from sqlalchemy import func
+from app.utils.auth_utils import login_required, optional_viewer
+from app.utils.bulk_import import import_response
+from app.utils.cache import DETAILS, LISTINGS, apartment_namespace, cached_response
+from app.utils.conditional import apartment_state, conditional_get, listing_state
+from app.utils.ratings import apply_rating_change
+from app.utils.pagination import (
+    InvalidCursor,
+    keyset_page,
+    parse_cursor_args,
+    ranked_page,
+    wants_total,
+)
+from app.utils.facets import apply_apartment_filters, compute_facets
+from app.utils.image_pipeline import discard_spool, enqueue_images, spool_upload
+from app.utils.view_buffer import forget_apartment
+from app.utils.view_rollups import total_views
+from app.utils.geo import cover_bbox, haversine_km, parse_bbox, radius_bbox
+from app.utils.search import rank_apartments
+from app.schemas.apartment_detail import (
+    DETAIL_FIELDS,
+    load_apartment_detail,
+    load_apartment_details,
+)
+from app.schemas.apartment_list import (
+    LIST_FIELDS,
+    project_listing,
+    serialize_apartment_ids,
+    serialize_rows,
+)
+from app.utils.fields import (
+    InvalidFields,
+    invalid_fields_response,
+    requested_fields,
+    wants,
+)
+from sqlalchemy import or_
 from sqlalchemy.orm import joinedload, selectinload
 
 apartment_bp = Blueprint("apartment_bp", __name__)
@@ -38,6 +73,127 @@ def wants_pagination() -> bool:
     return request.args.get("paginate", "false").lower() in ("1", "true", "yes")
 
 
+def wants_cursor_pagination() -> bool:
+    if request.args.get("cursor"):
+        return True
+    mode = request.args.get("paginate", "false").lower()
+    # ?paginate=true بدون page يستخدم الـ cursor، و page= يبقى للعملاء القدامى
+    return mode == "cursor" or (wants_pagination() and "page" not in request.args)
+
+
+# ترتيبات القوائم المتاحة عبر ?sort=، و id دائماً لكسر التعادل
+LISTING_SORTS = {
+    "newest": (
+        [(Apartment.created_at, True), (Apartment.id, True)],
+        lambda apartment: (apartment.created_at, apartment.id),
+    ),
+    "rating": (
+        [(Apartment.rating_avg, True), (Apartment.id, True)],
+        lambda apartment: (apartment.rating_avg, apartment.id),
+    ),
+}
+
+
+def listing_sort():
+    sort = request.args.get("sort", "newest")
+    return (sort, *LISTING_SORTS[sort]) if sort in LISTING_SORTS else None
+
+
+def detail_reviews_limit():
+    """First page of reviews with the details (``?include_reviews=true``)."""
+    if str_to_bool(request.args.get("include_reviews")):
+        return current_app.config["DETAIL_REVIEWS_PAGE_SIZE"]
+    return 0
+
+
+def listing_response(query, serialize, extra=None):
+    """Serve a filtered apartment query as a cursor page, a legacy offset
+    page (``?paginate=true&page=N``) or a capped plain list.
+
+    ``query`` carries filters only; ordering and the column projection
+    (see ``app.schemas.apartment_list``) are added here so the optional
+    total is a bare ``COUNT(*)``. ``serialize(rows, fields)`` receives the
+    projected rows and the ``?fields=`` selection. ``extra`` keys are merged
+    into the envelope and force one (cursor mode) when the client did not
+    ask for pagination.
+    """
+    config = current_app.config
+    try:
+        fields = requested_fields(LIST_FIELDS)
+    except InvalidFields as e:
+        return invalid_fields_response(e)
+    loaded = project_listing(query, fields)
+
+    sort = listing_sort()
+    if sort is None:
+        return jsonify({"error": "Invalid sort"}), 400
+    sort_name, order_by, key = sort
+
+    extra = extra or {}
+    if wants_cursor_pagination() or (extra and not wants_pagination()):
+        cursor, limit = parse_cursor_args(
+            config["APARTMENTS_PAGE_SIZE"], config["APARTMENTS_MAX_PAGE_SIZE"]
+        )
+        try:
+            apartments, next_cursor = keyset_page(
+                loaded, order_by, key, cursor=cursor, limit=limit, tag=sort_name
+            )
+        except InvalidCursor:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+        pagination = {"per_page": limit, "has_more": next_cursor is not None}
+        if wants_total():
+            pagination["total"] = query.order_by(None).count()
+        return (
+            jsonify(
+                {
+                    "items": serialize(apartments, fields),
+                    "next_cursor": next_cursor,
+                    "pagination": pagination,
+                    **extra,
+                }
+            ),
+            200,
+        )
+
+    if wants_pagination():
+        page, per_page = parse_pagination_args(
+            default_per_page=config["APARTMENTS_PAGE_SIZE"],
+            max_per_page=config["APARTMENTS_MAX_PAGE_SIZE"],
+        )
+        pagination = loaded.order_by(
+            *[col.desc() if descending else col.asc() for col, descending in order_by]
+        ).paginate(page=page, per_page=per_page, error_out=False)
+        return (
+            jsonify(
+                {
+                    "items": serialize(pagination.items, fields),
+                    "pagination": {
+                        "page": page,
+                        "per_page": per_page,
+                        "total": pagination.total,
+                        "pages": pagination.pages,
+                    },
+                    **extra,
+                }
+            ),
+            200,
+        )
+
+    # بدون pagination: قائمة عادية لكن بحد أقصى، والباقي عن طريق X-Next-Cursor
+    apartments, next_cursor = keyset_page(
+        loaded,
+        order_by,
+        key,
+        limit=config["APARTMENTS_UNPAGINATED_LIMIT"],
+        tag=sort_name,
+    )
+    response = jsonify(serialize(apartments, fields))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response, 200
+
+
 @apartment_bp.route("/create", methods=["POST"])
 @jwt_required(locations=["cookies"])
 def create_apartment():
@@ -101,20 +257,22 @@ def create_apartment():
         )
 
         db.session.add(new_apartment)
-        db.session.flush()  # عشان نجيب ID قبل رفع الصور
-
-        # --- رفع الصور على Cloudinary ---
-        images = request.files.getlist("images")
-        for img_file in images:
-            upload_result = cloudinary.uploader.upload(
-                img_file, folder=f"apartments/{new_apartment.id}"
-            )
-            new_image = Image(
-                url=upload_result["secure_url"], apartment_id=new_apartment.id
+        db.session.flush()  # عشان نجيب ID قبل إضافة الصور
+
+        # --- الصور: تُحفظ مؤقتاً على القرص وتُرفع في الخلفية بعد الـ commit ---
+        pending_images = [
+            Image(
+                apartment_id=new_apartment.id,
+                status=Image.PENDING,
+                spool_path=spool_upload(img_file),
             )
-            db.session.add(new_image)
+            for img_file in request.files.getlist("images")
+            if img_file and img_file.filename
+        ]
+        db.session.add_all(pending_images)
 
         db.session.commit()  # هنا نعمل commit مرة واحدة بعد كل التعديلات
+        enqueue_images([image.id for image in pending_images])
 
         return (
             jsonify(
@@ -124,6 +282,7 @@ def create_apartment():
                     "title": new_apartment.title,
                     "latitude": new_apartment.latitude,
                     "longitude": new_apartment.longitude,
+                    "images_pending": len(pending_images),
                 }
             ),
             201,
@@ -135,58 +294,29 @@ def create_apartment():
         return jsonify({"error": "حدث خطأ غير متوقع في الخادم"}), 500
 
 
+# ✅ Bulk import (CSV / JSON Lines) into the current user's account
+@apartment_bp.route("/import", methods=["POST"])
+@login_required
+def import_apartments():
+    # توكن صالح لمستخدم محذوف: بدون مالك لا نقبل owner_id من الملف
+    if g.user_id is None:
+        return jsonify({"error": "User not found"}), 404
+    return import_response(owner_id=g.user_id, is_verified=False)
+
+
 @apartment_bp.route("/all_apartments", methods=["GET"])
 @apartment_bp.route("/", methods=["GET"])
+@optional_viewer
+@conditional_get(lambda: listing_state(Apartment.query))
+@cached_response(LISTINGS)
 def get_all_apartments():
     try:
-        user_id = getattr(g, "user_id", None)
-
-        favorite_apartment_ids = []
-        if user_id:
-            user_favorites = Favorite.query.filter_by(user_id=user_id).all()
-            favorite_apartment_ids = [fav.apartment_id for fav in user_favorites]
-
-        base_query = Apartment.query.options(
-            joinedload(Apartment.owner),
-            joinedload(Apartment.neighborhood),
-            selectinload(Apartment.images),
-            selectinload(Apartment.reviews),
-        ).order_by(Apartment.created_at.desc())
-
-        if wants_pagination():
-            page, per_page = parse_pagination_args(default_per_page=20, max_per_page=100)
-            pagination = base_query.paginate(page=page, per_page=per_page, error_out=False)
-            apartments_data = [
-                ap.to_dict(
-                    user_favorite_apartment_ids=favorite_apartment_ids, include_all_images=True
-                )
-                for ap in pagination.items
-            ]
-            return (
-                jsonify(
-                    {
-                        "items": apartments_data,
-                        "pagination": {
-                            "page": page,
-                            "per_page": per_page,
-                            "total": pagination.total,
-                            "pages": pagination.pages,
-                        },
-                    }
-                ),
-                200,
-            )
-
-        apartments = base_query.all()
-
-        apartments_data = [
-            ap.to_dict(
-                user_favorite_apartment_ids=favorite_apartment_ids, include_all_images=True
-            )
-            for ap in apartments
-        ]
-
-        return jsonify(apartments_data), 200
+        return listing_response(
+            Apartment.query,
+            lambda rows, fields: serialize_rows(
+                rows, include_all_images=True, fields=fields
+            ),
+        )
 
     except Exception as e:
         # Log the error to make it visible in production logs
@@ -263,14 +393,25 @@ def delete_apartment(uuid):
     # 🗑️ امسح المفضلات
     Favorite.query.filter_by(apartment_id=apartment.id).delete()
 
-    # 🗑️ امسح المشاهدات
-    ApartmentView.query.filter_by(apartment_id=apartment.id).delete()
+    # 🗑️ امسح المشاهدات وملخصاتها (ومعها اللي لسه في الـ buffer)
+    forget_apartment(apartment)
 
     # 🗑️ امسح الصور
     for img in apartment.images:
+        discard_spool(img)
+        # ملفات الـ blob مشتركة: تُمسح مع آخر صورة تستخدمها (app.utils.image_blobs)
+        if img.url is None or img.blob_id is not None:
+            db.session.delete(img)
+            continue
+        # رابط خارجي، أو مسار يخرج من UPLOAD_FOLDER (مطلق أو ../): لا نمسح شيئاً
+        file_path = None
+        if not urlsplit(img.url).scheme:
+            file_path = safe_join(current_app.config["UPLOAD_FOLDER"], img.url)
+        if file_path is None:
+            db.session.delete(img)
+            continue
         try:
-            file_path = os.path.join(current_app.config["UPLOAD_FOLDER"], img.url)
-            if os.path.exists(file_path):
+            if os.path.isfile(file_path):
                 os.remove(file_path)
         except Exception as e:
             print("❌ Error deleting image:", e)
@@ -306,21 +447,20 @@ def verify_apartment(id):
     return jsonify({"message": "Apartment verified successfully ✅"}), 200
 
 
+def verified_apartments():
+    return Apartment.query.filter_by(is_verified=True)
+
+
 # ✅ Get all verified apartments
 @apartment_bp.route("/apartments/verified", methods=["GET"])
 @apartment_bp.route("/verified", methods=["GET"])
+@optional_viewer
+@conditional_get(lambda: listing_state(verified_apartments()))
+@cached_response(LISTINGS)
 def get_verified_apartments():
-    apartments = (
-        Apartment.query.options(
-            joinedload(Apartment.owner),
-            joinedload(Apartment.neighborhood),
-            selectinload(Apartment.images),
-            selectinload(Apartment.reviews),
-        )
-        .filter_by(is_verified=True)
-        .all()
+    return listing_response(
+        verified_apartments(), lambda rows, fields: serialize_rows(rows, fields=fields)
     )
-    return jsonify([ap.to_dict() for ap in apartments]), 200
 
 
 # ✅ Get apartments of current owner + stats
@@ -363,20 +503,11 @@ def get_my_apartments():
     result = []
     apartments_per_month = {}
 
-    apartment_ids = [apt.id for apt in apartments]
-    views_rows = (
-        db.session.query(
-            ApartmentView.apartment_id,
-            func.count(ApartmentView.id).label("views_count"),
-        )
-        .filter(ApartmentView.apartment_id.in_(apartment_ids))
-        .group_by(ApartmentView.apartment_id)
-        .all()
-    )
-    views_map = {row.apartment_id: row.views_count for row in views_rows}
+    # ✅ المشاهدات من الملخص اليومي (لا من جدول المشاهدات الخام)
+    views_map = total_views([apt.id for apt in apartments])
 
     for apt in apartments:
-        main_image = apt.images[0] if apt.images else None
+        main_image = next(iter(apt.ready_images), None)
         views_count = views_map.get(apt.id, 0)
 
         # 📅 حساب عدد الشقق في كل شهر بناءً على created_at
@@ -409,54 +540,193 @@ def get_my_apartments():
     return jsonify({"stats": stats, "apartments": result}), 200
 
 
-# ✅ Filter apartments
+def filtered_listing_state():
+    try:
+        query = apply_apartment_filters(verified_apartments(), request.args)
+    except ValueError:
+        return None  # الـ view يرد بـ 400
+    return listing_state(query)
+
+
+# ✅ Filter apartments (+ facet counts with ?facets=true)
 @apartment_bp.route("/apartments/filter", methods=["GET"])
 @apartment_bp.route("/filter", methods=["GET"])
+@optional_viewer
+@conditional_get(filtered_listing_state)
+@cached_response(LISTINGS)
 def filter_apartments():
-    neighborhood_id = request.args.get("neighborhood_id")
-    min_price = request.args.get("min_price", type=float)
-    max_price = request.args.get("max_price", type=float)
-    rooms = request.args.get("rooms", type=int)
-
-    query = Apartment.query.filter_by(is_verified=True)
-
-    if neighborhood_id:
-        query = query.filter_by(neighborhood_id=neighborhood_id)
-    if min_price is not None:
-        query = query.filter(Apartment.price >= min_price)
-    if max_price is not None:
-        query = query.filter(Apartment.price <= max_price)
-    if rooms:
-        query = query.filter_by(rooms=rooms)
-
-    apartments = query.options(
-        joinedload(Apartment.owner),
-        joinedload(Apartment.neighborhood),
-        selectinload(Apartment.images),
-        selectinload(Apartment.reviews),
-    ).all()
-    return jsonify([ap.to_dict() for ap in apartments]), 200
-
-
-# ✅ Search apartments by title
+    try:
+        query = apply_apartment_filters(verified_apartments(), request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    extra = None
+    if str_to_bool(request.args.get("facets")):
+        extra = {"facets": compute_facets(query)}
+
+    return listing_response(
+        query, lambda rows, fields: serialize_rows(rows, fields=fields), extra=extra
+    )
+
+
+# ✅ Search apartments (full-text, ranked)
 @apartment_bp.route("/apartments/search", methods=["GET"])
 @apartment_bp.route("/search", methods=["GET"])
+@optional_viewer
 def search_apartments():
     query = request.args.get("query", "").strip()
     if not query:
         return jsonify({"error": "Please enter a search term"}), 400
 
-    apartments = (
-        Apartment.query.options(
-            joinedload(Apartment.owner),
-            joinedload(Apartment.neighborhood),
-            selectinload(Apartment.images),
-            selectinload(Apartment.reviews),
+    try:
+        fields = requested_fields(LIST_FIELDS)
+    except InvalidFields as e:
+        return invalid_fields_response(e)
+
+    config = current_app.config
+    ranked = rank_apartments(query)
+
+    def load(page):
+        return serialize_apartment_ids(
+            [apartment_id for apartment_id, _ in page], fields=fields
         )
-        .filter(Apartment.title.ilike(f"%{query}%"))
-        .all()
+
+    if wants_cursor_pagination():
+        cursor, limit = parse_cursor_args(
+            config["APARTMENTS_PAGE_SIZE"], config["APARTMENTS_MAX_PAGE_SIZE"]
+        )
+        try:
+            page, next_cursor = ranked_page(ranked, cursor, limit, tag="search")
+        except InvalidCursor:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+        pagination = {"per_page": limit, "has_more": next_cursor is not None}
+        if wants_total():
+            pagination["total"] = len(ranked)
+        return (
+            jsonify(
+                {"items": load(page), "next_cursor": next_cursor, "pagination": pagination}
+            ),
+            200,
+        )
+
+    if wants_pagination():
+        page_number, per_page = parse_pagination_args(
+            default_per_page=config["APARTMENTS_PAGE_SIZE"],
+            max_per_page=config["APARTMENTS_MAX_PAGE_SIZE"],
+        )
+        start = (page_number - 1) * per_page
+        return (
+            jsonify(
+                {
+                    "items": load(ranked[start : start + per_page]),
+                    "pagination": {
+                        "page": page_number,
+                        "per_page": per_page,
+                        "total": len(ranked),
+                        "pages": -(-len(ranked) // per_page),
+                    },
+                }
+            ),
+            200,
+        )
+
+    page, next_cursor = ranked_page(
+        ranked, limit=config["APARTMENTS_UNPAGINATED_LIMIT"], tag="search"
+    )
+    response = jsonify(load(page))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response, 200
+
+
+def geohash_prefilter(query, south, west, north, east):
+    """Restrict ``query`` to a box: geohash prefixes use the index, the
+    coordinate range trims the cells' overhang."""
+    cells = cover_bbox(south, west, north, east, current_app.config["GEO_MAX_CELLS"])
+    return query.filter(
+        or_(*[Apartment.geohash.like(f"{cell}%") for cell in cells]),
+        Apartment.latitude.between(south, north),
+        Apartment.longitude.between(west, east),
+    )
+
+
+# ✅ Apartments near a point, closest first
+@apartment_bp.route("/apartments/nearby", methods=["GET"])
+@apartment_bp.route("/nearby", methods=["GET"])
+@optional_viewer
+def get_nearby_apartments():
+    config = current_app.config
+    lat = request.args.get("lat", type=float)
+    lng = request.args.get("lng", type=float)
+    radius_km = request.args.get(
+        "radius_km", config["GEO_DEFAULT_RADIUS_KM"], type=float
+    )
+    if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return jsonify({"error": "lat and lng are required"}), 400
+    if not radius_km or radius_km <= 0:
+        return jsonify({"error": "radius_km must be positive"}), 400
+    radius_km = min(radius_km, config["GEO_MAX_RADIUS_KM"])
+    try:
+        fields = requested_fields((*LIST_FIELDS, "distanceKm"))
+    except InvalidFields as e:
+        return invalid_fields_response(e)
+
+    candidates = geohash_prefilter(
+        db.session.query(Apartment.id, Apartment.latitude, Apartment.longitude),
+        *radius_bbox(lat, lng, radius_km),
+    )
+    distances = []
+    for apartment_id, latitude, longitude in candidates:
+        distance = round(haversine_km(lat, lng, latitude, longitude), 4)
+        if distance <= radius_km:
+            distances.append((apartment_id, distance))
+    distances.sort(key=lambda item: (item[1], item[0]))
+
+    cursor, limit = parse_cursor_args(
+        config["APARTMENTS_PAGE_SIZE"], config["APARTMENTS_MAX_PAGE_SIZE"]
+    )
+    try:
+        page, next_cursor = ranked_page(
+            distances, cursor, limit, tag="nearby", descending=False
+        )
+    except InvalidCursor:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    items = serialize_apartment_ids(
+        [apartment_id for apartment_id, _ in page],
+        include_coordinates=True,
+        extra_by_id={
+            apartment_id: {"distanceKm": distance} for apartment_id, distance in page
+        },
+        fields=fields,
+    )
+
+    pagination = {"per_page": limit, "has_more": next_cursor is not None}
+    if wants_total():
+        pagination["total"] = len(distances)
+    return (
+        jsonify({"items": items, "next_cursor": next_cursor, "pagination": pagination}),
+        200,
+    )
+
+
+# ✅ Apartments inside the visible map area
+@apartment_bp.route("/apartments/in-bounds", methods=["GET"])
+@apartment_bp.route("/in-bounds", methods=["GET"])
+@optional_viewer
+def get_apartments_in_bounds():
+    try:
+        south, west, north, east = parse_bbox(request.args.get("bbox"))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid bbox: {e}"}), 400
+
+    return listing_response(
+        geohash_prefilter(Apartment.query, south, west, north, east),
+        lambda rows, fields: serialize_rows(
+            rows, include_coordinates=True, fields=fields
+        ),
     )
-    return jsonify([ap.to_dict() for ap in apartments]), 200
 
 
 # ✅ Get apartments of current owner
@@ -498,7 +768,7 @@ def get_owner_apartments():
                 "whatsapp_number": apt.whatsapp_number,
                 "bathrooms": apt.bathrooms,
                 "images": [
-                    f"{request.host_url}uploads/{img.url}" for img in apt.images
+                    f"{request.host_url}uploads/{img.url}" for img in apt.ready_images
                 ],
             }
         )
@@ -508,18 +778,21 @@ def get_owner_apartments():
 
 @apartment_bp.route("/apartments/<int:id>", methods=["GET"])
 @apartment_bp.route("/<int:id>", methods=["GET"])
+@optional_viewer
+@conditional_get(lambda id: apartment_state(viewer_id=g.user_id, id=id))
+@cached_response(DETAILS, lambda id: apartment_namespace(id))
 def get_apartment_by_id(id):
-    apartment = (
-        Apartment.query.options(
-            joinedload(Apartment.owner),
-            joinedload(Apartment.neighborhood),
-            selectinload(Apartment.images),
-            selectinload(Apartment.reviews),
-        )
-        .filter_by(id=id)
-        .first_or_404()
+    try:
+        fields = requested_fields(DETAIL_FIELDS)
+    except InvalidFields as e:
+        return invalid_fields_response(e)
+
+    detail = load_apartment_detail(
+        fields, id=id, viewer_id=g.user_id, reviews_limit=detail_reviews_limit()
     )
-    return jsonify(apartment.to_dict()), 200
+    if detail is None:
+        return jsonify({"error": "Apartment not found"}), 404
+    return jsonify(detail.data), 200
 
 
 @apartment_bp.route("/apartment/<string:uuid>/reviews", methods=["POST"])
@@ -531,16 +804,7 @@ def add_review_to_apartment(uuid):
     user = User.query.filter_by(uuid=user_uuid).first_or_404()
 
     # 2. التأكد من وجود الشقة
-    apartment = (
-        Apartment.query.options(
-            joinedload(Apartment.owner),
-            joinedload(Apartment.neighborhood),
-            selectinload(Apartment.images),
-            selectinload(Apartment.reviews),
-        )
-        .filter_by(uuid=uuid)
-        .first_or_404()
-    )
+    apartment = Apartment.query.filter_by(uuid=uuid).first_or_404()
 
     # 3. قراءة البيانات من الطلب (request)
     data = request.get_json() or {}
@@ -580,6 +844,7 @@ def add_review_to_apartment(uuid):
             apartment_id=apartment.id,
         )
         db.session.add(new_review)
+        apply_rating_change(apartment.id, added=rating_int)
         db.session.commit()
 
         # 6. إرجاع رسالة نجاح مع بيانات المراجعة الجديدة
@@ -598,24 +863,38 @@ def add_review_to_apartment(uuid):
 
 @apartment_bp.route("/apartment/<string:uuid>", methods=["GET"])
 @apartment_bp.route("/<string:uuid>", methods=["GET"])
-@jwt_required(locations=["cookies"])
+@login_required
+@conditional_get(lambda uuid: apartment_state(viewer_id=g.user_id, uuid=uuid))
 def get_apartment_details(uuid):
-    get_jwt_identity()  # تأكد أن المستخدم مصادق عليه
-    apartment = Apartment.query.filter_by(uuid=uuid).first_or_404()
-    data = apartment.to_dict(include_all_images=True)
-
-    if apartment.owner:
-        data["owner"] = {
-            "id": apartment.owner.id,
-            "fullName": apartment.owner.full_name,
-            "phone": apartment.owner.phone,
-            "avatar": f"{request.host_url.rstrip('/')}/uploads/default-avatar.png",
-            "initial": (
-                apartment.owner.full_name[0] if apartment.owner.full_name else "م"
-            ),
-        }
-    else:
-        data["owner"] = None
+    try:
+        fields = requested_fields((*DETAIL_FIELDS, "owner"))
+    except InvalidFields as e:
+        return invalid_fields_response(e)
+
+    detail = load_apartment_detail(
+        fields,
+        uuid=uuid,
+        viewer_id=g.user_id,
+        include_all_images=True,
+        reviews_limit=detail_reviews_limit(),
+    )
+    if detail is None:
+        return jsonify({"error": "Apartment not found"}), 404
+    apartment, data = detail.apartment, detail.data
+
+    if wants(fields, "owner"):
+        if apartment.owner:
+            data["owner"] = {
+                "id": apartment.owner.id,
+                "fullName": apartment.owner.full_name,
+                "phone": apartment.owner.phone,
+                "avatar": f"{request.host_url.rstrip('/')}/uploads/default-avatar.png",
+                "initial": (
+                    apartment.owner.full_name[0] if apartment.owner.full_name else "م"
+                ),
+            }
+        else:
+            data["owner"] = None
 
     return jsonify(data), 200
 
@@ -624,37 +903,37 @@ def get_apartment_details(uuid):
 
 
 @apartment_bp.route("/featured", methods=["GET"])
+@optional_viewer
+@conditional_get(lambda: listing_state(Apartment.query))
+@cached_response(LISTINGS)
 def get_featured_apartments():
-    apartments = (
-        Apartment.query.options(
-            joinedload(Apartment.neighborhood),
-            selectinload(Apartment.images),
-            selectinload(Apartment.reviews),
-            joinedload(Apartment.owner),
-        )
-        .order_by(Apartment.id.desc())
-        .limit(3)
-        .all()
+    try:
+        fields = requested_fields((*Apartment.DICT_FIELDS, "image"))
+    except InvalidFields as e:
+        return invalid_fields_response(e)
+
+    details = load_apartment_details(
+        Apartment.query.order_by(Apartment.id.desc()).limit(3),
+        fields,
+        viewer_id=g.user_id,
+        include_all_images=True,
     )
 
     result = []
-    for apt in apartments:
-        data = apt.to_dict(include_all_images=True)  # ✅ نفس اللوجيك بتاع التفاصيل
-
+    for apt, data, image_urls in details:
         # الحي
-        if apt.neighborhood:
-            data["neighborhood"] = {
-                "id": apt.neighborhood.id,
-                "name": apt.neighborhood.name,
-            }
-        else:
-            data["neighborhood"] = None
+        if wants(fields, "neighborhood"):
+            if apt.neighborhood:
+                data["neighborhood"] = {
+                    "id": apt.neighborhood.id,
+                    "name": apt.neighborhood.name,
+                }
+            else:
+                data["neighborhood"] = None
 
         # لو عايز بس صورة واحدة (أول صورة مثلاً)
-        if data.get("images"):
-            data["image"] = data["images"][0]
-        else:
-            data["image"] = None
+        if wants(fields, "image"):
+            data["image"] = image_urls[0] if image_urls else None
 
         result.append(data)
 
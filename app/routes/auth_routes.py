@@ -4,6 +4,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask import Blueprint, request, jsonify, make_response, current_app
 from app.models.user import User
 from app import db
+from app.utils.fields import InvalidFields, invalid_fields_response, requested_fields
 from flask_jwt_extended import (
     create_access_token,
     unset_jwt_cookies,
@@ -203,14 +204,21 @@ def login():
 @auth_bp.route("/profile", methods=["GET"])
 @jwt_required(locations=["cookies"])
 def profile():
+    try:
+        fields = requested_fields(User.DICT_FIELDS)
+    except InvalidFields as e:
+        return invalid_fields_response(e)
+
     # هذا الكود الآن سيعمل بشكل صحيح لأن الهوية هي uuid
     user_uuid = get_jwt_identity()
-    user = User.query.filter_by(uuid=user_uuid).first()
+    user = (
+        User.query.options(*User.load_options(fields)).filter_by(uuid=user_uuid).first()
+    )
 
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    return jsonify(user.to_dict()), 200
+    return jsonify(user.to_dict(fields=fields)), 200
 
 
 @auth_bp.route("/update-password", methods=["POST"])
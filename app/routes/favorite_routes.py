@@ -101,7 +101,7 @@ def get_favorites():
                 "price": apt.price,
                 "address": apt.address,
                 "rooms": apt.rooms,
-                "main_image": apt.images[0].url if apt.images else None,
+                "main_image": next((img.url for img in apt.ready_images), None),
             }
         )
 
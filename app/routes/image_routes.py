@@ -1,10 +1,22 @@
-from flask import Blueprint, request, jsonify
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required
 from flask_cors import cross_origin
+from sqlalchemy import insert, update
 from app.models.apartment import Apartment
 from app.models.image import Image  # جدول الصور
 from app import db
-import cloudinary.uploader
+from app.utils.cache import LISTINGS, apartment_namespace, mark_stale
+from app.utils.image_blobs import (
+    adjust_ref_counts,
+    discard_unregistered,
+    find_blobs,
+    register_blob,
+)
+from app.utils.image_processing import InvalidImage, content_digest, process_upload
+from app.utils.storage import get_storage
 
 image_bp = Blueprint("image_bp", __name__)
 
@@ -15,55 +27,157 @@ def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def _process_one(app, storage, data, digest):
+    """Process and store one new upload; returns ``(blob values, error)``
+    (runs in a pool thread)."""
+    with app.app_context():
+        try:
+            return process_upload(storage, data, digest), None
+        except InvalidImage as e:
+            return None, ("rejected", str(e))
+        except Exception as e:
+            return None, ("failed", str(e))
+
+
 # ✅ رفع صورة لشقة وربطها في قاعدة البيانات
 @image_bp.route("/upload-image/<string:apartment_id>", methods=["POST"])
 @jwt_required()
 def upload_image(apartment_id):
+    """Upload several images in parallel (``IMAGE_UPLOAD_CONCURRENCY``
+    threads) and answer with one result per file: 201 when all of them
+    were stored, 207 on partial success, 502 when none was.
+
+    Files whose content is already stored (any apartment) are not
+    processed again: the new images share the existing blob
+    (``"deduplicated": true`` in their result)."""
     if "images" not in request.files:
         return jsonify({"error": "يجب اختيار ملفات صور"}), 400
 
-    files = request.files.getlist("images")
-    if not files or all(file.filename == "" for file in files):
+    files = [file for file in request.files.getlist("images") if file.filename]
+    if not files:
         return jsonify({"error": "اسم الملف فارغ"}), 400
 
     apartment = Apartment.query.filter_by(id=apartment_id).first()
     if not apartment:
         return jsonify({"error": "الشقة غير موجودة"}), 404
 
-    uploaded_urls = []
-    for file in files:
-        if not allowed_file(file.filename):
-            return jsonify({"error": f"صيغة غير مدعومة للملف {file.filename}"}), 400
-
-        # ✅ رفع الصورة لـ Cloudinary
-        try:
-            result = cloudinary.uploader.upload(file)
-            secure_url = result.get("secure_url")
-        except Exception as e:
-            return (
-                jsonify({"error": f"فشل في رفع الصورة {file.filename}: {str(e)}"}),
-                500,
+    # الملفات بصيغة غير مدعومة تُرفض وحدها ولا توقف الباقي
+    results = [None] * len(files)
+    digests = {}
+    payloads = {}
+    for index, file in enumerate(files):
+        if allowed_file(file.filename):
+            data = file.read()
+            digests[index] = content_digest(data)
+            payloads.setdefault(digests[index], data)
+        else:
+            results[index] = {
+                "filename": file.filename,
+                "status": "rejected",
+                "error": f"صيغة غير مدعومة للملف {file.filename}",
+            }
+
+    # ✅ المحتوى المعروف لا يُعالج ولا يُرفع مرة ثانية
+    blobs = find_blobs(payloads)
+    known = set(blobs)
+    missing = [digest for digest in payloads if digest not in blobs]
+
+    storage = get_storage()
+    app = current_app._get_current_object()
+    processed = {}
+    errors = {}
+    if missing:
+        workers = min(len(missing), current_app.config["IMAGE_UPLOAD_CONCURRENCY"])
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-upload") as pool:
+            uploads = pool.map(
+                lambda digest: _process_one(app, storage, payloads[digest], digest), missing
             )
-
-        # ✅ حفظ الرابط في جدول الصور وربطه بالشقة
-        image = Image(url=secure_url, apartment_id=apartment.id)
-        db.session.add(image)
-        uploaded_urls.append(secure_url)
-
-    db.session.commit()
-
-    return jsonify({"message": "تم رفع الصور بنجاح", "image_urls": uploaded_urls}), 201
+            for digest, (values, error) in zip(missing, uploads):
+                if values is None:
+                    errors[digest] = error
+                else:
+                    processed[digest] = values
+
+    if not known and not processed:
+        for index, digest in digests.items():
+            status, error = errors[digest]
+            results[index] = {"filename": files[index].filename, "status": status, "error": error}
+        return jsonify({"error": "فشل رفع الصور", "results": results}), 502
+
+    # ✅ إدخال واحد لكل الصور، ثم تحديث نسخة الشقة مرة واحدة (الكاش و ETag)
+    try:
+        for digest, values in processed.items():
+            blobs[digest] = register_blob(storage, values)
+
+        rows = []
+        seen = set()
+        for index, digest in digests.items():
+            file = files[index]
+            if digest in errors:
+                status, error = errors[digest]
+                results[index] = {"filename": file.filename, "status": status, "error": error}
+                continue
+            blob = blobs[digest]
+            results[index] = {
+                "filename": file.filename,
+                "status": "uploaded",
+                "url": blob.url,
+                "width": blob.width,
+                "height": blob.height,
+                # موجود قبل الطلب، أو نفس الصورة بصيغة أخرى، أو مكرر في نفس الطلب
+                "deduplicated": digest in known or blob.sha256 != digest or digest in seen,
+            }
+            seen.add(digest)
+            rows.append({**blob.image_values(), "apartment_id": apartment.id})
+
+        db.session.execute(insert(Image.__table__), rows)
+        adjust_ref_counts(Counter(row["blob_id"] for row in rows))
+        db.session.execute(
+            update(Apartment)
+            .where(Apartment.id == apartment.id)
+            .values(**Apartment.touch_values())
+        )
+        mark_stale(db.session, LISTINGS, apartment_namespace(apartment.id))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        # الملفات اترفعت لكن الصفوف لم تُحفظ: نمسحها حتى لا تبقى يتيمة
+        discard_unregistered(storage, list(processed.values()))
+        current_app.logger.exception("Could not save images of apartment %s", apartment.id)
+        return jsonify({"error": "حدث خطأ أثناء حفظ الصور", "results": results}), 500
+
+    uploaded_urls = [row["url"] for row in rows]
+    status = 201 if len(uploaded_urls) == len(files) else 207
+    message = "تم رفع الصور بنجاح" if status == 201 else "تم رفع بعض الصور فقط"
+    return (
+        jsonify({"message": message, "image_urls": uploaded_urls, "results": results}),
+        status,
+    )
 
 
 # ✅ جلب كل صور شقة معينة
 @image_bp.route("/apartment/<int:apartment_id>/images", methods=["GET"])
 @cross_origin()
 def get_apartment_images(apartment_id):
-    images = Image.query.filter_by(apartment_id=apartment_id).all()
+    images = (
+        Image.query.filter_by(apartment_id=apartment_id, status=Image.READY)
+        .order_by(Image.id)
+        .all()
+    )
 
     if not images:
         return jsonify({"error": "لا توجد صور لهذه الشقة"}), 404
 
     image_urls = [img.url for img in images]
 
-    return jsonify({"apartment_id": apartment_id, "images": image_urls}), 200
+    return (
+        jsonify(
+            {
+                "apartment_id": apartment_id,
+                "images": image_urls,
+                # المقاسات و srcset لكل صورة
+                "details": [img.to_dict() for img in images],
+            }
+        ),
+        200,
+    )
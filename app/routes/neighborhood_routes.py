@@ -3,6 +3,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.neighborhood import Neighborhood
 from app.models.user import User
 from app import db
+from app.utils.cache import NEIGHBORHOODS, cached_response
 
 neighborhood_bp = Blueprint("neighborhood_bp", __name__)
 
@@ -40,6 +41,7 @@ def create_neighborhood():
 
 # ✅ جلب كل الأحياء
 @neighborhood_bp.route("/", methods=["GET"])
+@cached_response(NEIGHBORHOODS)
 def get_all_neighborhoods():
     neighborhoods = Neighborhood.query.all()
     return jsonify([n.to_dict() for n in neighborhoods]), 200
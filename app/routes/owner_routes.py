@@ -1,23 +1,37 @@
+from datetime import date, datetime, timedelta
+
 from flask import Blueprint, request, jsonify
-from app import db
-from ..models.apartment_view import ApartmentView
 from ..models.apartment import Apartment
+from ..models.user import User
+from ..utils.view_rollups import daily_series, unique_visitors, view_totals
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
-views_bp = Blueprint("views", __name__, url_prefix="/api/views")
+# نفس بادئة views_routes، باسم blueprint مختلف
+owner_views_bp = Blueprint("owner_views", __name__, url_prefix="/api/views")
+
+MAX_SERIES_DAYS = 366
+
+
+def _owner_apartments():
+    user = User.query.filter_by(uuid=get_jwt_identity()).first()
+    if not user:
+        return None
+    return Apartment.query.filter_by(owner_id=user.id).order_by(Apartment.id).all()
 
 
-@views_bp.route("/owner/details", methods=["GET"])
+@owner_views_bp.route("/owner/details", methods=["GET"])
 @jwt_required(locations=["cookies"])  # تأكد أن المالك مسجل دخول
 def owner_apartment_views():
-    current_user_id = get_jwt_identity()  # ID المالك من التوكن
-
     # جلب كل الشقق الخاصة بالمالك
-    apartments = Apartment.query.filter_by(owner_id=current_user_id).all()
+    apartments = _owner_apartments()
+    if apartments is None:
+        return jsonify({"error": "User not found"}), 404
+
+    # ✅ استعلام واحد على الملخص اليومي لكل الشقق
+    totals = view_totals([apartment.id for apartment in apartments])
     result = []
 
     for apartment in apartments:
-        views_count = ApartmentView.query.filter_by(apartment_id=apartment.id).count()
         result.append(
             {
                 "apartment_id": apartment.id,
@@ -26,8 +40,61 @@ def owner_apartment_views():
                 "address": apartment.address,
                 "price": apartment.price,
                 "rooms": apartment.rooms,
-                "views": views_count,
+                "views": totals.get(apartment.id, (0, 0))[0],
+                # تقدير HyperLogLog (خطأ معياري ~2.3%)
+                "unique_visitors": totals.get(apartment.id, (0, 0))[1],
             }
         )
 
     return jsonify(result), 200
+
+
+@owner_views_bp.route("/owner/daily", methods=["GET"])
+@jwt_required(locations=["cookies"])
+def owner_daily_views():
+    """Views and unique visitors per day of each of the owner's apartments
+    (``?from=YYYY-MM-DD&to=YYYY-MM-DD``, UTC days, default the last 30)."""
+    try:
+        end = (
+            date.fromisoformat(request.args["to"])
+            if "to" in request.args
+            else datetime.utcnow().date()
+        )
+        start = (
+            date.fromisoformat(request.args["from"])
+            if "from" in request.args
+            else end - timedelta(days=29)
+        )
+    except ValueError:
+        return jsonify({"error": "التاريخ يجب أن يكون بصيغة YYYY-MM-DD"}), 400
+    if start > end or (end - start).days >= MAX_SERIES_DAYS:
+        return jsonify({"error": f"الفترة يجب أن تكون من 1 إلى {MAX_SERIES_DAYS} يوم"}), 400
+
+    apartments = _owner_apartments()
+    if apartments is None:
+        return jsonify({"error": "User not found"}), 404
+
+    apartment_ids = [apartment.id for apartment in apartments]
+    series = daily_series(apartment_ids, start, end)
+    # زوار الفترة كلها: دمج sketches الأيام (لا جمع زوار كل يوم)
+    visitors = unique_visitors(apartment_ids, start, end)
+    return (
+        jsonify(
+            {
+                "from": start.isoformat(),
+                "to": end.isoformat(),
+                "apartments": [
+                    {
+                        "apartment_id": apartment.id,
+                        "apartment_uuid": apartment.uuid,
+                        "title": apartment.title,
+                        "views": sum(day["views"] for day in series[apartment.id]),
+                        "unique_visitors": visitors[apartment.id],
+                        "days": series[apartment.id],
+                    }
+                    for apartment in apartments
+                ],
+            }
+        ),
+        200,
+    )
@@ -3,6 +3,8 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.review import Review
 from app.models.apartment import Apartment
 from app.models.user import User
+from app.utils.ratings import apply_rating_change
+from app.utils.fields import InvalidFields, invalid_fields_response, requested_fields
 from app import db
 
 review_bp = Blueprint("review_bp", __name__)
@@ -43,10 +45,11 @@ def create_review():
         return jsonify({"error": "لقد قمت بتقييم هذه الشقة من قبل"}), 400
 
     review = Review(
-        user_id=user.id, apartment_id=apartment_id, rating=rating, comment=comment
+        user_id=user.id, apartment_id=apartment.id, rating=int(rating), comment=comment
     )
 
     db.session.add(review)
+    apply_rating_change(apartment.id, added=review.rating)
     db.session.commit()
 
     return (
@@ -59,12 +62,21 @@ def create_review():
 @review_bp.route("/reviews/apartment/<int:apartment_id>", methods=["GET"])
 @review_bp.route("/apartment/<int:apartment_id>", methods=["GET"])
 def get_reviews_for_apartment(apartment_id):
+    try:
+        fields = requested_fields(Review.DICT_FIELDS)
+    except InvalidFields as e:
+        return invalid_fields_response(e)
+
     apartment = Apartment.query.get(apartment_id)
     if not apartment:
         return jsonify({"error": "الشقة غير موجودة"}), 404
 
-    reviews = Review.query.filter_by(apartment_id=apartment_id).all()
-    return jsonify([r.to_dict() for r in reviews]), 200
+    reviews = (
+        Review.query.options(*Review.load_options(fields))
+        .filter_by(apartment_id=apartment_id)
+        .all()
+    )
+    return jsonify([r.to_dict(fields=fields) for r in reviews]), 200
 
 
 # ✅ حذف تقييم
@@ -85,6 +97,7 @@ def delete_review(review_id):
     if review.user_id != user.id:
         return jsonify({"error": "غير مصرح لك بحذف هذا التقييم"}), 403
 
+    apply_rating_change(review.apartment_id, removed=review.rating)
     db.session.delete(review)
     db.session.commit()
 
@@ -116,7 +129,8 @@ def update_review(review_id):
     if not (1 <= int(rating) <= 5):
         return jsonify({"error": "التقييم يجب أن يكون بين 1 و 5"}), 400
 
-    review.rating = rating
+    apply_rating_change(review.apartment_id, added=rating, removed=review.rating)
+    review.rating = int(rating)
     review.comment = comment
     db.session.commit()
 
@@ -137,5 +151,14 @@ def get_user_reviews():
     if not user:
         return jsonify({"error": "المستخدم غير موجود"}), 404
 
-    reviews = Review.query.filter_by(user_id=user.id).all()
-    return jsonify([r.to_dict() for r in reviews]), 200
+    try:
+        fields = requested_fields(Review.DICT_FIELDS)
+    except InvalidFields as e:
+        return invalid_fields_response(e)
+
+    reviews = (
+        Review.query.options(*Review.load_options(fields))
+        .filter_by(user_id=user.id)
+        .all()
+    )
+    return jsonify([r.to_dict(fields=fields) for r in reviews]), 200
@@ -0,0 +1,232 @@
+# app/schemas/apartment_detail.py
+"""Shared loader for apartment detail payloads.
+
+Used by the detail endpoints and ``/featured``. Everything is fetched in
+at most two round trips, whatever the number of apartments:
+
+1. the apartments joined with owner and neighborhood, plus the viewer's
+   favorite flag as an ``EXISTS`` column;
+2. one ``UNION ALL`` of their images and (optionally) the first page of
+   reviews of each.
+
+The serialized payload is cached per ``(apartment id, version)`` under the
+detail page namespaces (``apartment`` + ``apartment:<id>``). Every write
+bumps the version (see ``Apartment.touch_values``) and the namespaces
+follow the ``ResponseCache`` invalidations, so a cached payload is never
+stale; a hit skips the second query and the serialization.
+"""
+import hashlib
+from collections import namedtuple
+from typing import NamedTuple
+
+from sqlalchemy import func, literal, null, select, type_coerce, union_all
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.models.apartment import Apartment
+from app.models.favorite import Favorite
+from app.models.image import Image
+from app.models.review import Review
+from app.models.user import User
+from app.utils.cache import DETAILS, apartment_namespace, get_response_cache
+from app.utils.fields import wants
+
+DETAIL_FIELDS = (*Apartment.DICT_FIELDS, "reviews")
+
+# صف صورة من الـ UNION بأسماء أعمدة Image (لـ Image.responsive_dict)
+_ImageColumns = namedtuple("_ImageColumns", Image.RESPONSIVE_COLUMNS)
+
+
+class ApartmentDetail(NamedTuple):
+    apartment: Apartment
+    data: dict
+    image_urls: list
+
+
+def _load_children(apartment_ids, reviews_limit):
+    """``{id: image responsive dicts}`` and ``{id: review dicts}`` in one
+    statement."""
+    images = {apartment_id: [] for apartment_id in apartment_ids}
+    reviews = {apartment_id: [] for apartment_id in apartment_ids}
+    if not apartment_ids:
+        return images, reviews
+
+    statement = select(
+        literal("image").label("kind"),
+        Image.apartment_id,
+        Image.id.label("child_id"),
+        Image.url.label("text"),
+        Image.width,
+        Image.height,
+        Image.color,
+        Image.blurhash,
+        Image.variants,
+        # النوع يحدد معالجة نتيجة الـ UNION كله (التاريخ في SQLite نص)
+        type_coerce(null(), Review.rating.type).label("rating"),
+        type_coerce(null(), Review.created_at.type).label("created_at"),
+        type_coerce(null(), User.full_name.type).label("author"),
+    ).where(Image.apartment_id.in_(apartment_ids), Image.status == Image.READY)
+
+    if reviews_limit:
+        ranked = (
+            select(
+                Review.apartment_id,
+                Review.id,
+                Review.comment,
+                Review.rating,
+                Review.created_at,
+                User.full_name,
+                func.row_number()
+                .over(
+                    partition_by=Review.apartment_id,
+                    order_by=(Review.created_at.desc(), Review.id.desc()),
+                )
+                .label("position"),
+            )
+            .outerjoin(User, Review.user_id == User.id)
+            .where(Review.apartment_id.in_(apartment_ids))
+            .subquery()
+        )
+        statement = union_all(
+            statement,
+            select(
+                literal("review"),
+                ranked.c.apartment_id,
+                ranked.c.id,
+                ranked.c.comment,
+                type_coerce(null(), Image.width.type),
+                type_coerce(null(), Image.height.type),
+                type_coerce(null(), Image.color.type),
+                type_coerce(null(), Image.blurhash.type),
+                type_coerce(null(), Image.variants.type),
+                ranked.c.rating,
+                ranked.c.created_at,
+                ranked.c.full_name,
+            ).where(ranked.c.position <= reviews_limit),
+        )
+
+    rows = db.session.execute(statement).all()
+    for row in sorted(rows, key=lambda row: row.child_id):
+        if row.kind == "image":
+            images[row.apartment_id].append(
+                Image.responsive_dict(
+                    _ImageColumns(
+                        row.text, row.width, row.height, row.color, row.blurhash, row.variants
+                    )
+                )
+            )
+    review_rows = [row for row in rows if row.kind == "review"]
+    review_rows.sort(key=lambda row: (row.created_at, row.child_id), reverse=True)
+    for row in review_rows:
+        created_at = row.created_at
+        reviews[row.apartment_id].append(
+            # نفس شكل Review.to_dict
+            {
+                "id": row.child_id,
+                "rating": row.rating,
+                "comment": row.text,
+                "date": created_at.strftime("%Y-%m-%d") if created_at else None,
+                "user": row.author or "مستخدم غير معروف",
+                "avatar": None,
+            }
+        )
+    return images, reviews
+
+
+def _cache_key(cache, apartment, variant):
+    # تحت namespaces صفحة التفاصيل: أي invalidation لها تشمل الـ payload
+    return cache.full_key(
+        [DETAILS, apartment_namespace(apartment.id)],
+        f"detail:{apartment.version}:{variant}",
+    )
+
+
+def load_apartment_details(
+    query,
+    fields=None,
+    viewer_id=None,
+    viewer_uuid=None,
+    include_all_images=False,
+    reviews_limit=0,
+):
+    """Load and serialize the apartments matched by ``query`` (order kept).
+
+    ``fields`` works like ``to_dict(fields=...)`` and may also name
+    ``reviews``; reviews are only loaded when ``reviews_limit`` is set.
+    """
+    if not wants(fields, "reviews"):
+        reviews_limit = 0
+    options = [
+        joinedload(Apartment.owner),  # لكتلة owner في صفحة التفاصيل أيضاً
+        joinedload(Apartment.neighborhood),
+    ]
+    rows = (
+        query.options(*options)
+        .add_columns(
+            Favorite.flag_for(Apartment.id, viewer_id, viewer_uuid).label("is_favorite")
+        )
+        .all()
+    )
+
+    cache = get_response_cache()
+    variant = hashlib.sha1(
+        repr(
+            (sorted(fields) if fields else None, include_all_images, reviews_limit)
+        ).encode()
+    ).hexdigest()[:16]
+
+    cached = {}
+    keys = {}
+    if cache is not None:
+        for apartment, _ in rows:
+            # المفتاح يُحسب مرة واحدة: نفس الـ generation للقراءة والتخزين
+            keys[apartment.id] = _cache_key(cache, apartment, variant)
+            payload = cache.fetch(keys[apartment.id], "detail")
+            if payload is not None:
+                cached[apartment.id] = payload
+
+    missing = [apartment.id for apartment, _ in rows if apartment.id not in cached]
+    images, reviews = (
+        _load_children(missing, reviews_limit) if missing else ({}, {})
+    )
+
+    details = []
+    for apartment, is_favorite in rows:
+        payload = cached.get(apartment.id)
+        if payload is None:
+            image_urls = [image["url"] for image in images[apartment.id]]
+            data = apartment.to_dict(
+                include_all_images=include_all_images,
+                fields=fields,
+                image_urls=image_urls,
+                image_sets=images[apartment.id],
+            )
+            if reviews_limit:
+                data["reviews"] = reviews[apartment.id]
+            # isFavorite خاص بكل مستخدم فلا يدخل الكاش
+            data.pop("isFavorite", None)
+            payload = {"data": data, "images": image_urls}
+            if cache is not None:
+                cache.store(keys[apartment.id], payload, "detail")
+
+        data = dict(payload["data"])
+        if wants(fields, "isFavorite"):
+            data["isFavorite"] = bool(is_favorite)
+        details.append(ApartmentDetail(apartment, data, payload["images"]))
+    return details
+
+
+def load_apartment_detail(fields=None, **options_and_filters):
+    """Single-apartment variant; ``filters`` go to ``filter_by``.
+
+    Returns ``None`` when no apartment matches.
+    """
+    loader_options = {
+        key: options_and_filters.pop(key)
+        for key in ("viewer_id", "viewer_uuid", "include_all_images", "reviews_limit")
+        if key in options_and_filters
+    }
+    details = load_apartment_details(
+        Apartment.query.filter_by(**options_and_filters), fields, **loader_options
+    )
+    return details[0] if details else None
@@ -0,0 +1,223 @@
+# app/schemas/apartment_list.py
+"""Fast serialization path for apartment list responses.
+
+``Apartment.to_dict`` needs a fully loaded ORM graph (owner, neighborhood,
+images) per row. List endpoints instead select just the columns the card
+needs – owner name, neighborhood name and first image url included – in a
+single statement and build the dicts straight from the row tuples. The
+output is identical to ``to_dict`` so clients see no difference.
+"""
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from app import db
+from app.models.apartment import FEATURE_LABELS_BY_MASK, Apartment
+from app.models.image import Image
+from app.models.neighborhood import Neighborhood
+from app.models.user import User
+from app.utils.favorites import viewer_favorite_ids
+from app.utils.fields import build_dict, wants
+
+_Owner = aliased(User)
+_Neighborhood = aliased(Neighborhood)
+
+
+def _main_image(column, label):
+    return (
+        select(column)
+        .where(Image.apartment_id == Apartment.id, Image.status == Image.READY)
+        .order_by(Image.id)
+        .limit(1)
+        .correlate(Apartment)
+        .scalar_subquery()
+        .label(label)
+    )
+
+
+_MAIN_IMAGE = _main_image(Image.url, "main_image")
+# المقاسات و srcset للصورة الأولى تُجلب بعدها باستعلام واحد للصفحة كلها
+_MAIN_IMAGE_ID = _main_image(Image.id, "main_image_id")
+
+# مفاتيح الاستجابة -> الأعمدة اللازمة لها (لـ ?fields=)
+FIELD_COLUMNS = {
+    "id": (),
+    "uuid": (Apartment.uuid,),
+    "title": (Apartment.title,),
+    "description": (Apartment.description,),
+    "address": (Apartment.address,),
+    "price": (Apartment.price,),
+    "bedrooms": (Apartment.rooms,),
+    "bathrooms": (Apartment.bathrooms,),
+    "kitchens": (Apartment.kitchens,),
+    "totalBeds": (Apartment.total_beds,),
+    "availableBeds": (Apartment.available_beds,),
+    "residenceType": (Apartment.residence_type,),
+    "whatsappNumber": (Apartment.whatsapp_number,),
+    "isVerified": (Apartment.is_verified,),
+    "ownerName": (_Owner.full_name.label("owner_name"),),
+    "neighborhood": (_Neighborhood.name.label("neighborhood_name"),),
+    "area": (Apartment.area,),
+    "preferred_tenant_type": (Apartment.preferred_tenant_type,),
+    "floorNumber": (Apartment.floor_number,),
+    "features": (Apartment.features_mask,),
+    "createdAt": (),
+    "rating": (),
+    "reviewCount": (Apartment.rating_count,),
+    "isFavorite": (),
+    "images": (),
+    "main_image": (_MAIN_IMAGE,),
+    "main_image_set": (_MAIN_IMAGE_ID,),
+    "latitude": (Apartment.latitude,),
+    "longitude": (Apartment.longitude,),
+}
+LIST_FIELDS = tuple(FIELD_COLUMNS)
+
+# مفاتيح الترتيب مطلوبة دائماً للـ cursor
+_KEY_COLUMNS = (Apartment.id, Apartment.created_at, Apartment.rating_avg)
+
+
+def project_listing(query, fields=None):
+    """Turn a filtered Apartment query into a row query of just the columns
+    ``fields`` needs (all of them when ``None``).
+
+    Rows keep the attribute names used by the listing sort keys
+    (``created_at``, ``rating_avg``, ``id``), so keyset pagination works on
+    them unchanged. The owner / neighborhood joins and the first-image
+    subquery are only added when their fields are requested.
+    """
+    columns = list(_KEY_COLUMNS)
+    for name, needed in FIELD_COLUMNS.items():
+        if wants(fields, name):
+            columns.extend(needed)
+    query = query.with_entities(*columns)
+    if wants(fields, "ownerName"):
+        query = query.outerjoin(_Owner, Apartment.owner_id == _Owner.id)
+    if wants(fields, "neighborhood"):
+        query = query.outerjoin(
+            _Neighborhood, Apartment.neighborhood_id == _Neighborhood.id
+        )
+    return query
+
+
+def load_image_urls(apartment_ids):
+    """All image urls of the given apartments, in one query."""
+    urls = {apartment_id: [] for apartment_id in apartment_ids}
+    if not urls:
+        return urls
+    rows = db.session.execute(
+        select(Image.apartment_id, Image.url)
+        .where(Image.apartment_id.in_(list(urls)), Image.status == Image.READY)
+        .order_by(Image.id)
+    )
+    for apartment_id, url in rows:
+        urls[apartment_id].append(url)
+    return urls
+
+
+def load_image_sets(image_ids):
+    """``Image.responsive_dict()`` of the given images, in one query."""
+    image_ids = [image_id for image_id in image_ids if image_id is not None]
+    if not image_ids:
+        return {}
+    columns = [getattr(Image, name) for name in Image.RESPONSIVE_COLUMNS]
+    rows = db.session.execute(select(Image.id, *columns).where(Image.id.in_(image_ids)))
+    return {row.id: Image.responsive_dict(row) for row in rows}
+
+
+def serialize_row(row, favorite_ids=frozenset(), images=None, fields=None, image_sets=None):
+    builders = {
+        "id": lambda: row.id,
+        "uuid": lambda: row.uuid,
+        "title": lambda: row.title,
+        "description": lambda: row.description,
+        "address": lambda: row.address,
+        "price": lambda: row.price,
+        "bedrooms": lambda: row.rooms,
+        "bathrooms": lambda: row.bathrooms,
+        "kitchens": lambda: row.kitchens,
+        "totalBeds": lambda: row.total_beds,
+        "availableBeds": lambda: row.available_beds,
+        "residenceType": lambda: row.residence_type,
+        "whatsappNumber": lambda: row.whatsapp_number,
+        "isVerified": lambda: row.is_verified,
+        "ownerName": lambda: row.owner_name or "مالك غير معروف",
+        "neighborhood": lambda: row.neighborhood_name or "منطقة غير محددة",
+        "area": lambda: row.area,
+        "preferred_tenant_type": lambda: row.preferred_tenant_type,
+        "floorNumber": lambda: row.floor_number,
+        "features": lambda: list(FEATURE_LABELS_BY_MASK[row.features_mask or 0]),
+        "createdAt": lambda: row.created_at.isoformat() if row.created_at else None,
+        "rating": lambda: round(row.rating_avg or 0.0, 1),
+        "reviewCount": lambda: row.rating_count or 0,
+        "isFavorite": lambda: row.id in favorite_ids,
+    }
+    if images is not None:
+        builders["images"] = lambda: images
+    else:
+        builders["main_image"] = lambda: row.main_image
+        builders["main_image_set"] = lambda: (image_sets or {}).get(row.main_image_id)
+    return build_dict(builders, fields)
+
+
+def serialize_rows(
+    rows,
+    favorite_ids=None,
+    include_all_images=False,
+    include_coordinates=False,
+    extra_by_id=None,
+    fields=None,
+):
+    """Serialize projected rows; ``favorite_ids`` must be a set, and
+    defaults to the signed-in viewer's favorites among ``rows``.
+
+    ``extra_by_id`` adds endpoint-specific keys (e.g. ``distanceKm``) to
+    the row with that id, subject to ``fields`` like the rest.
+    """
+    if favorite_ids is None:
+        favorite_ids = (
+            viewer_favorite_ids(row.id for row in rows)
+            if wants(fields, "isFavorite")
+            else frozenset()
+        )
+    include_all_images = include_all_images and wants(fields, "images")
+    images_by_id = load_image_urls([row.id for row in rows]) if include_all_images else {}
+    image_sets = (
+        load_image_sets([row.main_image_id for row in rows])
+        if not include_all_images and wants(fields, "main_image_set")
+        else None
+    )
+    result = []
+    for row in rows:
+        data = serialize_row(
+            row,
+            favorite_ids,
+            images_by_id.get(row.id) if include_all_images else None,
+            fields,
+            image_sets,
+        )
+        if include_coordinates:
+            data.update(
+                build_dict(
+                    {"latitude": lambda: row.latitude, "longitude": lambda: row.longitude},
+                    fields,
+                )
+            )
+        if extra_by_id and row.id in extra_by_id:
+            data.update(
+                (key, value)
+                for key, value in extra_by_id[row.id].items()
+                if wants(fields, key)
+            )
+        result.append(data)
+    return result
+
+
+def serialize_apartment_ids(apartment_ids, fields=None, **options):
+    """Serialize apartments by id, keeping the order of ``apartment_ids``
+    (search relevance, distance)."""
+    rows = project_listing(
+        Apartment.query.filter(Apartment.id.in_(apartment_ids)), fields
+    ).all()
+    by_id = {row.id: row for row in rows}
+    ordered = [by_id[i] for i in apartment_ids if i in by_id]
+    return serialize_rows(ordered, fields=fields, **options)
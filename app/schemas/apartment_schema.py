@@ -1,4 +1,12 @@
-from marshmallow import Schema, fields
+from marshmallow import (
+    EXCLUDE,
+    Schema,
+    ValidationError,
+    fields,
+    pre_load,
+    validate,
+    validates_schema,
+)
 
 
 # تعريف مخطط (Schema) لتحويل بيانات الشقق إلى JSON والعكس
@@ -36,3 +44,54 @@ class ApartmentSchema(Schema):
 
     # هذا الحقل يعتمد على المستخدم الحالي، لذا يكون للقراءة فقط في المخطط العام
     isFavorite = fields.Bool(dump_only=True)
+
+
+class ApartmentImportSchema(ApartmentSchema):
+    """
+    Rows of the bulk import (``app.utils.bulk_import``): the same keys as
+    the API output, so an export can be imported back. Unknown keys
+    (``id``, ``rating``...) are ignored.
+    """
+
+    class Meta:
+        unknown = EXCLUDE
+
+    address = fields.Str(required=True)
+    bedrooms = fields.Int(required=True, validate=validate.Range(min=0))
+    bathrooms = fields.Int(load_default=1, validate=validate.Range(min=0))
+    kitchens = fields.Int(load_default=1, validate=validate.Range(min=0))
+    totalBeds = fields.Int(load_default=0, validate=validate.Range(min=0))
+    availableBeds = fields.Int(load_default=0, validate=validate.Range(min=0))
+    price = fields.Float(required=True, validate=validate.Range(min=0))
+    residenceType = fields.Str(required=True)
+    # اسم الحي أو رقمه
+    neighborhood = fields.Str()
+    neighborhood_id = fields.Int()
+    preferred_tenant_type = fields.Str(allow_none=True)
+    whatsappNumber = fields.Str(allow_none=True)
+    latitude = fields.Float(allow_none=True)
+    longitude = fields.Float(allow_none=True)
+    # روابط صور موجودة بالفعل (تُنقل في الخلفية، انظر app.utils.bulk_import)
+    # http(s) فقط: الـ url يُخزن كما هو ولا يجب أن يكون مسار ملف على السيرفر
+    images = fields.List(fields.Url(schemes={"http", "https"}), load_only=True)
+    # للأدمن فقط: مالك الشقة
+    owner_id = fields.Int(load_only=True)
+
+    @pre_load
+    def split_csv_values(self, data, **kwargs):
+        # خلايا الـ CSV: القوائم مفصولة بـ | (نفس صيغة التصدير) والفارغ = غير موجود
+        cleaned = {}
+        for key, value in data.items():
+            if isinstance(value, str):
+                value = value.strip()
+                if value == "":
+                    continue
+                if key in ("features", "images"):
+                    value = [item.strip() for item in value.split("|") if item.strip()]
+            cleaned[key] = value
+        return cleaned
+
+    @validates_schema
+    def require_neighborhood(self, data, **kwargs):
+        if "neighborhood" not in data and "neighborhood_id" not in data:
+            raise ValidationError("neighborhood is required", "neighborhood")
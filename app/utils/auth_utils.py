@@ -1,18 +1,59 @@
 # في ملف app/utils/auth_utils.py
-from flask_jwt_extended import get_jwt_identity, jwt_required
+from flask_jwt_extended import get_jwt_identity, jwt_required, verify_jwt_in_request
 from functools import wraps
 from flask import g, request, jsonify
 
+from app import db
+from app.models.user import User
+from app.utils.cache import get_response_cache
+
+
+def _user_id_for(user_uuid):
+    # uuid -> id لا يتغير أبداً، فنحفظه في الكاش لتوفير استعلام في كل طلب
+    cache = get_response_cache()
+    key = f"user-id:{user_uuid}"
+    user_id = cache.fetch(key, "viewer") if cache is not None else None
+    if user_id is None:
+        user_id = db.session.query(User.id).filter_by(uuid=user_uuid).scalar()
+        if user_id is not None and cache is not None:
+            cache.store(key, user_id, "viewer")
+    return user_id
+
+
+def resolve_viewer():
+    """Put the numeric id of the signed-in user (cookie JWT, optional) on
+    ``g.user_id``, or ``None`` for anonymous visitors, and reset the
+    per-request favorites memo (see ``app.utils.favorites``)."""
+    try:
+        verify_jwt_in_request(optional=True, locations=["cookies"])
+        user_uuid = get_jwt_identity()
+    except Exception:  # توكن منتهي أو غير صالح = زائر
+        user_uuid = None
+    g.user_id = _user_id_for(user_uuid) if user_uuid else None
+    g.pop("favorite_ids", None)
+    g.pop("favorites_token", None)
+    return g.user_id
+
+
+def optional_viewer(f):
+    """Public endpoint that personalizes its response (``isFavorite``) when
+    the visitor is signed in. Must wrap ``conditional_get`` /
+    ``cached_response`` so they see ``g.user_id``."""
 
-def login_required(f):
     @wraps(f)
-    @jwt_required()  # هذا هو الديكوراتور الحقيقي من flask_jwt_extended
     def decorated_function(*args, **kwargs):
-        # 1. احصل على مُعرف المستخدم من الرمز
-        current_user_id = get_jwt_identity()
+        resolve_viewer()
+        return f(*args, **kwargs)
+
+    return decorated_function
+
 
-        # 2. قم بتخزينه في كائن g ليسهل الوصول إليه
-        g.user_id = current_user_id
+def login_required(f):
+    @wraps(f)
+    @jwt_required(locations=["cookies"])  # هذا هو الديكوراتور الحقيقي من flask_jwt_extended
+    def decorated_function(*args, **kwargs):
+        # معرّف المستخدم الرقمي في g (نفس optional_viewer)
+        resolve_viewer()
 
         return f(*args, **kwargs)
 
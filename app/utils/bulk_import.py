@@ -0,0 +1,311 @@
+# app/utils/bulk_import.py
+"""Bulk apartment import from CSV or JSON Lines.
+
+Rows use the keys of the API output (an export from ``?stream=csv`` or
+``?stream=ndjson`` imports back as-is) and are validated with
+``ApartmentImportSchema``. Valid rows are written with Core
+``executemany`` inserts of ``IMPORT_BATCH_SIZE`` rows, so everything the
+ORM hooks would compute per object (uuid, features_mask, geohash,
+version) is computed here instead; search indexing and cache invalidation
+run once per batch / import. Invalid rows are reported with their line
+number and skipped.
+
+Images are only *referenced* in the request (``Image`` rows pointing at
+the given urls). Copying them to our storage is deferred to the image
+pipeline after the commit (``defer_image_ingestion``), so the import
+itself never waits on an upload.
+"""
+import csv
+import io
+import json
+import uuid
+from datetime import datetime
+
+from flask import current_app, jsonify, request
+from marshmallow import ValidationError
+from sqlalchemy import insert, select
+
+from app import db
+from app.models.apartment import FEATURE_FLAGS, Apartment, features_mask_of
+from app.models.image import Image
+from app.models.neighborhood import Neighborhood
+from app.models.user import User
+from app.schemas.apartment_schema import ApartmentImportSchema
+from app.utils.cache import LISTINGS, NEIGHBORHOODS, get_response_cache, mark_stale
+from app.utils.geo import encode_geohash
+from app.utils.image_pipeline import enqueue_images
+from app.utils.search import index_apartments, normalize_arabic
+
+IMPORT_FORMATS = ("csv", "jsonl")
+
+# اسم الميزة المعروض أو اسم العمود -> العمود
+_FEATURE_COLUMNS = {
+    **{label: column for column, label in FEATURE_FLAGS},
+    **{column: column for column, _ in FEATURE_FLAGS},
+}
+
+_schema = ApartmentImportSchema()
+
+
+class InvalidImport(ValueError):
+    """The upload as a whole is unusable (format, size)."""
+
+
+def import_format(filename=None, mimetype=None, requested=None):
+    """``csv`` / ``jsonl`` from ``?format=``, the file name or mimetype."""
+    fmt = (requested or "").lower()
+    if not fmt and filename:
+        fmt = filename.rsplit(".", 1)[-1].lower()
+    if not fmt and mimetype:
+        fmt = "csv" if "csv" in mimetype else "jsonl" if "json" in mimetype else ""
+    fmt = {"ndjson": "jsonl", "json": "jsonl"}.get(fmt, fmt)
+    if fmt not in IMPORT_FORMATS:
+        raise InvalidImport(f"format must be one of: {', '.join(IMPORT_FORMATS)}")
+    return fmt
+
+
+def iter_rows(stream, fmt):
+    """Yield ``(line number, dict | error message)`` from a binary stream."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, "invalid JSON"
+            continue
+        yield line_number, row if isinstance(row, dict) else "expected a JSON object"
+
+
+def neighborhood_map():
+    """``{normalized name: id}``, cached until a neighborhood is written."""
+    cache = get_response_cache()
+    mapping = cache.get([NEIGHBORHOODS], "import-map") if cache is not None else None
+    if mapping is None:
+        mapping = {
+            normalize_arabic(name).strip(): neighborhood_id
+            for neighborhood_id, name in db.session.execute(
+                select(Neighborhood.id, Neighborhood.name)
+            )
+        }
+        if cache is not None:
+            cache.set([NEIGHBORHOODS], "import-map", mapping)
+    return mapping
+
+
+def _apartment_values(data, owner_id, neighborhood_id, is_verified, now):
+    features = set()
+    for feature in data.get("features", ()):
+        column = _FEATURE_COLUMNS.get(feature.strip())
+        if column is None:
+            raise ValidationError({"features": [f"unknown feature: {feature}"]})
+        features.add(column)
+    flags = {column: column in features for column, _ in FEATURE_FLAGS}
+
+    latitude, longitude = data.get("latitude"), data.get("longitude")
+    geohash = None
+    if (
+        latitude is not None
+        and longitude is not None
+        and -90 <= latitude <= 90
+        and -180 <= longitude <= 180
+    ):
+        geohash = encode_geohash(latitude, longitude)
+
+    return {
+        "uuid": str(uuid.uuid4()),
+        "title": data["title"],
+        "description": data.get("description"),
+        "address": data["address"],
+        "price": data["price"],
+        "rooms": data["bedrooms"],
+        "bathrooms": data["bathrooms"],
+        "kitchens": data["kitchens"],
+        "total_beds": data["totalBeds"],
+        "available_beds": data["availableBeds"],
+        "latitude": latitude,
+        "longitude": longitude,
+        "geohash": geohash,
+        "residence_type": data["residenceType"],
+        "preferred_tenant_type": data.get("preferred_tenant_type"),
+        "whatsapp_number": data.get("whatsappNumber"),
+        "is_verified": is_verified,
+        "area": data.get("area"),
+        "floor_number": data.get("floorNumber"),
+        **flags,
+        "features_mask": features_mask_of(flags),
+        "created_at": now,
+        "version": 1,
+        "updated_at": now,
+        "owner_id": owner_id,
+        "neighborhood_id": neighborhood_id,
+    }
+
+
+def _insert_batch(batch):
+    """Insert ``[(values, image urls)]``; returns the new apartment and
+    image ids."""
+    db.session.execute(insert(Apartment.__table__), [values for values, _ in batch])
+    # الـ uuid من عندنا، فنجيب الـ ids باستعلام واحد بدل RETURNING (غير مدعوم في MySQL)
+    ids = dict(
+        db.session.execute(
+            select(Apartment.uuid, Apartment.id).where(
+                Apartment.uuid.in_([values["uuid"] for values, _ in batch])
+            )
+        ).all()
+    )
+    images = [
+        {"apartment_id": ids[values["uuid"]], "url": url}
+        for values, urls in batch
+        for url in urls
+    ]
+    image_ids = []
+    if images:
+        db.session.execute(insert(Image.__table__), images)
+        image_ids = db.session.scalars(
+            select(Image.id).where(Image.apartment_id.in_(ids.values()))
+        ).all()
+    apartment_ids = list(ids.values())
+    index_apartments(apartment_ids)
+    return apartment_ids, image_ids
+
+
+def import_apartments(
+    rows, owner_id=None, default_owner_id=None, is_verified=False, dry_run=False
+):
+    """Validate and insert ``rows`` (``(line, dict | error)`` pairs).
+
+    ``owner_id`` is the owner of every row (owner imports; the rows'
+    ``owner_id`` is ignored); otherwise, for admin imports only, each
+    row's ``owner_id`` is used, falling back to ``default_owner_id``.
+    Returns a summary with per-row errors; the caller commits.
+    """
+    config = current_app.config
+    batch_size = config["IMPORT_BATCH_SIZE"]
+    max_rows = config["IMPORT_MAX_ROWS"]
+    max_errors = config["IMPORT_MAX_REPORTED_ERRORS"]
+
+    neighborhoods = neighborhood_map()
+    neighborhood_ids = set(neighborhoods.values())
+    known_owners = {}  # owner id -> موجود؟ (استعلام واحد لكل مالك مختلف)
+    now = datetime.utcnow()
+
+    summary = {"received": 0, "imported": 0, "failed": 0, "errors": []}
+    batch, image_ids = [], []
+
+    def fail(line, errors):
+        summary["failed"] += 1
+        if len(summary["errors"]) < max_errors:
+            summary["errors"].append({"line": line, "errors": errors})
+
+    def flush():
+        if batch and not dry_run:
+            _, new_image_ids = _insert_batch(batch)
+            image_ids.extend(new_image_ids)
+        summary["imported"] += len(batch)
+        batch.clear()
+
+    for line, row in rows:
+        summary["received"] += 1
+        if summary["received"] > max_rows:
+            raise InvalidImport(f"at most {max_rows} rows per import")
+        if isinstance(row, str):
+            fail(line, {"_row": [row]})
+            continue
+        try:
+            data = _schema.load(row)
+
+            if "neighborhood_id" in data:
+                neighborhood_id = data["neighborhood_id"]
+                if neighborhood_id not in neighborhood_ids:
+                    raise ValidationError({"neighborhood_id": ["unknown neighborhood"]})
+            else:
+                neighborhood_id = neighborhoods.get(
+                    normalize_arabic(data["neighborhood"]).strip()
+                )
+                if neighborhood_id is None:
+                    raise ValidationError({"neighborhood": ["unknown neighborhood"]})
+
+            if owner_id is not None:
+                row_owner = owner_id  # استيراد مالك: owner_id في الصفوف يُتجاهل
+            elif data.get("owner_id") is not None:
+                row_owner = data["owner_id"]
+            else:
+                row_owner = default_owner_id
+            if row_owner is None:
+                raise ValidationError({"owner_id": ["Missing data for required field."]})
+            if row_owner not in known_owners:
+                known_owners[row_owner] = db.session.get(User, row_owner) is not None
+            if not known_owners[row_owner]:
+                raise ValidationError({"owner_id": ["unknown user"]})
+
+            values = _apartment_values(data, row_owner, neighborhood_id, is_verified, now)
+        except ValidationError as e:
+            fail(line, e.normalized_messages())
+            continue
+
+        batch.append((values, data.get("images", [])))
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    if summary["imported"] and not dry_run:
+        mark_stale(db.session, LISTINGS)
+    summary["image_ids"] = image_ids
+    return summary
+
+
+# --- Deferred image ingestion ---
+
+
+def defer_image_ingestion(image_ids):
+    """After the import commits, copy the referenced images to our storage
+    through the image pipeline (``IMPORT_REHOST_IMAGES``); only http(s)
+    urls on public hosts are fetched (``read_url``). The listings show the
+    original urls meanwhile. Returns the number queued."""
+    if not image_ids or not current_app.config["IMPORT_REHOST_IMAGES"]:
+        return 0
+    enqueue_images(image_ids)
+    return len(image_ids)
+
+
+def import_response(owner_id=None, default_owner_id=None, is_verified=False):
+    """Run an import from the current request and answer with its summary.
+
+    The upload is the ``file`` form field or the raw body; ``?format=``
+    overrides the detection, ``?dry_run=true`` only validates.
+    """
+    upload = request.files.get("file")
+    stream = upload.stream if upload is not None else request.stream
+    dry_run = request.args.get("dry_run", "false").lower() in ("1", "true", "yes")
+    try:
+        fmt = import_format(
+            upload.filename if upload is not None else None,
+            upload.mimetype if upload is not None else request.mimetype,
+            request.args.get("format"),
+        )
+        summary = import_apartments(
+            iter_rows(stream, fmt),
+            owner_id=owner_id,
+            default_owner_id=default_owner_id,
+            is_verified=is_verified,
+            dry_run=dry_run,
+        )
+    except InvalidImport as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+
+    image_ids = summary.pop("image_ids")
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+        summary["images_pending"] = defer_image_ingestion(image_ids)
+    summary["dry_run"] = dry_run
+    return jsonify(summary), 201 if summary["imported"] and not dry_run else 200
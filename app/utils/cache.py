@@ -0,0 +1,446 @@
+# app/utils/cache.py
+"""Response cache for the public, read-heavy endpoints.
+
+Two tiers:
+
+* an in-process LRU with TTL (always on, per gunicorn worker), and
+* an optional shared backend (Redis, or ``LocalSharedCache`` as a stand-in
+  for tests/dev) so workers share entries and invalidations.
+
+Entries live under *namespaces* (``apartments`` for listings,
+``apartment`` + ``apartment:<id>`` for detail pages, ``neighborhoods``,
+``favorites:<user id>`` for a viewer's favorite ids). Each namespace has a generation number that is part of
+every key; invalidating a namespace bumps its generation, so stale entries
+simply stop being addressed and age out. Generations start from a random
+seed, so a generation key evicted from the cache (LRU pressure, Redis
+``maxmemory``) comes back under a new seed instead of 0 and never
+re-addresses old entries. Invalidation is write-through:
+ORM writes to Apartment / Image / Review / Neighborhood / Favorite mark
+namespaces on the session and they are bumped right after the commit.
+
+Whole responses are only cached for anonymous viewers: a signed-in
+viewer's pages carry their own ``isFavorite`` flags.
+"""
+import random
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import wraps
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from app.utils.compression import (
+    COMPRESSIBLE_MIMETYPES,
+    compress_bytes,
+    negotiated_encoding,
+    set_encoded_body,
+)
+
+LISTINGS = "apartments"
+DETAILS = "apartment"  # كل صفحات التفاصيل معاً
+NEIGHBORHOODS = "neighborhoods"
+
+
+def apartment_namespace(apartment_id):
+    return f"apartment:{apartment_id}"
+
+
+def favorites_namespace(user_id):
+    return f"favorites:{user_id}"
+
+
+class LRUCache:
+    """Thread-safe LRU with a per-entry TTL."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def add(self, key, value, ttl=None):
+        """Set ``key`` only if it is absent (or expired); returns whether
+        it was set."""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and (item[1] is None or item[1] > now):
+                self._data.move_to_end(key)
+                return False
+            self._data[key] = (value, now + ttl if ttl else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def counter(self, key, initial=0):
+        """Current value of the counter ``key``, created as ``initial``
+        when missing."""
+        with self._lock:
+            if key not in self._data:
+                self._data[key] = (initial, None)
+            self._data.move_to_end(key)
+            value = self._data[key][0]
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            return value
+
+    def incr(self, key, initial=0):
+        """Increment the counter ``key`` (``initial`` when missing)."""
+        with self._lock:
+            value = (self._data.get(key, (initial, None))[0] or 0) + 1
+            self._data[key] = (value, None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class LocalSharedCache(LRUCache):
+    """Stand-in for a shared cache server with the same interface as
+    ``RedisCache``. Useful in tests and single-process dev setups."""
+
+
+class RedisCache:
+    """Shared backend on Redis (optional ``redis`` dependency)."""
+
+    def __init__(self, url, prefix="yallasakn:"):
+        import pickle
+
+        import redis
+
+        self._pickle = pickle
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self._prefix + key)
+        return self._pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl=None):
+        self._client.set(self._prefix + key, self._pickle.dumps(value), ex=ttl or None)
+
+    def add(self, key, value, ttl=None):
+        return bool(
+            self._client.set(self._prefix + key, self._pickle.dumps(value), ex=ttl or None, nx=True)
+        )
+
+    def delete(self, key):
+        self._client.delete(self._prefix + key)
+
+    # العدادات أرقام خام وليست pickle حتى يعمل INCR عليها
+    def counter(self, key, initial=0):
+        pipeline = self._client.pipeline()
+        pipeline.set(self._prefix + key, initial, nx=True)
+        pipeline.get(self._prefix + key)
+        return int(pipeline.execute()[1])
+
+    def incr(self, key, initial=0):
+        pipeline = self._client.pipeline()
+        pipeline.set(self._prefix + key, initial, nx=True)
+        pipeline.incr(self._prefix + key)
+        return pipeline.execute()[1]
+
+
+class ResponseCache:
+    def __init__(self, local, shared=None, default_ttl=60):
+        self.local = local
+        self.shared = shared
+        self.default_ttl = default_ttl
+        self._generations = defaultdict(int)  # بدون shared backend
+        self._metrics_lock = threading.Lock()
+        self.metrics = defaultdict(lambda: defaultdict(int))
+
+    def _count(self, namespace, metric):
+        with self._metrics_lock:
+            self.metrics[namespace.split(":")[0]][metric] += 1
+
+    @staticmethod
+    def _seed():
+        return random.getrandbits(48)
+
+    def generation(self, namespace):
+        if self.shared is None:
+            return self._generations[namespace]
+        return self.shared.counter(f"gen:{namespace}", self._seed())
+
+    def full_key(self, namespaces, key):
+        """Key under the namespaces' current generations. Resolve it once
+        per request: a value stored under it after an invalidation is
+        simply unreachable, never stale."""
+        generations = ".".join(str(self.generation(ns)) for ns in namespaces)
+        return f"{'|'.join(namespaces)}@{generations}:{key}"
+
+    def fetch(self, full_key, label):
+        value = self.local.get(full_key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(full_key)
+            if value is not None:
+                self.local.set(full_key, value, self.default_ttl)
+        self._count(label, "hits" if value is not None else "misses")
+        return value
+
+    def store(self, full_key, value, label, ttl=None):
+        ttl = ttl or self.default_ttl
+        self.local.set(full_key, value, ttl)
+        if self.shared is not None:
+            self.shared.set(full_key, value, ttl)
+        self._count(label, "stores")
+
+    def get(self, namespaces, key):
+        return self.fetch(self.full_key(namespaces, key), namespaces[0])
+
+    def set(self, namespaces, key, value, ttl=None):
+        self.store(self.full_key(namespaces, key), value, namespaces[0], ttl)
+
+    def invalidate(self, *namespaces):
+        for namespace in namespaces:
+            if self.shared is None:
+                self._generations[namespace] += 1
+            else:
+                self.shared.incr(f"gen:{namespace}", self._seed())
+            self._count(namespace, "invalidations")
+
+    def stats(self):
+        with self._metrics_lock:
+            per_namespace = {ns: dict(values) for ns, values in self.metrics.items()}
+        hits = sum(v.get("hits", 0) for v in per_namespace.values())
+        misses = sum(v.get("misses", 0) for v in per_namespace.values())
+        return {
+            "backend": type(self.shared).__name__ if self.shared else "local",
+            "local_entries": len(self.local),
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "namespaces": per_namespace,
+        }
+
+
+def get_response_cache():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get("response_cache")
+
+
+def normalized_request_key():
+    """``path?sorted&args`` with empty values dropped, so equivalent query
+    strings share one entry."""
+    args = sorted(
+        (key, value)
+        for key in request.args
+        for value in request.args.getlist(key)
+        if value != ""
+    )
+    query = "&".join(f"{key}={value}" for key, value in args)
+    return f"{request.path}?{query}"
+
+
+def _apply_entry_body(response, entry):
+    """Send the entry's body in the negotiated encoding. Compressed
+    variants are kept on the entry, so each is computed once per entry.
+    Returns True when a new variant was added (the entry must be stored
+    again for other workers to see it)."""
+    encoding = negotiated_encoding()
+    if (
+        encoding is None
+        or entry["mimetype"] not in COMPRESSIBLE_MIMETYPES
+        or len(entry["body"]) < current_app.config["COMPRESSION_MIN_SIZE"]
+    ):
+        response.set_data(entry["body"])
+        return False
+
+    variants = entry.setdefault("encoded", {})
+    added = encoding not in variants
+    if added:
+        variants[encoding] = compress_bytes(entry["body"], encoding)
+    set_encoded_body(response, variants[encoding], encoding)
+    return added
+
+
+def cached_response(*namespaces, ttl=None):
+    """Cache successful GET responses of a view under ``namespaces``.
+
+    Namespaces may be callables receiving the view kwargs (e.g. to cache a
+    detail page under its ``apartment:<id>`` namespace). Requests with a
+    viewer (``g.user_id``, see ``optional_viewer``) bypass the cache.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_response_cache()
+            if cache is None or request.method != "GET":
+                return view(*args, **kwargs)
+            if g.get("user_id") is not None:
+                response = current_app.make_response(view(*args, **kwargs))
+                response.headers["X-Cache"] = "BYPASS"
+                return response
+
+            resolved = [ns(**kwargs) if callable(ns) else ns for ns in namespaces]
+            label = resolved[0]
+            full_key = cache.full_key(resolved, normalized_request_key())
+            entry = cache.fetch(full_key, label)
+            if entry is not None:
+                response = current_app.response_class(
+                    status=entry["status"], mimetype=entry["mimetype"]
+                )
+                response.headers.extend(entry["headers"])
+                if _apply_entry_body(response, entry):
+                    cache.store(full_key, entry, label, ttl)
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                entry = {
+                    "body": response.get_data(),
+                    "status": response.status_code,
+                    "mimetype": response.mimetype,
+                    "headers": [
+                        (name, value)
+                        for name, value in response.headers
+                        if name.startswith("X-") and name != "X-Cache"
+                    ],
+                }
+                _apply_entry_body(response, entry)
+                cache.store(full_key, entry, label, ttl)
+            response.headers["X-Cache"] = "MISS"
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def mark_stale(session, *namespaces):
+    """Queue namespaces to be invalidated when ``session`` commits (for
+    bulk ``update()``/``delete()`` statements the ORM events do not see)."""
+    session.info.setdefault("cache_invalidate", set()).update(namespaces)
+
+
+def invalidate_cache(*namespaces):
+    """Invalidate right away, outside of any transaction."""
+    cache = get_response_cache()
+    if cache is not None and namespaces:
+        cache.invalidate(*namespaces)
+
+
+# --- Write-through invalidation ---
+
+
+def _namespaces_for(target):
+    from app.models.apartment import Apartment
+    from app.models.favorite import Favorite
+    from app.models.image import Image
+    from app.models.neighborhood import Neighborhood
+    from app.models.review import Review
+    from app.models.user import User
+
+    if isinstance(target, Apartment):
+        return {LISTINGS, apartment_namespace(target.id)}
+    if isinstance(target, (Image, Review)):
+        return {LISTINGS, apartment_namespace(target.apartment_id)}
+    if isinstance(target, User):
+        state = inspect(target)
+        # مستخدم جديد (تسجيل) لا يظهر في أي رد محفوظ
+        if not state.persistent or not any(
+            state.attrs[key].history.has_changes() for key in ("full_name", "phone")
+        ):
+            return set()
+        # اسم ورقم المالك يظهران في بيانات شققه هو فقط
+        apartment_ids = state.session.scalars(
+            select(Apartment.id).where(Apartment.owner_id == target.id)
+        ).all()
+        if not apartment_ids:
+            return set()
+        return {LISTINGS, *map(apartment_namespace, apartment_ids)}
+    if isinstance(target, Favorite):
+        return {favorites_namespace(target.user_id)}
+    if isinstance(target, Neighborhood):
+        # أسماء الأحياء تظهر داخل بيانات الشقق أيضاً
+        return {NEIGHBORHOODS, LISTINGS, DETAILS}
+    return set()
+
+
+def _collect(session, flush_context):
+    # after_flush: الـ ids الجديدة أصبحت معروفة وقوائم new/dirty/deleted لم تُفرّغ بعد
+    for target in list(session.new) + list(session.dirty) + list(session.deleted):
+        namespaces = _namespaces_for(target)
+        if namespaces:
+            mark_stale(session, *namespaces)
+
+
+def _after_commit(session):
+    namespaces = session.info.pop("cache_invalidate", None)
+    if namespaces:
+        invalidate_cache(*namespaces)
+
+
+def _after_rollback(session):
+    session.info.pop("cache_invalidate", None)
+
+
+_events_registered = False
+
+
+def _register_events():
+    global _events_registered
+    if _events_registered:
+        return
+    event.listen(Session, "after_flush", _collect)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_rollback", _after_rollback)
+    _events_registered = True
+
+
+def init_cache(app):
+    config = app.config
+    if not config["RESPONSE_CACHE_ENABLED"]:
+        app.extensions["response_cache"] = None
+        return
+
+    backend = config["CACHE_BACKEND"]
+    shared = None
+    if backend == "shared":
+        shared = LocalSharedCache(config["CACHE_MAX_ENTRIES"] * 4)
+    elif backend == "redis":
+        shared = RedisCache(config["CACHE_REDIS_URL"])
+
+    app.extensions["response_cache"] = ResponseCache(
+        LRUCache(config["CACHE_MAX_ENTRIES"]),
+        shared=shared,
+        default_ttl=config["CACHE_DEFAULT_TTL"],
+    )
+    _register_events()
@@ -0,0 +1,117 @@
+# app/utils/compression.py
+"""Response compression negotiated from ``Accept-Encoding``.
+
+gzip is always available; brotli is used when the optional ``brotli``
+package is installed and the client accepts ``br``. Bodies below
+``COMPRESSION_MIN_SIZE`` are sent as-is (the headers would cost more than
+they save). Streamed responses (generators) are compressed chunk by chunk
+without buffering the whole body. The response cache stores compressed
+variants next to the raw body, so a cache hit never recompresses.
+"""
+import zlib
+
+from flask import current_app, has_request_context, request
+
+try:
+    import brotli
+except ImportError:  # brotli اختياري
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "text/csv",
+    "text/html",
+    "text/plain",
+}
+
+
+def available_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiated_encoding():
+    """Best encoding the client accepts, or ``None``."""
+    if not has_request_context() or not current_app.config["COMPRESSION_ENABLED"]:
+        return None
+    return request.accept_encodings.best_match(available_encodings())
+
+
+def _compressor(encoding):
+    config = current_app.config
+    if encoding == "br":
+        return brotli.Compressor(quality=config["COMPRESSION_BROTLI_QUALITY"])
+    # wbits=31: صيغة gzip (header + trailer)
+    return zlib.compressobj(config["COMPRESSION_LEVEL"], zlib.DEFLATED, 31)
+
+
+def compress_bytes(data, encoding):
+    compressor = _compressor(encoding)
+    if encoding == "br":
+        return compressor.process(data) + compressor.finish()
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks, encoding):
+    compressor = _compressor(encoding)
+    if encoding == "br":
+        feed, finish = compressor.process, compressor.finish
+    else:
+        feed, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        data = feed(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def variant_etag(etag, encoding):
+    """Each encoding is its own representation, so it gets its own ETag."""
+    return f"{etag}-{encoding}" if encoding else etag
+
+
+def is_compressible(response):
+    return (
+        response.mimetype in COMPRESSIBLE_MIMETYPES
+        and 200 <= response.status_code < 300
+        and response.status_code != 204
+        and "Content-Encoding" not in response.headers
+        and not response.direct_passthrough
+    )
+
+
+def set_encoded_body(response, body, encoding):
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(variant_etag(etag, encoding), weak)
+
+
+def compress_response(response):
+    if not is_compressible(response):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = negotiated_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    body = response.get_data()
+    if len(body) < current_app.config["COMPRESSION_MIN_SIZE"]:
+        return response
+    set_encoded_body(response, compress_bytes(body, encoding), encoding)
+    return response
+
+
+def init_compression(app):
+    if app.config["COMPRESSION_ENABLED"]:
+        app.after_request(compress_response)
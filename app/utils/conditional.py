@@ -0,0 +1,152 @@
+# app/utils/conditional.py
+"""Conditional GET (ETag / Last-Modified) for apartment endpoints.
+
+Validators come from ``Apartment.version`` / ``Apartment.updated_at``, which
+every write path bumps (ORM updates, image changes, rating updates, owner
+and neighborhood renames). The state is read with a single narrow query
+(cached for listings, see ``listing_state``) and compared with the request's
+``If-None-Match`` / ``If-Modified-Since`` before the view runs, so a 304
+costs no ORM loading and no serialization.
+"""
+import hashlib
+from datetime import timezone
+from functools import wraps
+
+from flask import current_app, g, request
+from sqlalchemy import func
+
+from app import db
+from app.models.apartment import Apartment
+from app.models.favorite import Favorite
+from app.utils.cache import LISTINGS, get_response_cache, normalized_request_key
+from app.utils.compression import available_encodings, variant_etag
+from app.utils.favorites import viewer_favorites_token
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag for the current URL (path + normalized args), viewer (and
+    their favorites) and the given state ``parts``."""
+    viewer = (g.get("user_id"), viewer_favorites_token())
+    raw = "|".join(
+        str(part) for part in (normalized_request_key(), *viewer, *parts)
+    )
+    return hashlib.sha1(raw.encode()).hexdigest()[:24]
+
+
+def apartment_state(viewer_id=None, viewer_uuid=None, **filters):
+    """``(version, updated_at)`` of one apartment, or ``None`` if missing.
+
+    With a viewer the favorite flag is part of the token, since it is part
+    of the payload but does not bump the apartment version.
+    """
+    row = (
+        db.session.query(
+            Apartment.id,
+            Apartment.version,
+            Apartment.updated_at,
+            Favorite.flag_for(Apartment.id, viewer_id, viewer_uuid).label("is_favorite"),
+        )
+        .filter_by(**filters)
+        .first()
+    )
+    if row is None:
+        return None
+    token = (row.id, row.version)
+    if viewer_id is not None or viewer_uuid is not None:
+        token += (bool(row.is_favorite),)
+    return token, row.updated_at
+
+
+def _query_listing_state(query):
+    count, max_id, version_sum, last_modified = (
+        query.order_by(None)
+        .with_entities(
+            func.count(Apartment.id),
+            func.max(Apartment.id),
+            func.coalesce(func.sum(Apartment.version), 0),
+            func.max(Apartment.updated_at),
+        )
+        .one()
+    )
+    return (count, max_id, version_sum), last_modified
+
+
+def listing_state(query):
+    """Aggregate validator of a listing query: any insert, delete or update
+    in the matched set changes at least one of these values.
+
+    The aggregate scans the matched set, so it is cached per URL under the
+    listings namespace: every write that can change a listing bumps that
+    generation, and requests in between read the state without a query.
+    """
+    cache = get_response_cache()
+    if cache is None:
+        return _query_listing_state(query)
+    full_key = cache.full_key([LISTINGS], f"state:{normalized_request_key()}")
+    state = cache.fetch(full_key, "listing_state")
+    if state is None:
+        state = _query_listing_state(query)
+        cache.store(full_key, state, "listing_state")
+    return state
+
+
+def _as_utc(value):
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def _matching_etag(etag, last_modified):
+    """The ETag variant (plain or per encoding) the client already holds,
+    or ``None`` when the representation must be sent."""
+    if request.if_none_match:
+        for encoding in (None, *available_encodings()):
+            variant = variant_etag(etag, encoding)
+            if request.if_none_match.contains(variant):
+                return variant
+        return None
+    since = request.if_modified_since
+    if since and last_modified and last_modified <= since:
+        return etag
+    return None
+
+
+def conditional_get(state):
+    """Answer ``If-None-Match`` / ``If-Modified-Since`` with 304 and tag
+    200 responses with ``ETag`` and ``Last-Modified``.
+
+    ``state`` receives the view kwargs and returns ``(token, updated_at)``,
+    or ``None`` to let the view answer (404s, bad filters).
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            current = state(**kwargs) if request.method == "GET" else None
+            if current is None:
+                return view(*args, **kwargs)
+
+            token, updated_at = current
+            etag = make_etag(token)
+            last_modified = _as_utc(updated_at)
+
+            matched = _matching_etag(etag, last_modified)
+            if matched:
+                response = current_app.response_class(status=304)
+                response.set_etag(matched)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                response.set_etag(
+                    variant_etag(etag, response.headers.get("Content-Encoding"))
+                )
+            if last_modified:
+                response.last_modified = last_modified
+            # الكاش في المتصفح مسموح لكن مع إعادة التحقق في كل مرة
+            response.cache_control.no_cache = True
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,172 @@
+# app/utils/facets.py
+"""Filters and facet counts for the apartment filter endpoint.
+
+Facets are computed with grouped aggregate queries over the filtered set,
+so the sidebar counts cost three small queries regardless of how many
+apartments match.
+"""
+from sqlalchemy import case, func
+
+from app.models.apartment import FEATURE_BITS, Apartment
+from app.models.neighborhood import Neighborhood
+
+# اسم الميزة في الـ query string -> العمود (وبالتالي الـ bit في features_mask)
+AMENITY_COLUMNS = {
+    "wifi": "has_wifi",
+    "ac": "has_ac",
+    "balcony": "has_balcony",
+    "elevator": "has_elevator",
+    "washing_machine": "has_washing_machine",
+    "oven": "has_oven",
+    "gas": "has_gas",
+    "transport": "near_transport",
+}
+
+# شرائح السعر (الحد الأدنى شامل، الأعلى غير شامل)
+PRICE_BUCKETS = [
+    ("0-1000", 0, 1000),
+    ("1000-2000", 1000, 2000),
+    ("2000-3000", 2000, 3000),
+    ("3000-5000", 3000, 5000),
+    ("5000+", 5000, None),
+]
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+def _csv(value):
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+def _number(args, name, cast=float):
+    value = args.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return cast(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+
+
+def requested_amenities(args):
+    """Amenities from ``?amenities=wifi,ac`` and/or ``?has_wifi=true``."""
+    names = set(_csv(args.get("amenities")))
+    for name, column in AMENITY_COLUMNS.items():
+        if args.get(column, "").lower() in TRUE_VALUES:
+            names.add(name)
+    unknown = names - set(AMENITY_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown amenities: {', '.join(sorted(unknown))}")
+    return names
+
+
+def apply_apartment_filters(query, args):
+    """Apply the filter query-string ``args`` to an Apartment query.
+
+    Raises ``ValueError`` with a client-facing message on bad input.
+    """
+    neighborhood_ids = _csv(args.get("neighborhood_id"))
+    if neighborhood_ids:
+        try:
+            query = query.filter(
+                Apartment.neighborhood_id.in_([int(n) for n in neighborhood_ids])
+            )
+        except ValueError:
+            raise ValueError("neighborhood_id must be a number")
+
+    min_price = _number(args, "min_price")
+    max_price = _number(args, "max_price")
+    if min_price is not None:
+        query = query.filter(Apartment.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Apartment.price <= max_price)
+
+    rooms = _number(args, "rooms", int)
+    if rooms:
+        query = query.filter(Apartment.rooms == rooms)
+
+    residence_types = _csv(args.get("residence_type"))
+    if residence_types:
+        query = query.filter(Apartment.residence_type.in_(residence_types))
+
+    tenant_types = _csv(args.get("preferred_tenant_type"))
+    if tenant_types:
+        query = query.filter(Apartment.preferred_tenant_type.in_(tenant_types))
+
+    min_beds = _number(args, "min_available_beds", int)
+    if args.get("has_available_beds", "").lower() in TRUE_VALUES:
+        min_beds = max(min_beds or 0, 1)
+    if min_beds:
+        query = query.filter(Apartment.available_beds >= min_beds)
+
+    min_area = _number(args, "min_area")
+    max_area = _number(args, "max_area")
+    if min_area is not None:
+        query = query.filter(Apartment.area >= min_area)
+    if max_area is not None:
+        query = query.filter(Apartment.area <= max_area)
+
+    required = sum(FEATURE_BITS[AMENITY_COLUMNS[name]] for name in requested_amenities(args))
+    if required:
+        query = query.filter(Apartment.has_features(required))
+
+    return query
+
+
+def _price_bucket_condition(low, high):
+    if high is None:
+        return Apartment.price >= low
+    return (Apartment.price >= low) & (Apartment.price < high)
+
+
+def compute_facets(query):
+    """Counts per neighborhood, price bucket, amenity and residence type
+    for the apartments matched by ``query``."""
+    query = query.order_by(None)
+
+    def count_if(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+    totals = query.with_entities(
+        func.count(Apartment.id),
+        *[count_if(_price_bucket_condition(low, high)) for _, low, high in PRICE_BUCKETS],
+        *[
+            count_if(Apartment.features_mask.op("&")(FEATURE_BITS[column]) != 0)
+            for column in AMENITY_COLUMNS.values()
+        ],
+    ).one()
+    total = totals[0]
+    price_counts = totals[1 : 1 + len(PRICE_BUCKETS)]
+    amenity_counts = totals[1 + len(PRICE_BUCKETS) :]
+
+    neighborhoods = (
+        query.with_entities(Neighborhood.id, Neighborhood.name, func.count(Apartment.id))
+        .join(Neighborhood, Apartment.neighborhood_id == Neighborhood.id)
+        .group_by(Neighborhood.id, Neighborhood.name)
+        .order_by(func.count(Apartment.id).desc())
+        .all()
+    )
+    residence_types = (
+        query.with_entities(Apartment.residence_type, func.count(Apartment.id))
+        .group_by(Apartment.residence_type)
+        .order_by(func.count(Apartment.id).desc())
+        .all()
+    )
+
+    return {
+        "total": total,
+        "neighborhoods": [
+            {"id": n_id, "name": name, "count": count}
+            for n_id, name, count in neighborhoods
+        ],
+        "price": [
+            {"bucket": label, "min": low, "max": high, "count": count}
+            for (label, low, high), count in zip(PRICE_BUCKETS, price_counts)
+        ],
+        "amenities": {
+            name: count for name, count in zip(AMENITY_COLUMNS, amenity_counts)
+        },
+        "residenceTypes": [
+            {"value": value, "count": count} for value, count in residence_types
+        ],
+    }
@@ -0,0 +1,69 @@
+# app/utils/favorites.py
+"""The signed-in viewer's favorites, for ``isFavorite`` flags.
+
+Only the apartments on the page being rendered are checked, with a single
+``Favorite.apartment_id IN (...)`` query. The answer is memoized on ``g``
+for the rest of the request and cached under the viewer's
+``favorites:<user id>`` namespace, which every Favorite write bumps
+(see ``app.utils.cache``).
+"""
+from flask import g, has_request_context
+from sqlalchemy import func
+
+from app import db
+from app.models.favorite import Favorite
+from app.utils.cache import favorites_namespace, get_response_cache
+
+
+def _viewer_id():
+    return g.get("user_id") if has_request_context() else None
+
+
+def viewer_favorite_ids(apartment_ids):
+    """The subset of ``apartment_ids`` the viewer saved, as a frozenset."""
+    user_id = _viewer_id()
+    apartment_ids = frozenset(apartment_ids)
+    if user_id is None or not apartment_ids:
+        return frozenset()
+
+    memo = g.setdefault("favorite_ids", {})
+    if apartment_ids in memo:
+        return memo[apartment_ids]
+
+    cache = get_response_cache()
+    namespace = favorites_namespace(user_id)
+    full_key = None
+    found = None
+    if cache is not None:
+        full_key = cache.full_key([namespace], ",".join(map(str, sorted(apartment_ids))))
+        found = cache.fetch(full_key, namespace)
+    if found is None:
+        found = frozenset(
+            apartment_id
+            for (apartment_id,) in db.session.query(Favorite.apartment_id).filter(
+                Favorite.user_id == user_id, Favorite.apartment_id.in_(apartment_ids)
+            )
+        )
+        if cache is not None:
+            cache.store(full_key, found, namespace)
+
+    memo[apartment_ids] = found
+    return found
+
+
+def viewer_favorites_token():
+    """Changes whenever the viewer's favorites do; part of the ETag of
+    personalized responses. Read from the table (the unique
+    ``(user_id, apartment_id)`` index), so it holds across workers."""
+    user_id = _viewer_id()
+    if user_id is None:
+        return None
+    if "favorites_token" not in g:
+        g.favorites_token = tuple(
+            db.session.query(
+                func.count(Favorite.id), func.coalesce(func.sum(Favorite.id), 0)
+            )
+            .filter(Favorite.user_id == user_id)
+            .one()
+        )
+    return g.favorites_token
@@ -0,0 +1,38 @@
+# app/utils/fields.py
+"""Sparse fieldsets: ``?fields=title,price,main_image``.
+
+Serializers describe each output key as a zero-argument builder, so keys
+the client did not ask for are never computed – and relationships behind
+them are neither loaded nor eager-loaded.
+"""
+from flask import has_request_context, jsonify, request
+
+
+class InvalidFields(ValueError):
+    """Raised when ``?fields=`` names a key the endpoint does not return."""
+
+
+def requested_fields(allowed, param="fields"):
+    """Parse ``?fields=`` into a frozenset, or ``None`` for "everything"."""
+    raw = request.args.get(param, "") if has_request_context() else ""
+    names = {part.strip() for part in raw.split(",") if part.strip()}
+    if not names:
+        return None
+    unknown = names - set(allowed)
+    if unknown:
+        raise InvalidFields(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return frozenset(names)
+
+
+def wants(fields, *names):
+    """True when any of ``names`` is part of the (possibly full) fieldset."""
+    return fields is None or any(name in fields for name in names)
+
+
+def build_dict(builders, fields=None):
+    """Evaluate only the requested builders, keeping declaration order."""
+    return {name: build() for name, build in builders.items() if wants(fields, name)}
+
+
+def invalid_fields_response(error):
+    return jsonify({"error": str(error)}), 400
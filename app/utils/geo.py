@@ -0,0 +1,119 @@
+# app/utils/geo.py
+"""Geohash helpers for map queries on apartment coordinates.
+
+A geohash prefix is a rectangular cell; every point inside the cell has a
+geohash starting with that prefix, so ``geohash LIKE 'prefix%'`` is an index
+range scan. Queries cover their area with a handful of cells (coarse
+prefilter) and then check the exact distance / box on the few candidates.
+"""
+import math
+
+GEOHASH_PRECISION = 9  # ~4.8m x 4.8m
+EARTH_RADIUS_KM = 6371.0088
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True  # الـ bits الزوجية لخط الطول
+    while len(chars) < precision:
+        interval, value = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (interval[0] + interval[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            interval[0] = mid
+        else:
+            bits <<= 1
+            interval[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def cell_size(precision):
+    """Return ``(lat_degrees, lng_degrees)`` spanned by one cell."""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def cover_bbox(south, west, north, east, max_cells=16):
+    """Return the geohash prefixes of the finest grid that covers the box
+    with at most ``max_cells`` cells."""
+    south, north = _clamp(south, -90.0, 90.0), _clamp(north, -90.0, 90.0)
+    west, east = _clamp(west, -180.0, 180.0), _clamp(east, -180.0, 180.0)
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_step, lng_step = cell_size(precision)
+        rows = math.floor(north / lat_step) - math.floor(south / lat_step) + 1
+        cols = math.floor(east / lng_step) - math.floor(west / lng_step) + 1
+        if rows * cols <= max_cells:
+            break
+
+    cells = set()
+    for row in range(rows):
+        latitude = min(south + row * lat_step, north)
+        for col in range(cols):
+            longitude = min(west + col * lng_step, east)
+            cells.add(encode_geohash(latitude, longitude, precision))
+    # نقاط الحواف العليا/اليمنى قد تقع في خلية إضافية
+    for latitude in (south, north):
+        for longitude in (west, east):
+            cells.add(encode_geohash(latitude, longitude, precision))
+    return sorted(cells)
+
+
+def radius_bbox(latitude, longitude, radius_km):
+    """Bounding box ``(south, west, north, east)`` around a circle."""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(latitude))
+    if cos_lat < 1e-6:
+        lng_delta = 180.0
+    else:
+        lng_delta = min(180.0, lat_delta / cos_lat)
+    return (
+        latitude - lat_delta,
+        longitude - lng_delta,
+        latitude + lat_delta,
+        longitude + lng_delta,
+    )
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def parse_bbox(value):
+    """Parse ``west,south,east,north`` (GeoJSON order) or raise ValueError."""
+    parts = [float(part) for part in (value or "").split(",")]
+    if len(parts) != 4:
+        raise ValueError("bbox must be west,south,east,north")
+    west, south, east, north = parts
+    if south > north or west > east:
+        raise ValueError("bbox corners are inverted")
+    if not (-90 <= south <= 90 and -90 <= north <= 90):
+        raise ValueError("latitude out of range")
+    if not (-180 <= west <= 180 and -180 <= east <= 180):
+        raise ValueError("longitude out of range")
+    return south, west, north, east
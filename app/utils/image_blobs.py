@@ -0,0 +1,175 @@
+# app/utils/image_blobs.py
+"""Content-addressed image storage: deduplication and reference counting.
+
+Every processed upload is an ``ImageBlob`` keyed by the SHA-256 of the
+uploaded bytes. Its files are named after that hash, not after an
+apartment, so the same photo uploaded to several listings is found by
+hash and reused: no decoding, no upload, no extra CDN storage. When
+``IMAGE_PHASH_DEDUPE`` is on, a different file of the same picture
+(re-encoded, resized) is matched on its perceptual hash too; that case
+is only known after processing, so its freshly stored files are deleted
+and the existing blob is used instead.
+
+``Image`` rows point at their blob and ``ImageBlob.ref_count`` follows
+them (ORM events in ``app.models.image_blob``; Core inserts call
+``adjust_ref_counts``). When the count drops to zero the blob row is
+deleted in the same transaction, and its files are deleted once that
+transaction commits. ``flask images gc`` recounts and sweeps whatever
+was missed.
+"""
+from flask import current_app, has_app_context
+from sqlalchemy import delete, event, func, select, update
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models.image import Image
+from app.models.image_blob import ImageBlob
+from app.utils.image_processing import delete_stored, stored_urls
+from app.utils.storage import get_storage
+
+
+def find_blobs(digests):
+    """``{sha256: ImageBlob}`` for the known digests, in one query."""
+    digests = set(digests)
+    if not digests:
+        return {}
+    blobs = ImageBlob.query.filter(ImageBlob.sha256.in_(digests)).all()
+    return {blob.sha256: blob for blob in blobs}
+
+
+def register_blob(storage, values):
+    """The blob for processed upload ``values`` (``process_upload``):
+    an existing one with the same bytes (or picture, with
+    ``IMAGE_PHASH_DEDUPE``), else a new row. The caller commits."""
+    blob = find_blobs([values["sha256"]]).get(values["sha256"])
+    if blob is not None:
+        # رُفع بالتوازي: نفس المفاتيح ونفس الملفات، لا شيء نمسحه
+        return blob
+    if current_app.config["IMAGE_PHASH_DEDUPE"] and values.get("phash"):
+        blob = (
+            ImageBlob.query.filter_by(phash=values["phash"])
+            .order_by(ImageBlob.id)
+            .first()
+        )
+        if blob is not None:
+            delete_stored(storage, stored_urls(values))
+            return blob
+    blob = ImageBlob(**values)
+    db.session.add(blob)
+    db.session.flush()
+    return blob
+
+
+def attach_blob(image, blob):
+    """Point ``image`` at ``blob`` (the ref count follows on flush)."""
+    for key, value in blob.image_values().items():
+        setattr(image, key, value)
+
+
+def adjust_ref_counts(counts):
+    """Add ``{blob id: n}`` to the ref counts, for Core inserts of
+    ``Image`` rows that bypass the ORM events."""
+    table = ImageBlob.__table__
+    for blob_id, count in counts.items():
+        db.session.execute(
+            update(table)
+            .where(table.c.id == blob_id)
+            .values(ref_count=table.c.ref_count + count)
+        )
+
+
+def discard_unregistered(storage, values_list):
+    """After a failed transaction: delete the files of processed uploads
+    whose blob did not survive (another transaction may have committed the
+    same bytes, under the same keys, meanwhile)."""
+    known = find_blobs(values["sha256"] for values in values_list)
+    delete_stored(
+        storage,
+        [
+            url
+            for values in values_list
+            if values["sha256"] not in known
+            for url in stored_urls(values)
+        ],
+    )
+
+
+def _files_of(rows):
+    return [url for row in rows for url in stored_urls({"url": row.url, "variants": row.variants})]
+
+
+def delete_blob_files(urls):
+    """Delete stored files, in the background when the pipeline has workers."""
+    if not urls or not has_app_context():
+        return
+    pipeline = current_app.extensions.get("image_pipeline")
+    storage = get_storage()
+    if pipeline is None:
+        delete_stored(storage, urls)
+    else:
+        pipeline.submit_task(delete_stored, storage, urls)
+
+
+def collect_garbage():
+    """Recount every blob from the ``image`` table and delete the ones no
+    image uses. Returns the number of blobs deleted."""
+    table = ImageBlob.__table__
+    counts = (
+        select(func.count(Image.id))
+        .where(Image.blob_id == table.c.id)
+        .scalar_subquery()
+    )
+    db.session.execute(update(table).values(ref_count=counts))
+    rows = db.session.execute(
+        select(table.c.id, table.c.url, table.c.variants).where(table.c.ref_count <= 0)
+    ).all()
+    if rows:
+        db.session.execute(
+            delete(table).where(table.c.id.in_([row.id for row in rows]), table.c.ref_count <= 0)
+        )
+    db.session.commit()
+    delete_stored(get_storage(), _files_of(rows))
+    return len(rows)
+
+
+# --- Session hooks ---
+
+
+def _delete_released(session, flush_context):
+    released = session.info.pop("released_blobs", None)
+    if not released:
+        return
+    table = ImageBlob.__table__
+    connection = session.connection()
+    rows = connection.execute(
+        select(table.c.id, table.c.url, table.c.variants).where(
+            table.c.id.in_(released), table.c.ref_count <= 0
+        )
+    ).all()
+    if rows:
+        connection.execute(
+            delete(table).where(table.c.id.in_([row.id for row in rows]), table.c.ref_count <= 0)
+        )
+        session.info.setdefault("orphaned_files", []).extend(_files_of(rows))
+
+
+def _after_commit(session):
+    delete_blob_files(session.info.pop("orphaned_files", None))
+
+
+def _after_rollback(session):
+    session.info.pop("released_blobs", None)
+    session.info.pop("orphaned_files", None)
+
+
+_events_registered = False
+
+
+def register_blob_events():
+    global _events_registered
+    if _events_registered:
+        return
+    event.listen(Session, "after_flush_postexec", _delete_released)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_rollback", _after_rollback)
+    _events_registered = True
@@ -0,0 +1,215 @@
+# app/utils/image_pipeline.py
+"""Background upload of apartment images.
+
+Creating a listing no longer waits on the storage provider: the request
+only *spools* each upload to ``IMAGE_SPOOL_FOLDER`` and inserts an
+``Image`` row with ``status="pending"``. After the commit the ids are
+handed to a bounded worker pool (``IMAGE_WORKERS`` threads) that
+processes the file (``app.utils.image_processing``) and stores it and its
+variants through the configured backend (``app.utils.storage``),
+retrying with exponential backoff — unless a blob with the same content
+already exists (``app.utils.image_blobs``). It then points the image at
+that blob and marks it ``ready``. An image becomes ``failed`` after
+``IMAGE_UPLOAD_RETRIES`` retries, or at once if the file is not an image.
+
+Pending and failed images are not part of any API payload. Rows left
+pending by a restart are picked up again with ``flask images process``.
+``IMAGE_PIPELINE_MODE=sync`` runs the upload inline after the commit
+(tests, single-process scripts).
+"""
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.utils import secure_filename
+
+from app import db
+from app.models.image import Image
+from app.utils.image_blobs import (
+    attach_blob,
+    find_blobs,
+    register_blob,
+    register_blob_events,
+)
+from app.utils.image_processing import (
+    InvalidImage,
+    content_digest,
+    process_upload,
+    read_source,
+    read_url,
+)
+from app.utils.storage import get_storage
+
+PIPELINE_MODES = ("thread", "sync")
+
+
+def spool_upload(file_storage):
+    """Write an uploaded file to the spool folder; returns its path."""
+    folder = current_app.config["IMAGE_SPOOL_FOLDER"]
+    os.makedirs(folder, exist_ok=True)
+    name = secure_filename(file_storage.filename or "") or "image"
+    extension = os.path.splitext(name)[1].lower() or ".jpg"
+    path = os.path.join(folder, f"{uuid.uuid4().hex}{extension}")
+    file_storage.save(path)
+    return path
+
+
+def discard_spool(image):
+    """Remove the spooled file of ``image`` (if any)."""
+    if image.spool_path:
+        try:
+            os.remove(image.spool_path)
+        except FileNotFoundError:
+            pass
+
+
+def _blob_for(storage, image):
+    # الـ url من المستخدم (استيراد): لا يُقرأ كمسار محلي أبداً
+    data = read_source(image.spool_path) if image.spool_path else read_url(image.url)
+    digest = content_digest(data)
+    blob = find_blobs([digest]).get(digest)
+    if blob is None:
+        blob = register_blob(storage, process_upload(storage, data, digest))
+    return blob
+
+
+def process_image(image_id):
+    """Upload one image with retries; commits its final state.
+
+    Pending images are uploaded from their spool file; ready images that
+    still point elsewhere (bulk imports) are re-hosted from their url,
+    which must be http(s) on a public host (``read_url``).
+    Returns the image status, or ``None`` when the row is gone.
+    """
+    config = current_app.config
+    image = db.session.get(Image, image_id)
+    if image is None:
+        return None
+    if not image.spool_path and not image.url:
+        image.status = Image.FAILED
+        image.last_error = "nothing to upload"
+        db.session.commit()
+        return image.status
+
+    storage = get_storage()
+    retries = config["IMAGE_UPLOAD_RETRIES"]
+    backoff = config["IMAGE_RETRY_BACKOFF"]
+    for attempt in range(retries + 1):
+        image.attempts = (image.attempts or 0) + 1
+        try:
+            blob = _blob_for(storage, image)
+        except InvalidImage as e:
+            # إعادة المحاولة لن تفيد
+            image.last_error = str(e)[:255]
+            discard_spool(image)
+            image.spool_path = None
+            image.status = Image.FAILED
+            break
+        except Exception as e:
+            if isinstance(e, SQLAlchemyError):
+                # مثلاً blob بنفس الـ hash سُجّل من عامل آخر: المحاولة التالية تجده
+                db.session.rollback()
+            image.last_error = str(e)[:255]
+            current_app.logger.warning(
+                "Upload of image %s failed (attempt %s): %s", image.id, attempt + 1, e
+            )
+            if attempt < retries:
+                time.sleep(backoff * 2**attempt)
+            continue
+        discard_spool(image)
+        attach_blob(image, blob)
+        image.spool_path = None
+        image.status = Image.READY
+        image.last_error = None
+        break
+    else:
+        # نحتفظ بالملف المؤقت لإعادة المحاولة لاحقاً
+        image.status = Image.FAILED
+    db.session.commit()
+    return image.status
+
+
+class ImagePipeline:
+    """Bounded pool of upload workers, created on first use."""
+
+    def __init__(self, app):
+        self.app = app
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.app.config["IMAGE_WORKERS"],
+                thread_name_prefix="image-upload",
+            )
+        return self._executor
+
+    def _run(self, image_id):
+        with self.app.app_context():
+            try:
+                return process_image(image_id)
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception("Could not process image %s", image_id)
+                return None
+
+    def _run_task(self, func, args):
+        with self.app.app_context():
+            try:
+                return func(*args)
+            except Exception:
+                self.app.logger.exception("Background image task %s failed", func.__name__)
+                return None
+
+    def submit_task(self, func, *args):
+        """Run ``func(*args)`` on the pool (inline in ``sync`` mode)."""
+        if self.app.config["IMAGE_PIPELINE_MODE"] == "sync":
+            return func(*args)
+        return self.executor.submit(self._run_task, func, args)
+
+    def submit(self, image_ids):
+        """Queue ``image_ids`` (call after the commit). Returns the futures,
+        or the statuses in ``sync`` mode."""
+        if self.app.config["IMAGE_PIPELINE_MODE"] == "sync":
+            return [process_image(image_id) for image_id in image_ids]
+        return [self.executor.submit(self._run, image_id) for image_id in image_ids]
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+def enqueue_images(image_ids):
+    image_ids = list(image_ids)
+    if not image_ids:
+        return []
+    return current_app.extensions["image_pipeline"].submit(image_ids)
+
+
+def process_pending(statuses=(Image.PENDING,), limit=None):
+    """Upload the images in ``statuses`` now (CLI / recovery); returns the
+    number processed."""
+    query = (
+        db.session.query(Image.id)
+        .filter(Image.status.in_(statuses))
+        .order_by(Image.id)
+    )
+    if limit:
+        query = query.limit(limit)
+    image_ids = [image_id for image_id, in query]
+    for image_id in image_ids:
+        process_image(image_id)
+    return len(image_ids)
+
+
+def init_image_pipeline(app):
+    mode = app.config["IMAGE_PIPELINE_MODE"]
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Unknown IMAGE_PIPELINE_MODE: {mode}")
+    app.extensions["image_pipeline"] = ImagePipeline(app)
+    register_blob_events()
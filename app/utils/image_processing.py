@@ -0,0 +1,325 @@
+# app/utils/image_processing.py
+"""Normalize uploaded photos and build their responsive variants (Pillow).
+
+``process_upload`` decodes the upload once, applies the EXIF orientation
+and re-encodes it without any metadata (phone photos carry GPS
+coordinates), capped at ``IMAGE_MAX_DIMENSION``. It then stores that copy
+plus one file per width in ``IMAGE_VARIANT_WIDTHS`` and format in
+``IMAGE_VARIANT_FORMATS`` (never upscaled), all named after the SHA-256
+of the uploaded bytes. It returns the ``ImageBlob`` column values,
+including the pixel size, the dominant colour and a blurhash, so clients
+can reserve the layout and paint a placeholder before any image bytes
+arrive. Deduplication and reference counting live in
+``app.utils.image_blobs``.
+"""
+import hashlib
+import http.client
+import io
+import ipaddress
+import math
+import socket
+import urllib.parse
+import urllib.request
+
+from flask import current_app
+from PIL import Image as PILImage, ImageOps, UnidentifiedImageError
+
+# الامتداد و الـ content type لكل صيغة في IMAGE_VARIANT_FORMATS
+FORMAT_EXTENSIONS = {"jpeg": "jpg", "webp": "webp", "png": "png"}
+
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+class InvalidImage(ValueError):
+    """The upload is not an image Pillow can decode."""
+
+
+def _public_address(address):
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def check_remote_url(url):
+    """Raise ``InvalidImage`` unless ``url`` is http(s) on a host that
+    resolves only to public addresses (no loopback, private, link-local or
+    metadata endpoints)."""
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise InvalidImage(f"only http(s) image urls can be fetched: {url}")
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(parts.hostname, None)}
+    except (socket.gaierror, UnicodeError) as e:
+        raise InvalidImage(f"cannot resolve {parts.hostname}: {e}") from e
+    if not addresses or not all(map(_public_address, addresses)):
+        raise InvalidImage(f"image host is not public: {parts.hostname}")
+
+
+def _connect_public(address, *args, **kwargs):
+    # الفحص على العنوان الفعلي بعد الاتصال: DNS قد يتغير بعد check_remote_url
+    sock = socket.create_connection(address, *args, **kwargs)
+    if not _public_address(sock.getpeername()[0]):
+        sock.close()
+        raise InvalidImage(f"image host is not public: {address[0]}")
+    return sock
+
+
+class _PublicHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _connect_public
+
+
+class _PublicHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _connect_public
+
+
+class _PublicHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_PublicHTTPConnection, req)
+
+
+class _PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_PublicHTTPSConnection, req, context=self._context)
+
+
+class _PublicRedirectHandler(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        check_remote_url(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+def _remote_opener():
+    # بدون proxy ولا file:// أو ftp://: اتصال مباشر بالمضيف بعد فحصه فقط
+    opener = urllib.request.OpenerDirector()
+    for handler in (
+        _PublicHTTPHandler(),
+        _PublicHTTPSHandler(),
+        _PublicRedirectHandler(),
+        urllib.request.HTTPDefaultErrorHandler(),
+        urllib.request.HTTPErrorProcessor(),
+    ):
+        opener.add_handler(handler)
+    return opener
+
+
+def read_url(url):
+    """The bytes at ``url``, fetched server-side only from public
+    http(s) hosts (see ``check_remote_url``); redirects are checked too."""
+    check_remote_url(url)
+    with _remote_opener().open(url, timeout=30) as response:
+        return response.read()
+
+
+def read_source(source):
+    """The bytes of ``source`` (local path, url or file object)."""
+    if hasattr(source, "read"):
+        return source.read()
+    if source.startswith(("http://", "https://")):
+        return read_url(source)
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def load_image(source):
+    """Decode ``source`` (path, url or file object) into an upright RGB image."""
+    try:
+        image = PILImage.open(io.BytesIO(read_source(source)))
+        image = ImageOps.exif_transpose(image)
+        return image.convert("RGB")
+    except (UnidentifiedImageError, OSError, ValueError) as e:
+        raise InvalidImage(f"not a valid image: {e}") from e
+
+
+def encode(image, fmt):
+    """Encode without metadata (Pillow only writes EXIF when asked to)."""
+    config = current_app.config
+    buffer = io.BytesIO()
+    if fmt == "jpeg":
+        image.save(buffer, "JPEG", quality=config["IMAGE_JPEG_QUALITY"], optimize=True, progressive=True)
+    elif fmt == "webp":
+        image.save(buffer, "WEBP", quality=config["IMAGE_WEBP_QUALITY"], method=4)
+    else:
+        image.save(buffer, fmt.upper(), optimize=True)
+    buffer.seek(0)
+    return buffer
+
+
+def resize_to_width(image, width):
+    if image.width <= width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), PILImage.LANCZOS)
+
+
+def dominant_color(image):
+    """Most common colour of a 4-colour palette of the image, as ``#rrggbb``."""
+    small = image.copy()
+    small.thumbnail((64, 64))
+    palette_image = small.quantize(colors=4, method=PILImage.Quantize.MEDIANCUT)
+    _, index = max(palette_image.getcolors())
+    r, g, b = palette_image.getpalette()[index * 3 : index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+# --- Blurhash (https://blurha.sh) ---
+
+
+def _encode83(value, length):
+    return "".join(_BASE83[value // 83 ** (length - i) % 83] for i in range(1, length + 1))
+
+
+def _srgb_to_linear(value):
+    v = value / 255
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value):
+    v = max(0.0, min(1.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value, exponent):
+    return math.copysign(abs(value) ** exponent, value)
+
+
+def blurhash(image, x_components=4, y_components=3):
+    """Blurhash of ``image``, computed on a thumbnail of at most 32px."""
+    small = image.copy()
+    small.thumbnail((32, 32))
+    width, height = small.size
+    linear = [tuple(_srgb_to_linear(c) for c in pixel) for pixel in small.getdata()]
+
+    factors = []
+    for j in range(y_components):
+        cos_y = [math.cos(math.pi * j * y / height) for y in range(height)]
+        for i in range(x_components):
+            cos_x = [math.cos(math.pi * i * x / width) for x in range(width)]
+            r = g = b = 0.0
+            for y in range(height):
+                row = y * width
+                for x in range(width):
+                    basis = cos_x[x] * cos_y[y]
+                    pr, pg, pb = linear[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = (1 if i == 0 and j == 0 else 2) / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _encode83((x_components - 1) + (y_components - 1) * 9, 1)
+    if ac:
+        actual_max = max(abs(c) for factor in ac for c in factor)
+        quantised_max = max(0, min(82, int(actual_max * 166 - 0.5)))
+        max_value = (quantised_max + 1) / 166
+        result += _encode83(quantised_max, 1)
+    else:
+        max_value = 1
+        result += _encode83(0, 1)
+    result += _encode83(
+        (_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4
+    )
+    for factor in ac:
+        r, g, b = (
+            max(0, min(18, int(_sign_pow(c / max_value, 0.5) * 9 + 9.5))) for c in factor
+        )
+        result += _encode83(r * 19 * 19 + g * 19 + b, 2)
+    return result
+
+
+# --- Storing ---
+
+
+def content_digest(data):
+    """SHA-256 of the uploaded bytes: the identity of an ``ImageBlob``."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def perceptual_hash(image):
+    """64-bit difference hash (dHash) as 16 hex digits: equal for the same
+    picture re-encoded or resized."""
+    small = image.convert("L").resize((9, 8), PILImage.LANCZOS)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(8):
+        for column in range(8):
+            left = pixels[row * 9 + column]
+            bits = bits << 1 | (left > pixels[row * 9 + column + 1])
+    return f"{bits:016x}"
+
+
+def blob_key(digest, suffix, extension):
+    # مفاتيح حسب المحتوى لا حسب الشقة، لأن الملف مشترك بين الشقق
+    return f"blobs/{digest[:2]}/{digest}{suffix}.{extension}"
+
+
+def process_upload(storage, data, digest=None):
+    """Normalize the uploaded bytes, store them and their variants.
+
+    Returns the ``ImageBlob`` column values (``sha256``, ``phash``,
+    ``size``, ``url``, ``width``, ``height``, ``color``, ``blurhash``,
+    ``variants``); it touches no database, so it can run in any thread.
+    Raises ``InvalidImage`` when the upload cannot be decoded; storage
+    errors propagate (the caller retries / reports them).
+    """
+    config = current_app.config
+    digest = digest or content_digest(data)
+    image = load_image(io.BytesIO(data))
+    max_dimension = config["IMAGE_MAX_DIMENSION"]
+    if max(image.size) > max_dimension:
+        image.thumbnail((max_dimension, max_dimension), PILImage.LANCZOS)
+
+    stored = []
+    try:
+        url = storage.save(encode(image, "jpeg"), blob_key(digest, "", "jpg"))
+        stored.append(url)
+
+        variants = {}
+        widths = sorted({min(width, image.width) for width in config["IMAGE_VARIANT_WIDTHS"]})
+        for width in widths:
+            resized = resize_to_width(image, width)
+            for fmt in config["IMAGE_VARIANT_FORMATS"]:
+                variant_url = storage.save(
+                    encode(resized, fmt), blob_key(digest, f"_{width}", FORMAT_EXTENSIONS[fmt])
+                )
+                stored.append(variant_url)
+                variants.setdefault(fmt, {})[str(width)] = variant_url
+    except Exception:
+        # لا نترك نسخاً ناقصة في التخزين
+        delete_stored(storage, stored)
+        raise
+
+    return {
+        "sha256": digest,
+        "phash": perceptual_hash(image),
+        "size": len(data),
+        "url": url,
+        "width": image.width,
+        "height": image.height,
+        "color": dominant_color(image),
+        "blurhash": blurhash(image),
+        "variants": variants,
+    }
+
+
+def stored_urls(values):
+    """Every url written by ``process_upload`` for one image."""
+    urls = [values["url"]] if values.get("url") else []
+    for by_width in (values.get("variants") or {}).values():
+        urls.extend(by_width.values())
+    return urls
+
+
+def delete_stored(storage, urls):
+    for url in urls:
+        try:
+            storage.delete(url)
+        except Exception:
+            current_app.logger.exception("Could not delete stored image %s", url)
@@ -0,0 +1,120 @@
+# app/utils/pagination.py
+"""Keyset (cursor) pagination helpers.
+
+Pages are addressed by the sort key of the last row that was returned, so
+page N costs the same as page 1 (an index range scan) instead of scanning
+and discarding ``OFFSET`` rows. The cursor handed to clients is an opaque
+url-safe token; clients must not build it themselves.
+"""
+import base64
+import json
+from datetime import datetime
+
+from flask import request
+from sqlalchemy import and_, or_
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue."""
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(values, tag="") -> str:
+    """``tag`` names the sort order so a cursor cannot be replayed
+    against a different one."""
+    payload = json.dumps(
+        {"t": tag, "v": [_encode_value(v) for v in values]}, separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, size: int, tag="") -> list:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        tag_sent, values = payload["t"], payload["v"]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor("Malformed cursor")
+    if tag_sent != tag or not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("Malformed cursor")
+    try:
+        return [_decode_value(v) for v in values]
+    except (ValueError, TypeError):
+        raise InvalidCursor("Malformed cursor")
+
+
+def keyset_filter(order_by, values):
+    """Build the "row comes after ``values``" predicate for ``order_by``.
+
+    ``order_by`` is a list of ``(column, descending)`` pairs; the last one
+    must be unique (normally the primary key) so the order is total.
+    """
+    clauses = []
+    for i, (column, descending) in enumerate(order_by):
+        equal = [col == values[j] for j, (col, _) in enumerate(order_by[:i])]
+        step = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal, step))
+    return or_(*clauses)
+
+
+def keyset_page(query, order_by, key, cursor=None, limit=20, tag=""):
+    """Fetch one page of ``query`` ordered by ``order_by``.
+
+    ``key`` maps a returned row to its sort values. Returns
+    ``(items, next_cursor)``; ``next_cursor`` is ``None`` on the last page.
+    """
+    if cursor:
+        values = decode_cursor(cursor, len(order_by), tag)
+        query = query.filter(keyset_filter(order_by, values))
+
+    query = query.order_by(
+        *[col.desc() if descending else col.asc() for col, descending in order_by]
+    )
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(key(rows[-1]), tag)
+    return rows, next_cursor
+
+
+def parse_cursor_args(default_limit=20, max_limit=100):
+    cursor = request.args.get("cursor") or None
+    limit = request.args.get("limit", type=int) or request.args.get("per_page", type=int)
+    limit = default_limit if not limit or limit < 1 else limit
+    return cursor, min(limit, max_limit)
+
+
+def wants_total() -> bool:
+    return request.args.get("include_total", "false").lower() in ("1", "true", "yes")
+
+
+def ranked_page(ranked, cursor=None, limit=20, tag="", descending=True):
+    """Page through an in-memory ``[(id, score), ...]`` list already sorted
+    by ``(score, id)`` – descending for search relevance, ascending for
+    distances."""
+    if cursor:
+        score, last_id = decode_cursor(cursor, 2, tag)
+        if descending:
+            ranked = [item for item in ranked if (item[1], item[0]) < (score, last_id)]
+        else:
+            ranked = [item for item in ranked if (item[1], item[0]) > (score, last_id)]
+
+    page = ranked[:limit]
+    next_cursor = None
+    if len(ranked) > limit:
+        last_id, score = page[-1]
+        next_cursor = encode_cursor([score, last_id], tag)
+    return page, next_cursor
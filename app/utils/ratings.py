@@ -0,0 +1,105 @@
+# app/utils/ratings.py
+"""Maintenance of the denormalized rating aggregates stored on Apartment.
+
+Every code path that creates, edits or deletes a Review must call
+``apply_rating_change`` in the same transaction, so listing pages can read
+the rating from the apartment row without loading any reviews.
+"""
+from sqlalchemy import case, func, select, true, update
+
+from app import db
+from app.models.apartment import Apartment
+from app.models.review import Review
+from app.utils.cache import DETAILS, LISTINGS, apartment_namespace, mark_stale
+
+
+def _star_column(star):
+    return getattr(Apartment, f"rating_{star}_count")
+
+
+def _refresh_average(apartment_filter):
+    db.session.execute(
+        update(Apartment)
+        .where(apartment_filter)
+        .values(
+            rating_avg=case(
+                (Apartment.rating_count > 0,
+                 Apartment.rating_sum * 1.0 / Apartment.rating_count),
+                else_=0.0,
+            )
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def apply_rating_change(apartment_id, added=None, removed=None):
+    """Add and/or remove a single star rating from an apartment's aggregates.
+
+    An edit is ``added=new, removed=old``. The counters are updated with
+    relative SQL expressions so concurrent reviews do not lose updates.
+    """
+    added = int(added) if added is not None else None
+    removed = int(removed) if removed is not None else None
+    if added == removed:
+        return
+
+    values = {
+        "rating_sum": Apartment.rating_sum + (added or 0) - (removed or 0),
+        "rating_count": Apartment.rating_count
+        + (added is not None)
+        - (removed is not None),
+    }
+    for star, delta in ((added, 1), (removed, -1)):
+        if star is not None:
+            column = _star_column(star)
+            values[column.key] = values.get(column.key, column) + delta
+    # version/updated_at تزيد من أحداث Review نفسها (انظر app/models/apartment.py)
+
+    db.session.execute(
+        update(Apartment)
+        .where(Apartment.id == apartment_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    _refresh_average(Apartment.id == apartment_id)
+    mark_stale(db.session, LISTINGS, apartment_namespace(apartment_id))
+
+
+def rebuild_rating_aggregates(apartment_ids=None):
+    """Recompute the aggregates from the review table (backfill / repair).
+
+    Returns the number of apartment rows rewritten.
+    """
+
+    def review_stat(expression):
+        return (
+            select(expression)
+            .where(Review.apartment_id == Apartment.id)
+            .scalar_subquery()
+        )
+
+    values = {
+        "rating_sum": review_stat(func.coalesce(func.sum(Review.rating), 0)),
+        "rating_count": review_stat(func.count(Review.id)),
+    }
+    for star in range(1, 6):
+        values[_star_column(star).key] = review_stat(
+            func.coalesce(func.sum(case((Review.rating == star, 1), else_=0)), 0)
+        )
+    values.update(Apartment.touch_values())
+
+    apartment_filter = (
+        Apartment.id.in_(list(apartment_ids)) if apartment_ids is not None else true()
+    )
+    result = db.session.execute(
+        update(Apartment)
+        .where(apartment_filter)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    _refresh_average(apartment_filter)
+    if apartment_ids is None:
+        mark_stale(db.session, LISTINGS, DETAILS)
+    else:
+        mark_stale(db.session, LISTINGS, *map(apartment_namespace, apartment_ids))
+    return result.rowcount
@@ -0,0 +1,529 @@
+# app/utils/search.py
+"""Full-text search over apartments.
+
+Apartments are indexed on title, neighborhood name, address and
+description after Arabic normalization. Three interchangeable backends
+answer ``match(tokens, limit) -> [(apartment_id, relevance), ...]``:
+
+* ``fts5``     – SQLite FTS5 virtual table ranked with ``bm25()`` (dev/tests)
+* ``fulltext`` – MySQL InnoDB FULLTEXT indexes (production)
+* ``memory``   – in-process inverted index with BM25F scoring (fallback)
+
+Ranking boosts for verified and well-rated listings are applied on top of
+the backend relevance by ``rank_apartments``. The index is kept in sync by
+ORM events on ``Apartment`` and ``Neighborhood`` renames (see
+``init_search``).
+"""
+import bisect
+import math
+import re
+import threading
+from collections import defaultdict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select, text
+from sqlalchemy.orm import Session, object_session
+
+from app import db
+from app.models.apartment import Apartment
+from app.models.neighborhood import Neighborhood
+
+# --- Arabic normalization ---
+
+_DIACRITICS_RE = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_CHAR_MAP = str.maketrans(
+    {
+        "أ": "ا",
+        "إ": "ا",
+        "آ": "ا",
+        "ٱ": "ا",
+        "ة": "ه",
+        "ى": "ي",
+        "ؤ": "و",
+        "ئ": "ي",
+        **{chr(0x0660 + d): str(d) for d in range(10)},  # ٠١٢ -> 012
+        **{chr(0x06F0 + d): str(d) for d in range(10)},  # ۰۱۲ -> 012
+    }
+)
+
+
+def normalize_arabic(value) -> str:
+    """Fold the spelling variants users type interchangeably.
+
+    Strips tashkeel and tatweel, unifies alef forms, taa marbuta -> haa,
+    alef maqsura -> yaa, hamza carriers, Eastern digits, and lowercases
+    Latin text.
+    """
+    if not value:
+        return ""
+    return _DIACRITICS_RE.sub("", value).translate(_CHAR_MAP).lower()
+
+
+def tokenize(value) -> list:
+    return _TOKEN_RE.findall(normalize_arabic(value))
+
+
+# حقول الفهرس ووزن كل حقل في الترتيب
+SEARCH_FIELDS = ("title", "neighborhood", "address", "description")
+FIELD_WEIGHTS = {"title": 3.0, "neighborhood": 2.0, "address": 1.5, "description": 1.0}
+
+
+def _document(apartment, neighborhood_name):
+    return {
+        "title": " ".join(tokenize(apartment.title)),
+        "neighborhood": " ".join(tokenize(neighborhood_name)),
+        "address": " ".join(tokenize(apartment.address)),
+        "description": " ".join(tokenize(apartment.description)),
+    }
+
+
+def _neighborhood_name(connection, neighborhood_id):
+    if neighborhood_id is None:
+        return ""
+    return connection.execute(
+        select(Neighborhood.name).where(Neighborhood.id == neighborhood_id)
+    ).scalar() or ""
+
+
+# --- Backends ---
+
+
+class SQLiteFTSBackend:
+    name = "fts5"
+
+    def __init__(self):
+        self._ready = False
+
+    def ensure_schema(self, connection):
+        if self._ready:
+            return
+        connection.execute(
+            text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS apartment_search USING fts5("
+                "title, neighborhood, address, description, "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+        )
+        self._ready = True
+
+    def index(self, session, connection, apartment_id, document):
+        self.ensure_schema(connection)
+        self.remove(session, connection, apartment_id)
+        connection.execute(
+            text(
+                "INSERT INTO apartment_search "
+                "(rowid, title, neighborhood, address, description) "
+                "VALUES (:id, :title, :neighborhood, :address, :description)"
+            ),
+            {"id": apartment_id, **document},
+        )
+
+    def remove(self, session, connection, apartment_id):
+        self.ensure_schema(connection)
+        connection.execute(
+            text("DELETE FROM apartment_search WHERE rowid = :id"), {"id": apartment_id}
+        )
+
+    def index_many(self, session, connection, documents):
+        self.ensure_schema(connection)
+        params = [{"id": apartment_id, **document} for apartment_id, document in documents]
+        if not params:
+            return
+        # executemany: جملتين للدفعة كلها بدل جملتين لكل شقة
+        connection.execute(text("DELETE FROM apartment_search WHERE rowid = :id"), params)
+        connection.execute(
+            text(
+                "INSERT INTO apartment_search "
+                "(rowid, title, neighborhood, address, description) "
+                "VALUES (:id, :title, :neighborhood, :address, :description)"
+            ),
+            params,
+        )
+
+    def clear(self, session, connection):
+        self.ensure_schema(connection)
+        connection.execute(text("DELETE FROM apartment_search"))
+
+    def match(self, tokens, limit):
+        connection = db.session.connection()
+        self.ensure_schema(connection)
+        expression = " ".join('"%s"*' % token for token in tokens)
+        weights = ", ".join(str(FIELD_WEIGHTS[field]) for field in SEARCH_FIELDS)
+        rows = connection.execute(
+            text(
+                f"SELECT rowid, bm25(apartment_search, {weights}) AS score "
+                "FROM apartment_search WHERE apartment_search MATCH :q "
+                "ORDER BY score LIMIT :limit"
+            ),
+            {"q": expression, "limit": limit},
+        )
+        # bm25() is "lower is better"; flip it so larger means more relevant.
+        return [(row.rowid, -row.score) for row in rows]
+
+
+class MySQLFulltextBackend:
+    """InnoDB FULLTEXT table ``apartment_search``.
+
+    The table is created by migration a7e24b9d0f13, never at runtime: DDL
+    implicitly commits the open MySQL transaction, and these methods run
+    inside ORM flushes and import batches.
+    """
+
+    name = "fulltext"
+
+    def index(self, session, connection, apartment_id, document):
+        connection.execute(
+            text(
+                "REPLACE INTO apartment_search "
+                "(apartment_id, title, neighborhood, address, description) "
+                "VALUES (:id, :title, :neighborhood, :address, :description)"
+            ),
+            {"id": apartment_id, **document},
+        )
+
+    def remove(self, session, connection, apartment_id):
+        connection.execute(
+            text("DELETE FROM apartment_search WHERE apartment_id = :id"),
+            {"id": apartment_id},
+        )
+
+    def index_many(self, session, connection, documents):
+        params = [{"id": apartment_id, **document} for apartment_id, document in documents]
+        if params:
+            connection.execute(
+                text(
+                    "REPLACE INTO apartment_search "
+                    "(apartment_id, title, neighborhood, address, description) "
+                    "VALUES (:id, :title, :neighborhood, :address, :description)"
+                ),
+                params,
+            )
+
+    def clear(self, session, connection):
+        connection.execute(text("DELETE FROM apartment_search"))
+
+    def match(self, tokens, limit):
+        connection = db.session.connection()
+        expression = " ".join("+%s*" % token for token in tokens)
+        title_weight = FIELD_WEIGHTS["title"] - 1
+        rows = connection.execute(
+            text(
+                "SELECT apartment_id, "
+                "MATCH(title, neighborhood, address, description) "
+                "AGAINST (:q IN BOOLEAN MODE) "
+                f"+ {title_weight} * MATCH(title) AGAINST (:q IN BOOLEAN MODE) AS score "
+                "FROM apartment_search "
+                "WHERE MATCH(title, neighborhood, address, description) "
+                "AGAINST (:q IN BOOLEAN MODE) "
+                "ORDER BY score DESC LIMIT :limit"
+            ),
+            {"q": expression, "limit": limit},
+        )
+        return [(row.apartment_id, float(row.score)) for row in rows]
+
+
+class InMemoryBackend:
+    """Inverted index held in the worker process.
+
+    Each gunicorn worker keeps its own copy, built from the database on the
+    first query and then updated from committed ORM changes.
+    """
+
+    name = "memory"
+    k1 = 1.2
+    b = 0.75
+    max_prefix_expansion = 50
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._postings = defaultdict(dict)  # term -> {apartment_id: weighted tf}
+        self._doc_terms = {}  # apartment_id -> set of terms
+        self._doc_length = {}  # apartment_id -> weighted length
+        self._sorted_terms = None
+
+    # Writes are staged on the session and applied after commit, so rolled
+    # back changes never reach the index.
+    def index(self, session, connection, apartment_id, document):
+        _pending_ops(session).append(("index", apartment_id, document))
+
+    def remove(self, session, connection, apartment_id):
+        _pending_ops(session).append(("remove", apartment_id, None))
+
+    def index_many(self, session, connection, documents):
+        _pending_ops(session).extend(
+            ("index", apartment_id, document) for apartment_id, document in documents
+        )
+
+    def clear(self, session, connection):
+        _pending_ops(session).append(("clear", None, None))
+
+    def apply(self, ops):
+        with self._lock:
+            for op, apartment_id, document in ops:
+                if op == "clear":
+                    self._reset()
+                    self._loaded = True
+                    continue
+                self._remove(apartment_id)
+                if op == "index":
+                    self._add(apartment_id, document)
+
+    def _reset(self):
+        self._postings.clear()
+        self._doc_terms.clear()
+        self._doc_length.clear()
+        self._sorted_terms = None
+
+    def _add(self, apartment_id, document):
+        weighted = defaultdict(float)
+        length = 0.0
+        for field, value in document.items():
+            terms = value.split()
+            length += FIELD_WEIGHTS[field] * len(terms)
+            for term in terms:
+                weighted[term] += FIELD_WEIGHTS[field]
+        for term, tf in weighted.items():
+            if term not in self._postings:
+                self._sorted_terms = None
+            self._postings[term][apartment_id] = tf
+        self._doc_terms[apartment_id] = set(weighted)
+        self._doc_length[apartment_id] = length
+
+    def _remove(self, apartment_id):
+        for term in self._doc_terms.pop(apartment_id, ()):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(apartment_id, None)
+                if not postings:
+                    del self._postings[term]
+                    self._sorted_terms = None
+        self._doc_length.pop(apartment_id, None)
+
+    def _load(self):
+        ops = [("clear", None, None)]
+        ops.extend(("index", apartment_id, document) for apartment_id, document in iter_documents())
+        self.apply(ops)
+
+    def _expand(self, token):
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+        terms = self._sorted_terms
+        start = bisect.bisect_left(terms, token)
+        expanded = []
+        for term in terms[start:start + self.max_prefix_expansion]:
+            if not term.startswith(token):
+                break
+            expanded.append(term)
+        return expanded
+
+    def match(self, tokens, limit):
+        if not self._loaded:
+            self._load()
+        with self._lock:
+            total_docs = len(self._doc_length)
+            if not total_docs:
+                return []
+            avg_length = sum(self._doc_length.values()) / total_docs
+            scores = None
+            for token in tokens:
+                token_scores = defaultdict(float)
+                for term in self._expand(token):
+                    postings = self._postings[term]
+                    df = len(postings)
+                    idf = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+                    for apartment_id, tf in postings.items():
+                        norm = 1 - self.b + self.b * self._doc_length[apartment_id] / avg_length
+                        token_scores[apartment_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {
+                        apartment_id: score + token_scores[apartment_id]
+                        for apartment_id, score in scores.items()
+                        if apartment_id in token_scores
+                    }
+                if not scores:
+                    return []
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
+
+
+BACKENDS = {
+    "fts5": SQLiteFTSBackend,
+    "fulltext": MySQLFulltextBackend,
+    "memory": InMemoryBackend,
+}
+
+
+def _pending_ops(session):
+    return session.info.setdefault("search_pending_ops", [])
+
+
+def get_search_backend():
+    return current_app.extensions["search"]
+
+
+def iter_documents(batch_size=500, apartment_ids=None):
+    # الأعمدة المفهرسة فقط (بدون تحميل كائنات ORM)
+    query = db.session.query(
+        Apartment.id,
+        Apartment.title,
+        Apartment.address,
+        Apartment.description,
+        Neighborhood.name.label("neighborhood_name"),
+    ).outerjoin(Neighborhood, Apartment.neighborhood_id == Neighborhood.id)
+    if apartment_ids is not None:
+        query = query.filter(Apartment.id.in_(list(apartment_ids)))
+    query = query.order_by(Apartment.id).yield_per(batch_size)
+    for row in query:
+        yield row.id, _document(row, row.neighborhood_name)
+
+
+def reindex_all():
+    """Rebuild the whole index from the apartment table. Returns the count."""
+    backend = get_search_backend()
+    session = db.session()
+    connection = session.connection()
+    backend.clear(session, connection)
+    count = 0
+    for apartment_id, document in iter_documents():
+        backend.index(session, connection, apartment_id, document)
+        count += 1
+    return count
+
+
+def index_apartments(apartment_ids):
+    """Index rows written without the ORM (bulk import). Same transaction
+    rules as the ORM events: applied for good on commit."""
+    backend = _backend_or_none()
+    if backend is None or not apartment_ids:
+        return
+    session = db.session()
+    backend.index_many(
+        session, session.connection(), list(iter_documents(apartment_ids=apartment_ids))
+    )
+
+
+def rank_apartments(query_text, limit=None):
+    """Return ``[(apartment_id, score), ...]`` best first.
+
+    Backend relevance is multiplied by boosts for verified listings and for
+    the stored average rating, so a verified 5-star listing outranks an
+    equally relevant unverified one.
+    """
+    tokens = tokenize(query_text)
+    if not tokens:
+        return []
+    config = current_app.config
+    candidates = get_search_backend().match(
+        tokens, limit or config["SEARCH_MAX_CANDIDATES"]
+    )
+    if not candidates:
+        return []
+
+    relevance = dict(candidates)
+    rows = db.session.execute(
+        select(Apartment.id, Apartment.is_verified, Apartment.rating_avg).where(
+            Apartment.id.in_(relevance)
+        )
+    )
+    ranked = []
+    for apartment_id, is_verified, rating_avg in rows:
+        boost = 1.0
+        if is_verified:
+            boost += config["SEARCH_VERIFIED_BOOST"]
+        boost += config["SEARCH_RATING_BOOST"] * (rating_avg or 0.0) / 5.0
+        ranked.append((apartment_id, round(relevance[apartment_id] * boost, 6)))
+    ranked.sort(key=lambda item: (item[1], item[0]), reverse=True)
+    return ranked
+
+
+# --- Index maintenance ---
+
+_INDEXED_ATTRIBUTES = ("title", "description", "address", "neighborhood_id")
+
+
+def _backend_or_none():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get("search")
+
+
+def _after_insert(mapper, connection, target):
+    backend = _backend_or_none()
+    if backend is not None:
+        name = _neighborhood_name(connection, target.neighborhood_id)
+        backend.index(
+            object_session(target), connection, target.id, _document(target, name)
+        )
+
+
+def _after_update(mapper, connection, target):
+    backend = _backend_or_none()
+    if backend is None:
+        return
+    state = inspect(target)
+    if any(state.attrs[attr].history.has_changes() for attr in _INDEXED_ATTRIBUTES):
+        name = _neighborhood_name(connection, target.neighborhood_id)
+        backend.index(
+            object_session(target), connection, target.id, _document(target, name)
+        )
+
+
+def _after_neighborhood_update(mapper, connection, target):
+    # اسم الحي منسوخ في مستند كل شقة فيه
+    if _backend_or_none() is None or not inspect(target).attrs.name.history.has_changes():
+        return
+    apartment_ids = connection.execute(
+        select(Apartment.id).where(Apartment.neighborhood_id == target.id)
+    ).scalars().all()
+    index_apartments(apartment_ids)
+
+
+def _after_delete(mapper, connection, target):
+    backend = _backend_or_none()
+    if backend is not None:
+        backend.remove(object_session(target), connection, target.id)
+
+
+def _after_commit(session):
+    ops = session.info.pop("search_pending_ops", None)
+    backend = _backend_or_none()
+    if ops and backend is not None:
+        backend.apply(ops)
+
+
+def _after_rollback(session):
+    session.info.pop("search_pending_ops", None)
+
+
+_events_registered = False
+
+
+def _register_events():
+    global _events_registered
+    if _events_registered:
+        return
+    event.listen(Apartment, "after_insert", _after_insert)
+    event.listen(Apartment, "after_update", _after_update)
+    event.listen(Apartment, "after_delete", _after_delete)
+    event.listen(Neighborhood, "after_update", _after_neighborhood_update)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_rollback", _after_rollback)
+    _events_registered = True
+
+
+def init_search(app):
+    backend_name = app.config["SEARCH_BACKEND"]
+    if backend_name == "auto":
+        uri = app.config["SQLALCHEMY_DATABASE_URI"]
+        if uri.startswith("sqlite"):
+            backend_name = "fts5"
+        elif uri.startswith("mysql"):
+            backend_name = "fulltext"
+        else:
+            backend_name = "memory"
+    app.extensions["search"] = BACKENDS[backend_name]()
+    _register_events()
@@ -0,0 +1,111 @@
+# app/utils/storage.py
+"""Pluggable storage for apartment images.
+
+* ``CloudinaryStorage`` – production; the url is the asset's ``secure_url``.
+* ``LocalStorage``      – files under ``UPLOAD_FOLDER`` served by
+  ``/uploads`` (dev, tests, or a CDN in front of the app).
+
+Both answer ``save(source, key) -> url`` and ``delete(url)``, where
+``source`` is a local file path, an ``http(s)`` url or a binary file
+object and ``key`` a relative path such as ``blobs/ab/<sha256>.jpg``
+(see ``app.utils.image_processing.blob_key``). Backends keep no per-request state, so one instance
+is shared by the upload threads. ``IMAGE_STORAGE=auto``
+picks Cloudinary when it is configured and local storage otherwise.
+"""
+import os
+import shutil
+import urllib.request
+
+from flask import current_app
+
+
+def _is_remote(source):
+    return isinstance(source, str) and source.startswith(("http://", "https://"))
+
+
+class LocalStorage:
+    name = "local"
+
+    def __init__(self, root, base_url="/uploads"):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def path_for(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError(f"invalid storage key: {key}")
+        return path
+
+    def save(self, source, key):
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if hasattr(source, "read"):
+            with open(path, "wb") as out:
+                shutil.copyfileobj(source, out)
+        elif _is_remote(source):
+            with urllib.request.urlopen(source, timeout=30) as response, open(path, "wb") as out:
+                shutil.copyfileobj(response, out)
+        else:
+            shutil.copyfile(source, path)
+        return f"{self.base_url}/{key}"
+
+    def key_for(self, url):
+        prefix = f"{self.base_url}/"
+        return url[len(prefix):] if url and url.startswith(prefix) else None
+
+    def delete(self, url):
+        key = self.key_for(url)
+        if key:
+            try:
+                os.remove(self.path_for(key))
+            except FileNotFoundError:
+                pass
+
+
+class CloudinaryStorage:
+    name = "cloudinary"
+
+    def save(self, source, key):
+        import cloudinary.uploader
+
+        # الامتداد جزء من الـ public_id حتى لا تتصادم نسخ webp و jpeg بنفس الاسم
+        stem, extension = os.path.splitext(key)
+        public_id = f"{stem}_{extension[1:]}" if extension else stem
+        result = cloudinary.uploader.upload(source, public_id=public_id, overwrite=True)
+        return result["secure_url"]
+
+    @staticmethod
+    def public_id_for(url):
+        # .../image/upload/v1712345/apartments/12/name.jpg -> apartments/12/name
+        if not url or "/upload/" not in url:
+            return None
+        path = url.split("/upload/", 1)[1]
+        first, _, rest = path.partition("/")
+        if first.startswith("v") and first[1:].isdigit():
+            path = rest
+        return os.path.splitext(path)[0]
+
+    def delete(self, url):
+        import cloudinary.uploader
+
+        public_id = self.public_id_for(url)
+        if public_id:
+            cloudinary.uploader.destroy(public_id)
+
+
+def get_storage():
+    return current_app.extensions["image_storage"]
+
+
+def init_storage(app):
+    config = app.config
+    backend = config["IMAGE_STORAGE"]
+    if backend == "auto":
+        backend = "cloudinary" if os.getenv("CLOUDINARY_CLOUD_NAME") else "local"
+    if backend == "cloudinary":
+        storage = CloudinaryStorage()
+    elif backend == "local":
+        storage = LocalStorage(config["UPLOAD_FOLDER"], config["LOCAL_STORAGE_BASE_URL"])
+    else:
+        raise ValueError(f"Unknown IMAGE_STORAGE: {backend}")
+    app.extensions["image_storage"] = storage
@@ -0,0 +1,95 @@
+# app/utils/uploads.py
+"""Serving ``/uploads`` (files of ``UPLOAD_FOLDER``).
+
+Images written by ``app.utils.image_processing`` are named after a hash of
+their content (``<hex digest>[_<variant>].<ext>``): such a name never
+points at other bytes, so they are sent with a year-long ``immutable``
+``Cache-Control`` and the name as a strong ETag that every worker agrees
+on. Other files (legacy uploads, the default avatar) get
+``UPLOADS_MAX_AGE`` and revalidate with an mtime/size ETag.
+
+``UPLOADS_SENDFILE`` decides who moves the bytes:
+
+* ``none``       – the app streams the file (``wsgi.file_wrapper``, with
+  ``Range`` support) — fine for development;
+* ``x-accel``    – nginx: the response only carries ``X-Accel-Redirect:
+  <UPLOADS_ACCEL_PREFIX>/<name>`` and nginx serves the file (and ranges)
+  from an ``internal`` location;
+* ``x-sendfile`` – Apache / lighttpd ``X-Sendfile`` with the absolute path.
+
+In the proxy modes the worker is free as soon as the headers are written.
+Conditional requests are still answered here with a 304.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from flask import abort, current_app, request
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file
+
+SENDFILE_MODES = ("none", "x-accel", "x-sendfile")
+
+_HASHED_NAME = re.compile(r"^[0-9a-f]{16,64}(?:_[0-9a-z]+)?\.[0-9a-z]+$")
+
+
+def is_content_hashed(filename):
+    return bool(_HASHED_NAME.match(posixpath.basename(filename)))
+
+
+def _apply_cache_headers(response, max_age, immutable):
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if immutable:
+        response.cache_control.immutable = True
+    return response
+
+
+def serve_upload(filename):
+    config = current_app.config
+    path = safe_join(config["UPLOAD_FOLDER"], filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    immutable = is_content_hashed(filename)
+    # ETag الملفات المسماة بالـ hash هو الاسم نفسه (نفس القيمة على كل السيرفرات)
+    etag = posixpath.basename(filename) if immutable else True
+    max_age = config["UPLOADS_IMMUTABLE_MAX_AGE" if immutable else "UPLOADS_MAX_AGE"]
+    mode = config["UPLOADS_SENDFILE"]
+
+    if mode == "x-accel":
+        stat = os.stat(path)
+        response = current_app.response_class(
+            mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        )
+        prefix = config["UPLOADS_ACCEL_PREFIX"].rstrip("/")
+        response.headers["X-Accel-Redirect"] = f"{prefix}/{quote(filename)}"
+        response.set_etag(etag if immutable else f"{stat.st_mtime}-{stat.st_size}")
+        response.last_modified = int(stat.st_mtime)
+        _apply_cache_headers(response, max_age, immutable)
+        # 304 من هنا، والـ Range يتولاه nginx
+        return response.make_conditional(request.environ)
+
+    response = send_file(
+        path,
+        request.environ,
+        etag=etag,
+        conditional=True,
+        max_age=max_age,
+        use_x_sendfile=mode == "x-sendfile",
+        response_class=current_app.response_class,
+        _root_path=current_app.root_path,
+    )
+    if mode == "none":
+        # werkzeug يجيب على Range لكنه لا يعلن ذلك إلا في ردود 206
+        response.accept_ranges = "bytes"
+    return _apply_cache_headers(response, max_age, immutable)
+
+
+def init_uploads(app):
+    mode = app.config["UPLOADS_SENDFILE"]
+    if mode not in SENDFILE_MODES:
+        raise ValueError(f"Unknown UPLOADS_SENDFILE: {mode}")
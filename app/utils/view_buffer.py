@@ -0,0 +1,370 @@
+# app/utils/view_buffer.py
+"""Write-behind buffer for apartment view events.
+
+``POST /api/views/track/<uuid>`` is the busiest write of the API, so it no
+longer inserts and commits per request. The route only appends the event
+to an in-process buffer; a background flusher writes the buffered events
+with one multi-row ``INSERT`` (executemany) and one commit — together with
+the daily rollups (``app.utils.view_rollups``) — whenever
+``VIEW_FLUSH_BATCH`` events are waiting or ``VIEW_FLUSH_INTERVAL_MS`` has
+passed since the last flush.
+
+Durability:
+
+* the buffer is flushed when the process exits (``atexit``);
+* with ``VIEW_SPOOL_PATH`` every accepted event is also appended to a
+  file of the process, ``<VIEW_SPOOL_PATH>.<pid>`` (one JSON line per
+  event), so gunicorn workers sharing the setting never touch each
+  other's events. Events that were accepted but not yet flushed when a
+  process died are replayed on the next start: ``recover`` picks up only
+  the files of processes that are gone, claiming each with an atomic
+  rename so two workers starting together do not both replay it.
+
+Backpressure: at most ``VIEW_BUFFER_MAX_EVENTS`` events wait in memory.
+Beyond that new events are dropped and counted (view counts are
+analytics, a request is never slowed down for them). A failed flush puts
+its events back in the buffer and retries on the next tick. ``stats()``
+(``GET /api/v1/admin/stats/views``) reports depth, high-water mark,
+flushed / dropped counts and the last flush duration.
+
+``VIEW_BUFFER_MODE=sync`` writes every event in the request that tracked
+it (tests, single-process scripts).
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models.apartment import Apartment
+from app.models.apartment_view import ApartmentView
+from app.models.user import User
+from app.utils.cache import LRUCache
+from app.utils.view_rollups import delete_apartment_views, record_daily_views
+
+BUFFER_MODES = ("thread", "sync")
+
+_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+class ViewBuffer:
+    """Thread-safe queue of view rows with a batching flusher thread."""
+
+    def __init__(self, app):
+        config = app.config
+        self.app = app
+        self.mode = config["VIEW_BUFFER_MODE"]
+        self.batch_size = config["VIEW_FLUSH_BATCH"]
+        self.interval = config["VIEW_FLUSH_INTERVAL_MS"] / 1000
+        self.max_events = config["VIEW_BUFFER_MAX_EVENTS"]
+        self.spool_path = config["VIEW_SPOOL_PATH"] or None
+        # uuid -> id لا يتغير: نوفر استعلامين في كل طلب تتبع
+        self.ids = LRUCache(config["VIEW_ID_CACHE_SIZE"])
+
+        self._events = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._spool = None
+        self._spool_name = None
+        self._stats = {
+            "accepted": 0,
+            "flushed": 0,
+            "dropped": 0,
+            "discarded": 0,
+            "flushes": 0,
+            "failed_flushes": 0,
+            "high_water": 0,
+            "last_flush_ms": None,
+            "last_batch": 0,
+        }
+
+    # --- Producer side ---
+
+    def push(self, apartment_id, user_id=None, ip_address=None, created_at=None):
+        """Accept one view; returns ``False`` when it was dropped."""
+        event = {
+            "apartment_id": apartment_id,
+            "user_id": user_id,
+            "ip_address": ip_address,
+            "created_at": created_at or datetime.utcnow(),
+        }
+        with self._lock:
+            if len(self._events) >= self.max_events:
+                self._stats["dropped"] += 1
+                return False
+            self._events.append(event)
+            self._stats["accepted"] += 1
+            self._stats["high_water"] = max(self._stats["high_water"], len(self._events))
+            self._write_spool([event])
+            if len(self._events) >= self.batch_size:
+                self._wakeup.notify()
+        if self.mode == "sync":
+            self.flush()
+        else:
+            self._ensure_thread()
+        return True
+
+    def discard(self, apartment_id):
+        """Drop the buffered views of a deleted apartment."""
+        with self._lock:
+            kept = [event for event in self._events if event["apartment_id"] != apartment_id]
+            self._stats["discarded"] += len(self._events) - len(kept)
+            self._events = kept
+
+    # --- Flushing ---
+
+    def flush(self):
+        """Write every buffered event now; returns the number written."""
+        with self._flush_lock:
+            with self._lock:
+                events, self._events = self._events, []
+                flushing_spool = self._rotate_spool()
+            if not events:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                written = self._insert(events)
+            except Exception:
+                self.app.logger.exception("Could not flush %s view event(s)", len(events))
+                with self._lock:
+                    self._stats["failed_flushes"] += 1
+                    self._requeue(events)
+                self._remove(flushing_spool)
+                return 0
+
+            self._remove(flushing_spool)
+            with self._lock:
+                self._stats["flushes"] += 1
+                self._stats["flushed"] += written
+                self._stats["discarded"] += len(events) - written
+                self._stats["last_batch"] = written
+                self._stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 3)
+            return written
+
+    @staticmethod
+    def _write(events):
+        # الملخص اليومي قبل الصفوف الخام: يحتاج زوار اليوم قبل هذه الدفعة
+        record_daily_views(events)
+        db.session.execute(insert(ApartmentView.__table__), events)
+
+    def _insert(self, events):
+        # سياق مستقل: جلسة خاصة بالـ flush حتى لو نُفذ داخل طلب
+        with self.app.app_context():
+            try:
+                self._write(events)
+                db.session.commit()
+                return len(events)
+            except IntegrityError:
+                db.session.rollback()
+            # شقة أو مستخدم حُذف ومشاهداته لسه في الـ buffer،
+            # أو عامل آخر أضاف نفس الملخص اليومي في نفس اللحظة
+            apartment_ids = {event["apartment_id"] for event in events}
+            apartments = set(
+                db.session.scalars(select(Apartment.id).where(Apartment.id.in_(apartment_ids)))
+            )
+            user_ids = {event["user_id"] for event in events if event["user_id"]}
+            users = set(db.session.scalars(select(User.id).where(User.id.in_(user_ids))))
+            events = [
+                {**event, "user_id": event["user_id"] if event["user_id"] in users else None}
+                for event in events
+                if event["apartment_id"] in apartments
+            ]
+            if events:
+                self._write(events)
+            db.session.commit()
+            return len(events)
+
+    def _requeue(self, events):
+        # الأقدم أولاً، والحد الأقصى يسري على المُعاد أيضاً
+        room = max(0, self.max_events - len(self._events))
+        kept = events[:room]
+        self._stats["dropped"] += len(events) - len(kept)
+        self._events = kept + self._events
+        self._write_spool(kept)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._closed and len(self._events) < self.batch_size:
+                    self._wakeup.wait(self.interval)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None and not self._closed:
+                    self._thread = threading.Thread(
+                        target=self._run, name="view-flusher", daemon=True
+                    )
+                    self._thread.start()
+
+    def close(self):
+        """Stop the flusher and write what is left (called at exit)."""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        else:
+            self.flush()
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+
+    # --- Spool file ---
+
+    def _own_spool(self):
+        # الـ pid وقت الكتابة وليس وقت الإنشاء: العمال يُنشأون بـ fork
+        return f"{self.spool_path}.{os.getpid()}"
+
+    def _write_spool(self, events):
+        if not self.spool_path or not events:
+            return
+        if self._spool is None:
+            self._spool_name = self._own_spool()
+            os.makedirs(os.path.dirname(os.path.abspath(self._spool_name)), exist_ok=True)
+            self._spool = open(self._spool_name, "a", encoding="utf-8")
+        for event in events:
+            self._spool.write(
+                json.dumps({**event, "created_at": event["created_at"].strftime(_TIME_FORMAT)})
+                + "\n"
+            )
+        self._spool.flush()
+
+    def _rotate_spool(self):
+        # الأحداث المسحوبة للـ flush تنتقل لملف جانبي يُمسح بعد نجاحه
+        if self._spool is None:
+            return None
+        self._spool.close()
+        self._spool = None
+        flushing = f"{self._spool_name}.flushing"
+        try:
+            os.replace(self._spool_name, flushing)
+        except FileNotFoundError:
+            return None
+        return flushing
+
+    @staticmethod
+    def _remove(path):
+        if path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _process_alive(pid):
+        if pid == os.getpid():
+            return False  # ملف عملية سابقة بنفس الـ pid: لم نكتب شيئاً بعد
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _orphaned_spools(self):
+        """Spool files of dead processes, oldest first per process."""
+        orphans = []
+        for path in glob.glob(f"{glob.escape(self.spool_path)}.*"):
+            suffix = path[len(self.spool_path) + 1 :]
+            pid, _, rest = suffix.partition(".")
+            if not pid.isdigit() or rest not in ("", "flushing"):
+                continue
+            if not self._process_alive(int(pid)):
+                # الملف الجانبي أقدم من الملف الحالي لنفس العملية
+                orphans.append((int(pid), rest != "flushing", path))
+        return [path for *_, path in sorted(orphans)]
+
+    def recover(self):
+        """Queue the events left in the spool files of dead processes."""
+        if not self.spool_path:
+            return 0
+        recovered = 0
+        for index, path in enumerate(self._orphaned_spools()):
+            claimed = f"{self._own_spool()}.recovering-{index}"
+            try:
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                continue  # عامل آخر أخذه
+            events = []
+            with open(claimed, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                        event["created_at"] = datetime.strptime(event["created_at"], _TIME_FORMAT)
+                    except (ValueError, KeyError):
+                        continue  # سطر ناقص من كتابة انقطعت
+                    events.append(event)
+            # تُكتب في ملفنا (_requeue) قبل مسح الملف المأخوذ
+            with self._lock:
+                self._requeue(events)
+                self._stats["accepted"] += len(events)
+            os.remove(claimed)
+            recovered += len(events)
+        return recovered
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "buffered": len(self._events),
+                "capacity": self.max_events,
+                **self._stats,
+            }
+
+
+def get_view_buffer():
+    return current_app.extensions["view_buffer"]
+
+
+def cached_id(model, uuid):
+    """``model.id`` for ``uuid`` (``Apartment`` / ``User``), remembered in
+    process; ``None`` when there is no such row."""
+    ids = get_view_buffer().ids
+    key = (model.__tablename__, uuid)
+    value = ids.get(key)
+    if value is None:
+        value = db.session.scalar(select(model.id).where(model.uuid == uuid))
+        if value is not None:
+            ids.set(key, value)
+    return value
+
+
+def forget_apartment(apartment):
+    """Drop every view of an apartment being deleted: the buffered ones,
+    the stored ones and their rollups (in the caller's transaction), and
+    its cached id. Both the owner and the admin delete go through here."""
+    buffer = get_view_buffer()
+    buffer.discard(apartment.id)
+    buffer.ids.delete((Apartment.__tablename__, apartment.uuid))
+    delete_apartment_views(apartment.id)
+
+
+def init_view_buffer(app):
+    mode = app.config["VIEW_BUFFER_MODE"]
+    if mode not in BUFFER_MODES:
+        raise ValueError(f"Unknown VIEW_BUFFER_MODE: {mode}")
+    buffer = ViewBuffer(app)
+    recovered = buffer.recover()
+    if recovered:
+        app.logger.info("Recovered %s buffered view event(s) from the spool", recovered)
+    app.extensions["view_buffer"] = buffer
+    atexit.register(buffer.close)
+    return buffer
@@ -0,0 +1,90 @@
+# app/utils/view_dedupe.py
+"""Dedupe of tracked views ("seen recently?") without the database.
+
+A view counts once per visitor and apartment within a window. The visitor
+is the signed-in user, or else the client IP, so one anonymous visitor
+no longer hides everybody else's views of the same apartment:
+
+* ``view:<apartment id>:u<user id>`` for ``VIEW_DEDUPE_USER_TTL`` seconds;
+  the default 0 never expires, keeping the previous rule that a signed-in
+  user's view counts once;
+* ``view:<apartment id>:ip<address>`` for ``VIEW_DEDUPE_TTL`` seconds
+  (default 360, the previous anonymous window).
+
+Keys live in an in-process LRU with a TTL per entry
+(``VIEW_DEDUPE_MAX_ENTRIES``). With ``VIEW_DEDUPE_BACKEND=redis`` (or
+``shared``, the in-process stand-in used in tests) the check-and-set goes
+to a shared store (``SET NX EX``), so all workers agree; the local LRU
+then only remembers duplicates and saves the round trip for repeats. An
+evicted or expired key counts the visitor again — the same as a new
+window.
+"""
+import threading
+
+from flask import current_app
+
+from app.utils.cache import LocalSharedCache, LRUCache, RedisCache
+
+DEDUPE_BACKENDS = ("local", "shared", "redis")
+
+
+def visitor_key(apartment_id, user_id=None, ip_address=None):
+    if user_id:
+        return f"view:{apartment_id}:u{user_id}"
+    return f"view:{apartment_id}:ip{ip_address}"
+
+
+class ViewDeduper:
+    def __init__(self, local, shared=None, anonymous_ttl=360, user_ttl=0):
+        self.local = local
+        self.shared = shared
+        self.anonymous_ttl = anonymous_ttl
+        self.user_ttl = user_ttl
+        self._counts = {"first": 0, "repeat": 0}
+        self._lock = threading.Lock()
+
+    def first_view(self, apartment_id, user_id=None, ip_address=None):
+        """Whether this is the visitor's first view of the apartment in the
+        window (and remember it)."""
+        key = visitor_key(apartment_id, user_id, ip_address)
+        ttl = self.user_ttl if user_id else self.anonymous_ttl
+        if self.shared is None:
+            first = self.local.add(key, True, ttl)
+        elif self.local.get(key):
+            first = False
+        else:
+            first = self.shared.add(key, True, ttl)
+            self.local.set(key, True, ttl)
+        with self._lock:
+            self._counts["first" if first else "repeat"] += 1
+        return first
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": type(self.shared or self.local).__name__,
+                "entries": len(self.local),
+                **self._counts,
+            }
+
+
+def get_view_deduper():
+    return current_app.extensions["view_deduper"]
+
+
+def init_view_dedupe(app):
+    config = app.config
+    backend = config["VIEW_DEDUPE_BACKEND"]
+    if backend not in DEDUPE_BACKENDS:
+        raise ValueError(f"Unknown VIEW_DEDUPE_BACKEND: {backend}")
+    shared = None
+    if backend == "shared":
+        shared = LocalSharedCache(config["VIEW_DEDUPE_MAX_ENTRIES"])
+    elif backend == "redis":
+        shared = RedisCache(config["VIEW_DEDUPE_REDIS_URL"])
+    app.extensions["view_deduper"] = ViewDeduper(
+        LRUCache(config["VIEW_DEDUPE_MAX_ENTRIES"]),
+        shared=shared,
+        anonymous_ttl=config["VIEW_DEDUPE_TTL"],
+        user_ttl=config["VIEW_DEDUPE_USER_TTL"],
+    )
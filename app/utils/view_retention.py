@@ -0,0 +1,144 @@
+# app/utils/view_retention.py
+"""Retention of raw view events (``apartment_views``).
+
+Raw views are only needed until their day is in the rollups
+(``app.utils.view_rollups``); kept forever they slow inserts, the delete
+of an apartment and any scan, and keep every visitor's IP. ``compact_views``
+(``flask views compact``, meant for a daily cron / scheduler) handles the
+days older than ``VIEW_RETENTION_DAYS``, oldest first, one day at a time:
+
+1. *fold*: the day's rollups are recomputed from its raw rows and the day
+   is recorded in ``apartment_view_compaction`` (one commit);
+2. *delete*: the raw rows go in batches of ``VIEW_COMPACT_BATCH`` ids, one
+   short transaction each (optionally ``VIEW_COMPACT_PAUSE_MS`` apart), so
+   the table is never locked for long. With ``VIEW_ARCHIVE_DIR`` every
+   batch is first appended to ``apartment_views-<day>.jsonl.gz`` there.
+
+An interrupted run resumes where it stopped: a folded day is not folded
+again (its raw rows may already be partly gone), only its deletion goes
+on. Views of a folded day that arrive late (a spool replayed after a long
+outage) were added to the rollups on ingest and are deleted on the next
+run.
+"""
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, select
+
+from app import db
+from app.models.apartment_view import ApartmentView
+from app.models.apartment_view_daily import ApartmentViewCompaction
+from app.utils.view_rollups import rebuild_daily_views
+
+_ARCHIVE_COLUMNS = ("id", "apartment_id", "user_id", "ip_address", "created_at")
+
+
+def retention_cutoff(days=None):
+    """Midnight (UTC) of the oldest day that is kept."""
+    days = current_app.config["VIEW_RETENTION_DAYS"] if days is None else days
+    if days < 1:
+        raise ValueError("View retention must keep at least one day")
+    return datetime.combine(datetime.utcnow().date() - timedelta(days=days), datetime.min.time())
+
+
+def _oldest_day(cutoff):
+    oldest = db.session.scalar(
+        select(func.min(ApartmentView.created_at)).where(ApartmentView.created_at < cutoff)
+    )
+    return oldest.date() if oldest else None
+
+
+def _day_range(day):
+    start = datetime.combine(day, datetime.min.time())
+    return ApartmentView.created_at >= start, ApartmentView.created_at < start + timedelta(days=1)
+
+
+def fold_day(day):
+    """Recompute ``day``'s rollups from its raw views and mark it folded
+    (idempotent). Returns the compaction marker."""
+    marker = db.session.get(ApartmentViewCompaction, day)
+    if marker is not None:
+        return marker
+    raw_views = db.session.scalar(select(func.count(ApartmentView.id)).where(*_day_range(day)))
+    rebuild_daily_views(since=day, until=day + timedelta(days=1))
+    marker = ApartmentViewCompaction(day=day, raw_views=raw_views, folded_at=datetime.utcnow())
+    db.session.add(marker)
+    db.session.commit()
+    return marker
+
+
+def _archive(archive_dir, day, rows):
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"apartment_views-{day.isoformat()}.jsonl.gz")
+    # gzip يقبل الإضافة: كل دفعة member جديد في نفس الملف
+    with gzip.open(path, "at", encoding="utf-8") as f:
+        for row in rows:
+            values = dict(zip(_ARCHIVE_COLUMNS, row))
+            values["created_at"] = values["created_at"].isoformat()
+            f.write(json.dumps(values) + "\n")
+
+
+def delete_day(day, batch_size, archive_dir=None, pause=0):
+    """Delete (and archive) ``day``'s raw views in batches; returns the
+    number deleted."""
+    columns = [getattr(ApartmentView, name) for name in _ARCHIVE_COLUMNS]
+    deleted = 0
+    while True:
+        rows = db.session.execute(
+            select(*columns).where(*_day_range(day)).order_by(ApartmentView.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        if archive_dir:
+            _archive(archive_dir, day, rows)
+        db.session.execute(
+            delete(ApartmentView.__table__).where(
+                ApartmentView.__table__.c.id.in_([row.id for row in rows])
+            )
+        )
+        db.session.commit()
+        deleted += len(rows)
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+def compact_views(retention_days=None, batch_size=None, archive_dir=None, pause_ms=None, dry_run=False):
+    """Fold and delete every raw view older than the retention window.
+
+    Returns ``{"cutoff", "days": [{"day", "raw_views", "deleted"}]}``;
+    with ``dry_run`` nothing changes and ``deleted`` is what would go.
+    """
+    config = current_app.config
+    batch_size = batch_size or config["VIEW_COMPACT_BATCH"]
+    archive_dir = archive_dir if archive_dir is not None else config["VIEW_ARCHIVE_DIR"]
+    pause_ms = config["VIEW_COMPACT_PAUSE_MS"] if pause_ms is None else pause_ms
+    cutoff = retention_cutoff(retention_days)
+
+    days = []
+    if dry_run:
+        rows = db.session.execute(
+            select(func.date(ApartmentView.created_at).label("day"), func.count(ApartmentView.id))
+            .where(ApartmentView.created_at < cutoff)
+            .group_by("day")
+            .order_by("day")
+        )
+        for day, count in rows:
+            days.append({"day": str(day), "raw_views": count, "deleted": count})
+        return {"cutoff": cutoff.date().isoformat(), "days": days}
+
+    while True:
+        day = _oldest_day(cutoff)
+        if day is None:
+            break
+        marker = fold_day(day)
+        deleted = delete_day(day, batch_size, archive_dir or None, pause_ms / 1000)
+        marker.finished_at = datetime.utcnow()
+        db.session.commit()
+        current_app.logger.info("Compacted %s view(s) of %s", deleted, day)
+        days.append({"day": day.isoformat(), "raw_views": marker.raw_views, "deleted": deleted})
+    return {"cutoff": cutoff.date().isoformat(), "days": days}
@@ -0,0 +1,285 @@
+# app/utils/view_rollups.py
+"""View rollups: per apartment and day, and per apartment all time.
+
+Owner dashboards used to count raw ``apartment_views`` rows on every load,
+which gets slower as views pile up. Now every flush of the view buffer
+also adds its batch, in the same transaction as the raw insert, to
+
+* ``apartment_view_daily``: one row per ``(apartment_id, day)`` (UTC), and
+* ``apartment_view_total``: one row per apartment,
+
+each with the number of views and a HyperLogLog sketch of the visitors
+(``app.utils.hyperloglog``, ~2.3% standard error, exact for small counts)
+whose estimate is kept in ``unique_visitors``. A visitor is the user, or
+the IP address for anonymous views (``u<id>`` / ``ip<address>``). Daily
+sketches merge into the unique visitors of any date range, reading a few
+KB per apartment instead of the raw rows. Dashboards read only rollups,
+so their cost follows apartments × days, not the number of views.
+
+The rollup rows of a batch are read ``FOR UPDATE`` so concurrent flushes
+from several workers do not lose each other's visitors.
+``rebuild_daily_views`` recomputes rollups from the raw table (backfill
+after upgrading, or repair) with ``flask views rollup``.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import delete, insert, select, update
+
+from app import db
+from app.models.apartment_view import ApartmentView
+from app.models.apartment_view_daily import (
+    ApartmentViewCompaction,
+    ApartmentViewDaily,
+    ApartmentViewTotal,
+)
+from app.utils.hyperloglog import HyperLogLog
+
+
+def visitor_of(user_id, ip_address):
+    return f"u{user_id}" if user_id else f"ip{ip_address}"
+
+
+def _midnight(day):
+    return datetime.combine(day, time.min)
+
+
+def _apply(model, key_columns, increments):
+    """Add ``{key: (views, sketch of the new visitors)}`` to the rows of
+    ``model`` (keyed by ``key_columns``), inserting the missing ones."""
+    table = model.__table__
+    columns = [table.c[name] for name in key_columns]
+    first = columns[0]
+    conditions = [first.in_({key[0] for key in increments})]
+    if len(columns) > 1:
+        days = {key[1] for key in increments}
+        conditions += [columns[1] >= min(days), columns[1] <= max(days)]
+    existing = {
+        tuple(row[: len(columns)]): row.visitors_hll
+        for row in db.session.execute(
+            select(*columns, table.c.visitors_hll).where(*conditions).with_for_update()
+        )
+    }
+
+    missing = []
+    for key, (views, sketch) in increments.items():
+        if key in existing:
+            sketch.merge(HyperLogLog.from_bytes(existing[key]))
+            db.session.execute(
+                update(table)
+                .where(*(column == value for column, value in zip(columns, key)))
+                .values(
+                    total_views=table.c.total_views + views,
+                    unique_visitors=sketch.count(),
+                    visitors_hll=sketch.to_bytes(),
+                )
+            )
+        else:
+            missing.append(
+                {
+                    **dict(zip(key_columns, key)),
+                    "total_views": views,
+                    "unique_visitors": sketch.count(),
+                    "visitors_hll": sketch.to_bytes(),
+                }
+            )
+    if missing:
+        # عامل آخر أضاف نفس الصف بالتوازي: IntegrityError والـ buffer يعيد المحاولة
+        db.session.execute(insert(table), missing)
+
+
+def record_daily_views(events):
+    """Add raw view rows (dicts) to the daily and all-time rollups, in the
+    caller's transaction."""
+    daily = defaultdict(lambda: [0, HyperLogLog()])
+    totals = defaultdict(lambda: [0, HyperLogLog()])
+    for event in events:
+        visitor = visitor_of(event["user_id"], event["ip_address"])
+        for group in (
+            daily[(event["apartment_id"], event["created_at"].date())],
+            totals[(event["apartment_id"],)],
+        ):
+            group[0] += 1
+            group[1].add(visitor)
+    if daily:
+        _apply(ApartmentViewDaily, ("apartment_id", "day"), daily)
+        _apply(ApartmentViewTotal, ("apartment_id",), totals)
+
+
+def rebuild_totals(apartment_ids=None):
+    """Recompute ``apartment_view_total`` by merging the daily rollups."""
+    query = select(
+        ApartmentViewDaily.apartment_id,
+        ApartmentViewDaily.total_views,
+        ApartmentViewDaily.visitors_hll,
+    )
+    if apartment_ids is not None:
+        query = query.where(ApartmentViewDaily.apartment_id.in_(apartment_ids))
+    totals = defaultdict(lambda: [0, HyperLogLog()])
+    for row in db.session.execute(query):
+        total = totals[row.apartment_id]
+        total[0] += row.total_views
+        total[1].merge(HyperLogLog.from_bytes(row.visitors_hll))
+
+    table = ApartmentViewTotal.__table__
+    if apartment_ids is None:
+        db.session.execute(delete(table))
+    else:
+        db.session.execute(delete(table).where(table.c.apartment_id.in_(apartment_ids)))
+    if totals:
+        db.session.execute(
+            insert(table),
+            [
+                {
+                    "apartment_id": apartment_id,
+                    "total_views": views,
+                    "unique_visitors": sketch.count(),
+                    "visitors_hll": sketch.to_bytes(),
+                }
+                for apartment_id, (views, sketch) in totals.items()
+            ],
+        )
+
+
+def rebuild_daily_views(since=None, apartment_ids=None, until=None):
+    """Recompute the daily rollups from the raw views (days ``since`` to
+    ``until`` exclusive, for ``apartment_ids``; default everything), then
+    the all-time ones of the apartments involved. Days already compacted
+    (``app.utils.view_retention``) have lost their raw rows and are left
+    as they are. The caller commits; returns the number of daily rows
+    written."""
+    table = ApartmentViewDaily.__table__
+    conditions = []
+    rollup_conditions = [table.c.day.notin_(select(ApartmentViewCompaction.day))]
+    if since is not None:
+        conditions.append(ApartmentView.created_at >= _midnight(since))
+        rollup_conditions.append(table.c.day >= since)
+    if until is not None:
+        conditions.append(ApartmentView.created_at < _midnight(until))
+        rollup_conditions.append(table.c.day < until)
+    if apartment_ids:
+        conditions.append(ApartmentView.apartment_id.in_(apartment_ids))
+        rollup_conditions.append(table.c.apartment_id.in_(apartment_ids))
+    touched = set(
+        db.session.scalars(select(table.c.apartment_id).where(*rollup_conditions).distinct())
+    )
+    db.session.execute(delete(table).where(*rollup_conditions))
+
+    compacted = set(db.session.scalars(select(ApartmentViewCompaction.day)))
+    raw = select(
+        ApartmentView.created_at, ApartmentView.user_id, ApartmentView.ip_address
+    ).where(*conditions)
+    written = 0
+    # شقة بشقة حتى لا تتجمع كل الـ sketches في الذاكرة
+    for apartment_id in db.session.scalars(
+        select(ApartmentView.apartment_id).where(*conditions).distinct()
+    ).all():
+        days = defaultdict(lambda: [0, HyperLogLog()])
+        for row in db.session.execute(raw.where(ApartmentView.apartment_id == apartment_id)):
+            day = row.created_at.date()
+            if day in compacted:
+                continue  # وصلت متأخرة ومحسوبة بالفعل عند الإدخال
+            group = days[day]
+            group[0] += 1
+            group[1].add(visitor_of(row.user_id, row.ip_address))
+        if days:
+            db.session.execute(
+                insert(table),
+                [
+                    {
+                        "apartment_id": apartment_id,
+                        "day": day,
+                        "total_views": views,
+                        "unique_visitors": sketch.count(),
+                        "visitors_hll": sketch.to_bytes(),
+                    }
+                    for day, (views, sketch) in days.items()
+                ],
+            )
+        written += len(days)
+        touched.add(apartment_id)
+
+    everything = since is None and until is None and not apartment_ids
+    rebuild_totals(None if everything else touched)
+    return written
+
+
+def delete_apartment_views(apartment_id):
+    """Delete the raw views and the rollups of an apartment (before the
+    apartment itself: their foreign keys do not cascade). The caller
+    commits."""
+    for model in (ApartmentView, ApartmentViewDaily, ApartmentViewTotal):
+        db.session.execute(delete(model.__table__).where(model.__table__.c.apartment_id == apartment_id))
+
+
+# --- Dashboard reads ---
+
+
+def view_totals(apartment_ids):
+    """``{apartment id: (views, unique visitors)}`` of all time."""
+    if not apartment_ids:
+        return {}
+    rows = db.session.execute(
+        select(
+            ApartmentViewTotal.apartment_id,
+            ApartmentViewTotal.total_views,
+            ApartmentViewTotal.unique_visitors,
+        ).where(ApartmentViewTotal.apartment_id.in_(apartment_ids))
+    )
+    return {row.apartment_id: (row.total_views, row.unique_visitors) for row in rows}
+
+
+def total_views(apartment_ids):
+    """``{apartment id: views}`` of all time."""
+    return {key: views for key, (views, _) in view_totals(apartment_ids).items()}
+
+
+def unique_visitors(apartment_ids, start, end):
+    """``{apartment id: estimated distinct visitors}`` from ``start`` to
+    ``end`` (inclusive), merging the daily sketches."""
+    rows = db.session.execute(
+        select(ApartmentViewDaily.apartment_id, ApartmentViewDaily.visitors_hll).where(
+            ApartmentViewDaily.apartment_id.in_(apartment_ids),
+            ApartmentViewDaily.day >= start,
+            ApartmentViewDaily.day <= end,
+        )
+    )
+    blobs = defaultdict(list)
+    for apartment_id, blob in rows:
+        blobs[apartment_id].append(blob)
+    return {
+        apartment_id: HyperLogLog.merged(blobs.get(apartment_id, ())).count()
+        for apartment_id in apartment_ids
+    }
+
+
+def daily_series(apartment_ids, start, end):
+    """``{apartment id: [{"date", "views", "unique_visitors"}, ...]}`` for
+    every day from ``start`` to ``end`` (inclusive), zeros included."""
+    rows = db.session.execute(
+        select(
+            ApartmentViewDaily.apartment_id,
+            ApartmentViewDaily.day,
+            ApartmentViewDaily.total_views,
+            ApartmentViewDaily.unique_visitors,
+        ).where(
+            ApartmentViewDaily.apartment_id.in_(apartment_ids),
+            ApartmentViewDaily.day >= start,
+            ApartmentViewDaily.day <= end,
+        )
+    )
+    by_key = {(row.apartment_id, row.day): row for row in rows}
+    days = [start + timedelta(days=n) for n in range((end - start).days + 1)]
+    series = {}
+    for apartment_id in apartment_ids:
+        series[apartment_id] = []
+        for day in days:
+            row = by_key.get((apartment_id, day))
+            series[apartment_id].append(
+                {
+                    "date": day.isoformat(),
+                    "views": row.total_views if row else 0,
+                    "unique_visitors": row.unique_visitors if row else 0,
+                }
+            )
+    return series
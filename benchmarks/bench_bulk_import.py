@@ -0,0 +1,77 @@
+"""Bulk import versus one ORM insert + commit per listing.
+
+Usage: python benchmarks/bench_bulk_import.py [rows ...]
+(defaults to 1000 and 10000 rows, in an in-memory SQLite database; the
+per-row baseline is measured on the first 1000 rows and extrapolated)
+"""
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import create_app, db
+from app.models.apartment import Apartment
+from app.models.image import Image
+from app.models.neighborhood import Neighborhood
+from app.models.user import User
+from app.utils.bulk_import import import_apartments, iter_rows
+
+HEADER = "title,address,price,bedrooms,residenceType,neighborhood,features,images,latitude,longitude\n"
+
+
+def csv_body(rows):
+    lines = [
+        f"شقة {i},شارع {i % 300},{1000 + i},{1 + i % 4},شقة كاملة,الحي الأول,"
+        f"واي فاي|تكييف,https://img.example/{i}-1.jpg|https://img.example/{i}-2.jpg,"
+        f"{30 + i % 100 / 1000},{31 + i % 100 / 1000}"
+        for i in range(rows)
+    ]
+    return (HEADER + "\n".join(lines)).encode()
+
+
+def run(rows):
+    app = create_app(
+        {"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:", "SQLALCHEMY_ENGINE_OPTIONS": {}}
+    )
+    with app.app_context():
+        db.create_all()
+        owner = User(full_name="Owner", email="owner@example.com", password_hash="x")
+        hood = Neighborhood(name="الحي الأول")
+        db.session.add_all([owner, hood])
+        db.session.commit()
+
+        baseline_rows = min(rows, 1000)
+        started = time.perf_counter()
+        for i in range(baseline_rows):
+            apartment = Apartment(
+                title=f"شقة {i}", address="شارع", price=1000, rooms=2, bathrooms=1,
+                kitchens=1, total_beds=4, available_beds=2, residence_type="شقة كاملة",
+                owner_id=owner.id, neighborhood_id=hood.id, has_wifi=True, has_ac=True,
+                latitude=30.0, longitude=31.0,
+            )
+            db.session.add(apartment)
+            db.session.flush()
+            db.session.add_all(
+                [Image(url=f"{i}-{n}.jpg", apartment_id=apartment.id) for n in (1, 2)]
+            )
+            db.session.commit()
+        per_row = (time.perf_counter() - started) / baseline_rows
+
+        started = time.perf_counter()
+        summary = import_apartments(iter_rows(io.BytesIO(csv_body(rows)), "csv"), owner_id=owner.id)
+        db.session.commit()
+        bulk = time.perf_counter() - started
+        assert summary["imported"] == rows, summary["errors"][:3]
+
+        print(
+            f"{rows:>6} rows: per-row ORM ~{per_row * rows:7.2f}s  "
+            f"bulk import {bulk:6.2f}s  ({per_row * rows / bulk:.1f}x)"
+        )
+        db.drop_all()
+
+
+if __name__ == "__main__":
+    for count in [int(arg) for arg in sys.argv[1:]] or [1000, 10000]:
+        run(count)
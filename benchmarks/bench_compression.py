@@ -0,0 +1,91 @@
+"""CPU cost versus bytes saved when compressing listing payloads.
+
+Usage: python benchmarks/bench_compression.py [rows ...]
+(defaults to 500 and 5000 apartments, the size of unpaginated listings)
+"""
+import gzip
+import json
+import random
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+TITLES = ["شقة للطلاب", "غرفة مفروشة", "استوديو قريب من الجامعة", "سكن بنات"]
+HOODS = ["الحي الأول", "الحي الثاني", "حي الجامعة", "وسط البلد"]
+FEATURES = ["واي فاي", "تكييف", "بلكونة", "مصعد", "غسالة", "بوتجاز/فرن"]
+
+
+def listing_payload(rows, seed=1):
+    """JSON shaped like ``/api/v1/apartments/`` (include_all_images)."""
+    rng = random.Random(seed)
+    items = []
+    for i in range(rows):
+        items.append(
+            {
+                "id": i,
+                "uuid": f"{rng.getrandbits(128):032x}",
+                "title": f"{rng.choice(TITLES)} {i}",
+                "description": " ".join(rng.choice(TITLES) for _ in range(12)),
+                "address": f"شارع {rng.randint(1, 300)}",
+                "price": rng.randint(800, 6000),
+                "bedrooms": rng.randint(1, 4),
+                "bathrooms": 1,
+                "kitchens": 1,
+                "totalBeds": 4,
+                "availableBeds": rng.randint(0, 4),
+                "residenceType": "شقة كاملة",
+                "whatsappNumber": f"01{rng.randint(0, 10**9):09d}",
+                "isVerified": True,
+                "ownerName": f"مالك {rng.randint(1, 200)}",
+                "neighborhood": rng.choice(HOODS),
+                "area": rng.randint(60, 180),
+                "preferred_tenant_type": "طلاب",
+                "floorNumber": rng.randint(0, 10),
+                "features": rng.sample(FEATURES, rng.randint(0, len(FEATURES))),
+                "createdAt": "2026-10-18T12:00:00",
+                "rating": round(rng.uniform(0, 5), 1),
+                "reviewCount": rng.randint(0, 40),
+                "isFavorite": False,
+                "images": [
+                    f"https://res.cloudinary.com/demo/image/upload/{rng.getrandbits(64):x}.jpg"
+                    for _ in range(rng.randint(1, 5))
+                ],
+            }
+        )
+    return json.dumps(items, ensure_ascii=False).encode()
+
+
+def codecs():
+    for level in (1, 6, 9):
+        yield f"gzip -{level}", lambda data, level=level: gzip.compress(data, level)
+    if brotli is not None:
+        for quality in (1, 5, 11):
+            yield f"brotli q{quality}", lambda data, q=quality: brotli.compress(data, quality=q)
+
+
+def bench(rows, repeat=3):
+    data = listing_payload(rows)
+    print(f"{rows} rows, {len(data) / 1024:.0f} KiB raw")
+    print(f"  {'codec':<12} {'KiB':>8} {'ratio':>7} {'ms':>8} {'MiB/s':>8}")
+    for name, compress in codecs():
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            out = compress(data)
+            best = min(best, time.perf_counter() - start)
+        print(
+            f"  {name:<12} {len(out) / 1024:8.0f} {len(data) / len(out):7.1f}"
+            f" {best * 1000:8.1f} {len(data) / best / 2**20:8.1f}"
+        )
+    if brotli is None:
+        print("  (install Brotli to include br)")
+
+
+if __name__ == "__main__":
+    import sys
+
+    for rows in [int(arg) for arg in sys.argv[1:]] or [500, 5000]:
+        bench(rows)
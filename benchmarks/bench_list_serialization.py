@@ -0,0 +1,100 @@
+"""Compare ``Apartment.to_dict`` with the projected list serializer.
+
+Usage: python benchmarks/bench_list_serialization.py [rows ...]
+(defaults to 1000 and 10000 rows, in an in-memory SQLite database)
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload, selectinload
+
+from app import create_app, db
+from app.models.apartment import Apartment
+from app.models.image import Image
+from app.models.neighborhood import Neighborhood
+from app.models.user import User
+from app.schemas.apartment_list import project_listing, serialize_rows
+
+
+def seed(rows):
+    owner = User(full_name="Owner", email="owner@example.com", password_hash="x")
+    hood = Neighborhood(name="الحي الأول")
+    db.session.add_all([owner, hood])
+    db.session.flush()
+    db.session.execute(
+        insert(Apartment),
+        [
+            dict(
+                uuid=f"bench-{i}",
+                title=f"شقة {i}",
+                address="شارع الجامعة",
+                price=1000 + i,
+                rooms=2,
+                bathrooms=1,
+                kitchens=1,
+                total_beds=4,
+                available_beds=2,
+                residence_type="شقة كاملة",
+                features_mask=i % 256,
+                owner_id=owner.id,
+                neighborhood_id=hood.id,
+            )
+            for i in range(rows)
+        ],
+    )
+    ids = [i for (i,) in db.session.query(Apartment.id)]
+    db.session.execute(
+        insert(Image),
+        [{"url": f"{i}-{n}.jpg", "apartment_id": i} for i in ids for n in range(3)],
+    )
+    db.session.commit()
+    return set(ids[::10])
+
+
+def timed(label, fn, repeat=3):
+    best = min(_run(fn) for _ in range(repeat))
+    print(f"  {label:<22} {best * 1000:9.1f} ms")
+    return best
+
+
+def _run(fn):
+    db.session.expunge_all()
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def bench(rows):
+    app = create_app(
+        {"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:", "SQLALCHEMY_ENGINE_OPTIONS": {}}
+    )
+    with app.app_context():
+        db.create_all()
+        favorites = seed(rows)
+        favorites_list = list(favorites)
+
+        def orm_to_dict():
+            apartments = Apartment.query.options(
+                joinedload(Apartment.owner),
+                joinedload(Apartment.neighborhood),
+                selectinload(Apartment.images),
+            ).all()
+            return [ap.to_dict(favorites_list) for ap in apartments]
+
+        def projected():
+            return serialize_rows(project_listing(Apartment.query).all(), favorites)
+
+        print(f"{rows} rows")
+        slow = timed("ORM + to_dict (list)", orm_to_dict)
+        fast = timed("projected rows (set)", projected)
+        print(f"  speedup                {slow / fast:9.1f}x")
+        db.drop_all()
+
+
+if __name__ == "__main__":
+    for rows in [int(arg) for arg in sys.argv[1:]] or [1000, 10000]:
+        bench(rows)
@@ -0,0 +1,101 @@
+"""Parallel versus serial multi-file upload in /images/upload-image.
+
+Usage: python benchmarks/bench_parallel_upload.py [files] [latency seconds]
+(defaults to 10 files and 0.2s per upload; the storage backend is a stub
+that sleeps for the given latency, like a round trip to the CDN. Each
+file is a distinct small JPEG stored with one variant, so every file
+costs two uploads and none is deduplicated)
+"""
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from flask_jwt_extended import create_access_token
+from PIL import Image as PILImage
+
+from app import create_app, db
+from app.models.apartment import Apartment
+from app.models.neighborhood import Neighborhood
+from app.models.user import User
+
+
+class SlowStorage:
+    name = "slow"
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def save(self, source, key):
+        time.sleep(self.latency)
+        return f"https://cdn.example/{key}"
+
+    def delete(self, url):
+        pass
+
+
+def jpeg(seed):
+    buffer = io.BytesIO()
+    PILImage.new("RGB", (64, 48), (seed * 37 % 256, seed * 91 % 256, 90)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def run(files, latency):
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "SQLALCHEMY_ENGINE_OPTIONS": {},
+            "JWT_COOKIE_CSRF_PROTECT": False,
+            "IMAGE_VARIANT_WIDTHS": [32],
+            "IMAGE_VARIANT_FORMATS": ["jpeg"],
+        }
+    )
+    app.extensions["image_storage"] = SlowStorage(latency)
+    with app.app_context():
+        db.create_all()
+        owner = User(full_name="Owner", email="owner@example.com", password_hash="x")
+        hood = Neighborhood(name="الحي الأول")
+        db.session.add_all([owner, hood])
+        db.session.flush()
+        apartment = Apartment(
+            title="شقة", address="شارع", price=1000, rooms=2, bathrooms=1, kitchens=1,
+            total_beds=2, available_beds=2, residence_type="غرفة",
+            owner_id=owner.id, neighborhood_id=hood.id,
+        )
+        db.session.add(apartment)
+        db.session.commit()
+
+        client = app.test_client()
+        client.set_cookie("access_token_cookie", create_access_token(identity=owner.uuid))
+
+        timings = {}
+        for run_index, (label, concurrency) in enumerate((("serial", 1), ("parallel", files))):
+            app.config["IMAGE_UPLOAD_CONCURRENCY"] = concurrency
+            started = time.perf_counter()
+            response = client.post(
+                f"/api/v1/images/upload-image/{apartment.id}",
+                data={
+                    "images": [
+                        (io.BytesIO(jpeg(run_index * files + n)), f"{n}.jpg")
+                        for n in range(files)
+                    ]
+                },
+                content_type="multipart/form-data",
+            )
+            timings[label] = time.perf_counter() - started
+            assert response.status_code == 201, response.get_json()
+
+        print(
+            f"{files} files @ {latency}s: serial {timings['serial']:.2f}s  "
+            f"parallel {timings['parallel']:.2f}s  "
+            f"({timings['serial'] / timings['parallel']:.1f}x)"
+        )
+        db.drop_all()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(int(args[0]) if args else 10, float(args[1]) if len(args) > 1 else 0.2)
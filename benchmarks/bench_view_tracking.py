@@ -0,0 +1,80 @@
+"""Per-request versus buffered writes in /api/views/track.
+
+Usage: python benchmarks/bench_view_tracking.py [views]
+(defaults to 2000 views, each of a different apartment so none is
+deduplicated; uses a SQLite file so the flusher thread sees the same
+database)
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import event, insert
+
+from app import create_app, db
+from app.models.apartment import Apartment
+from app.models.apartment_view import ApartmentView
+from app.models.neighborhood import Neighborhood
+from app.models.user import User
+from app.utils.view_buffer import ViewBuffer
+from app.utils.view_dedupe import init_view_dedupe
+
+
+def run(views):
+    folder = tempfile.mkdtemp()
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(folder, 'bench.db')}",
+            "SQLALCHEMY_ENGINE_OPTIONS": {},
+        }
+    )
+    with app.app_context():
+        db.create_all()
+        owner = User(full_name="Owner", email="owner@example.com", password_hash="x")
+        hood = Neighborhood(name="الحي الأول")
+        db.session.add_all([owner, hood])
+        db.session.flush()
+        db.session.execute(
+            insert(Apartment),
+            [
+                dict(
+                    title="شقة", address="شارع", price=1000, rooms=2, bathrooms=1, kitchens=1,
+                    total_beds=2, available_beds=2, residence_type="غرفة",
+                    owner_id=owner.id, neighborhood_id=hood.id,
+                )
+                for _ in range(views)
+            ],
+        )
+        db.session.commit()
+        uuids = [uuid for uuid, in db.session.query(Apartment.uuid)]
+
+        commits = []
+        event.listen(db.engine, "commit", lambda conn: commits.append(1))
+        client = app.test_client()
+        for mode in ("sync", "thread"):
+            db.session.query(ApartmentView).delete()
+            db.session.commit()
+            app.config["VIEW_BUFFER_MODE"] = mode
+            buffer = app.extensions["view_buffer"] = ViewBuffer(app)
+            init_view_dedupe(app)
+            commits.clear()
+            started = time.perf_counter()
+            for uuid in uuids:
+                assert client.post(f"/api/views/track/{uuid}").status_code == 201
+            elapsed = time.perf_counter() - started
+            buffer.close()
+            written = db.session.query(ApartmentView).count()
+            print(
+                f"{mode:>6}: {elapsed / views * 1e6:7.0f} µs/request  "
+                f"{len(commits):5d} commits  {written} rows"
+            )
+        db.drop_all()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(int(args[0]) if args else 2000)
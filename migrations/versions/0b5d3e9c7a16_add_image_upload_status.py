@@ -0,0 +1,41 @@
+"""Track the background upload of each image
+
+Revision ID: 0b5d3e9c7a16
+Revises: f2a7c18e4b90
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0b5d3e9c7a16"
+down_revision = "f2a7c18e4b90"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("image", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("status", sa.String(length=16), nullable=False, server_default="ready")
+        )
+        batch_op.add_column(sa.Column("spool_path", sa.String(length=512), nullable=True))
+        batch_op.add_column(
+            sa.Column("attempts", sa.Integer(), nullable=False, server_default="0")
+        )
+        batch_op.add_column(sa.Column("last_error", sa.String(length=255), nullable=True))
+        batch_op.alter_column("url", existing_type=sa.String(length=255), nullable=True)
+        batch_op.create_index("ix_image_status", ["status"], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table("image", schema=None) as batch_op:
+        batch_op.drop_index("ix_image_status")
+        batch_op.alter_column("url", existing_type=sa.String(length=255), nullable=False)
+        batch_op.drop_column("last_error")
+        batch_op.drop_column("attempts")
+        batch_op.drop_column("spool_path")
+        batch_op.drop_column("status")
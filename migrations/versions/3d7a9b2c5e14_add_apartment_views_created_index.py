@@ -0,0 +1,30 @@
+"""Add (apartment_id, created_at) index on apartment_views
+
+Revision ID: 3d7a9b2c5e14
+Revises: 9c4f2a7e1d85
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "3d7a9b2c5e14"
+down_revision = "9c4f2a7e1d85"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("apartment_views", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_apartment_views_apartment_id_created_at",
+            ["apartment_id", "created_at"],
+            unique=False,
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("apartment_views", schema=None) as batch_op:
+        batch_op.drop_index("ix_apartment_views_apartment_id_created_at")
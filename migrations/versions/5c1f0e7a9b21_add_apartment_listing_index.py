@@ -0,0 +1,28 @@
+"""Add (created_at, id) index for apartment cursor pagination
+
+Revision ID: 5c1f0e7a9b21
+Revises: 312274a03160
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "5c1f0e7a9b21"
+down_revision = "312274a03160"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("apartment", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_apartment_created_at_id", ["created_at", "id"], unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("apartment", schema=None) as batch_op:
+        batch_op.drop_index("ix_apartment_created_at_id")
@@ -0,0 +1,35 @@
+"""Store image dimensions, placeholder colour/blurhash and variants
+
+Revision ID: 5e8a1c4d2b37
+Revises: 0b5d3e9c7a16
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5e8a1c4d2b37"
+down_revision = "0b5d3e9c7a16"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("image", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("width", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("height", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("color", sa.String(length=7), nullable=True))
+        batch_op.add_column(sa.Column("blurhash", sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column("variants", sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("image", schema=None) as batch_op:
+        batch_op.drop_column("variants")
+        batch_op.drop_column("blurhash")
+        batch_op.drop_column("color")
+        batch_op.drop_column("height")
+        batch_op.drop_column("width")
@@ -0,0 +1,34 @@
+"""Daily view rollups per apartment
+
+Revision ID: 7b1e4c8f2a90
+Revises: 3d7a9b2c5e14
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "7b1e4c8f2a90"
+down_revision = "3d7a9b2c5e14"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # بعد الترقية: flask views rollup لحساب الأيام السابقة
+    op.create_table(
+        "apartment_view_daily",
+        sa.Column("apartment_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("total_views", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("unique_visitors", sa.Integer(), server_default="0", nullable=False),
+        sa.ForeignKeyConstraint(["apartment_id"], ["apartment.id"]),
+        sa.PrimaryKeyConstraint("apartment_id", "day"),
+    )
+
+
+def downgrade():
+    op.drop_table("apartment_view_daily")
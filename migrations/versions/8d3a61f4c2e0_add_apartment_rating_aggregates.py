@@ -0,0 +1,61 @@
+"""Add denormalized rating aggregates to apartments
+
+Revision ID: 8d3a61f4c2e0
+Revises: 5c1f0e7a9b21
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "8d3a61f4c2e0"
+down_revision = "5c1f0e7a9b21"
+branch_labels = None
+depends_on = None
+
+COUNTER_COLUMNS = ["rating_sum", "rating_count"] + [
+    f"rating_{star}_count" for star in range(1, 6)
+]
+
+
+def upgrade():
+    with op.batch_alter_table("apartment", schema=None) as batch_op:
+        for name in COUNTER_COLUMNS:
+            batch_op.add_column(
+                sa.Column(name, sa.Integer(), nullable=False, server_default="0")
+            )
+        batch_op.add_column(
+            sa.Column("rating_avg", sa.Float(), nullable=False, server_default="0")
+        )
+        batch_op.create_index(
+            "ix_apartment_rating_avg_id", ["rating_avg", "id"], unique=False
+        )
+
+    # Backfill from the existing reviews (same logic as `flask ratings rebuild`).
+    star_counts = ", ".join(
+        f"rating_{star}_count = (SELECT COUNT(*) FROM review "
+        f"WHERE review.apartment_id = apartment.id AND review.rating = {star})"
+        for star in range(1, 6)
+    )
+    op.execute(
+        "UPDATE apartment SET "
+        "rating_sum = (SELECT COALESCE(SUM(rating), 0) FROM review "
+        "WHERE review.apartment_id = apartment.id), "
+        "rating_count = (SELECT COUNT(*) FROM review "
+        "WHERE review.apartment_id = apartment.id), " + star_counts
+    )
+    op.execute(
+        "UPDATE apartment SET rating_avg = CASE WHEN rating_count > 0 "
+        "THEN rating_sum * 1.0 / rating_count ELSE 0 END"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("apartment", schema=None) as batch_op:
+        batch_op.drop_index("ix_apartment_rating_avg_id")
+        batch_op.drop_column("rating_avg")
+        for name in reversed(COUNTER_COLUMNS):
+            batch_op.drop_column(name)
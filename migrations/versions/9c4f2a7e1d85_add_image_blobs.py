@@ -0,0 +1,58 @@
+"""Content-addressed image blobs shared between images
+
+Revision ID: 9c4f2a7e1d85
+Revises: 5e8a1c4d2b37
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "9c4f2a7e1d85"
+down_revision = "5e8a1c4d2b37"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "image_blob",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("sha256", sa.String(length=64), nullable=False),
+        sa.Column("phash", sa.String(length=16), nullable=True),
+        sa.Column("size", sa.Integer(), nullable=True),
+        sa.Column("url", sa.String(length=255), nullable=False),
+        sa.Column("width", sa.Integer(), nullable=True),
+        sa.Column("height", sa.Integer(), nullable=True),
+        sa.Column("color", sa.String(length=7), nullable=True),
+        sa.Column("blurhash", sa.String(length=64), nullable=True),
+        sa.Column("variants", sa.JSON(), nullable=True),
+        sa.Column("ref_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("sha256"),
+    )
+    with op.batch_alter_table("image_blob", schema=None) as batch_op:
+        batch_op.create_index(batch_op.f("ix_image_blob_phash"), ["phash"], unique=False)
+
+    with op.batch_alter_table("image", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("blob_id", sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f("ix_image_blob_id"), ["blob_id"], unique=False)
+        batch_op.create_foreign_key(
+            "fk_image_blob_id_image_blob", "image_blob", ["blob_id"], ["id"]
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("image", schema=None) as batch_op:
+        batch_op.drop_constraint("fk_image_blob_id_image_blob", type_="foreignkey")
+        batch_op.drop_index(batch_op.f("ix_image_blob_id"))
+        batch_op.drop_column("blob_id")
+
+    with op.batch_alter_table("image_blob", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_image_blob_phash"))
+
+    op.drop_table("image_blob")
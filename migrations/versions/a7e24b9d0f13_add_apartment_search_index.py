@@ -0,0 +1,45 @@
+"""Add apartment full-text search index
+
+Revision ID: a7e24b9d0f13
+Revises: 8d3a61f4c2e0
+Create Date: 2026-10-18 12:00:00.000000
+
+Run `flask search reindex` after upgrading to populate the index.
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "a7e24b9d0f13"
+down_revision = "8d3a61f4c2e0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "mysql":
+        op.execute(
+            "CREATE TABLE IF NOT EXISTS apartment_search ("
+            "apartment_id INT NOT NULL PRIMARY KEY, "
+            "title VARCHAR(255) NOT NULL DEFAULT '', "
+            "neighborhood VARCHAR(255) NOT NULL DEFAULT '', "
+            "address VARCHAR(255) NOT NULL DEFAULT '', "
+            "description TEXT, "
+            "FULLTEXT KEY ft_apartment_search_title (title), "
+            "FULLTEXT KEY ft_apartment_search_all "
+            "(title, neighborhood, address, description)"
+            ") DEFAULT CHARSET=utf8mb4"
+        )
+    elif dialect == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS apartment_search USING fts5("
+            "title, neighborhood, address, description, "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name in ("mysql", "sqlite"):
+        op.execute("DROP TABLE IF EXISTS apartment_search")
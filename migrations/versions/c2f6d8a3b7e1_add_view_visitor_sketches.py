@@ -0,0 +1,40 @@
+"""HyperLogLog visitor sketches on daily rollups, all-time view totals
+
+Revision ID: c2f6d8a3b7e1
+Revises: 7b1e4c8f2a90
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c2f6d8a3b7e1"
+down_revision = "7b1e4c8f2a90"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # بعد الترقية: flask views rollup لحساب الـ sketches من المشاهدات الخام
+    with op.batch_alter_table("apartment_view_daily", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("visitors_hll", sa.LargeBinary(), nullable=True))
+
+    op.create_table(
+        "apartment_view_total",
+        sa.Column("apartment_id", sa.Integer(), nullable=False),
+        sa.Column("total_views", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("unique_visitors", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("visitors_hll", sa.LargeBinary(), nullable=True),
+        sa.ForeignKeyConstraint(["apartment_id"], ["apartment.id"]),
+        sa.PrimaryKeyConstraint("apartment_id"),
+    )
+
+
+def downgrade():
+    op.drop_table("apartment_view_total")
+
+    with op.batch_alter_table("apartment_view_daily", schema=None) as batch_op:
+        batch_op.drop_column("visitors_hll")
@@ -0,0 +1,45 @@
+"""Add geohash column for map queries
+
+Revision ID: c4f9d2a6e871
+Revises: a7e24b9d0f13
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.geo import encode_geohash
+
+
+# revision identifiers, used by Alembic.
+revision = "c4f9d2a6e871"
+down_revision = "a7e24b9d0f13"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("apartment", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("geohash", sa.String(length=12), nullable=True))
+        batch_op.create_index("ix_apartment_geohash", ["geohash"], unique=False)
+
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.text(
+            "SELECT id, latitude, longitude FROM apartment "
+            "WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+        )
+    ).fetchall()
+    for apartment_id, latitude, longitude in rows:
+        if -90 <= latitude <= 90 and -180 <= longitude <= 180:
+            bind.execute(
+                sa.text("UPDATE apartment SET geohash = :geohash WHERE id = :id"),
+                {"geohash": encode_geohash(latitude, longitude), "id": apartment_id},
+            )
+
+
+def downgrade():
+    with op.batch_alter_table("apartment", schema=None) as batch_op:
+        batch_op.drop_index("ix_apartment_geohash")
+        batch_op.drop_column("geohash")
@@ -0,0 +1,51 @@
+"""Add features_mask bitmask for apartment amenities
+
+Revision ID: d18b5e3f7a42
+Revises: c4f9d2a6e871
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "d18b5e3f7a42"
+down_revision = "c4f9d2a6e871"
+branch_labels = None
+depends_on = None
+
+# Bit order must match app.models.apartment.FEATURE_FLAGS.
+FEATURE_COLUMNS = [
+    "has_wifi",
+    "has_ac",
+    "has_balcony",
+    "has_elevator",
+    "has_washing_machine",
+    "has_oven",
+    "has_gas",
+    "near_transport",
+]
+
+
+def upgrade():
+    with op.batch_alter_table("apartment", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("features_mask", sa.Integer(), nullable=False, server_default="0")
+        )
+        batch_op.create_index(
+            "ix_apartment_features_mask", ["features_mask"], unique=False
+        )
+
+    mask = " + ".join(
+        f"(CASE WHEN {column} = 1 THEN {1 << bit} ELSE 0 END)"
+        for bit, column in enumerate(FEATURE_COLUMNS)
+    )
+    op.execute(f"UPDATE apartment SET features_mask = {mask}")
+
+
+def downgrade():
+    with op.batch_alter_table("apartment", schema=None) as batch_op:
+        batch_op.drop_index("ix_apartment_features_mask")
+        batch_op.drop_column("features_mask")
@@ -0,0 +1,36 @@
+"""Raw view retention: compaction log and created_at index
+
+Revision ID: e4a8c1f9d352
+Revises: c2f6d8a3b7e1
+Create Date: 2026-10-19 01:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e4a8c1f9d352"
+down_revision = "c2f6d8a3b7e1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "apartment_view_compaction",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("raw_views", sa.Integer(), nullable=False),
+        sa.Column("folded_at", sa.DateTime(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("day"),
+    )
+    with op.batch_alter_table("apartment_views", schema=None) as batch_op:
+        batch_op.create_index("ix_apartment_views_created_at", ["created_at"], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table("apartment_views", schema=None) as batch_op:
+        batch_op.drop_index("ix_apartment_views_created_at")
+    op.drop_table("apartment_view_compaction")
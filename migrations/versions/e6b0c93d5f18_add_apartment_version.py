@@ -0,0 +1,35 @@
+"""Add version and updated_at to apartments for conditional GETs
+
+Revision ID: e6b0c93d5f18
+Revises: d18b5e3f7a42
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e6b0c93d5f18"
+down_revision = "d18b5e3f7a42"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("apartment", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("version", sa.Integer(), nullable=False, server_default="1")
+        )
+        batch_op.add_column(sa.Column("updated_at", sa.DateTime(), nullable=True))
+        batch_op.create_index("ix_apartment_updated_at", ["updated_at"], unique=False)
+
+    op.execute("UPDATE apartment SET updated_at = created_at")
+
+
+def downgrade():
+    with op.batch_alter_table("apartment", schema=None) as batch_op:
+        batch_op.drop_index("ix_apartment_updated_at")
+        batch_op.drop_column("updated_at")
+        batch_op.drop_column("version")
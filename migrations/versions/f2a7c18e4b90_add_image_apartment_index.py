@@ -0,0 +1,28 @@
+"""Add (apartment_id, id) index on images for the list serializer
+
+Revision ID: f2a7c18e4b90
+Revises: e6b0c93d5f18
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "f2a7c18e4b90"
+down_revision = "e6b0c93d5f18"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("image", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_image_apartment_id_id", ["apartment_id", "id"], unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("image", schema=None) as batch_op:
+        batch_op.drop_index("ix_image_apartment_id_id")
@@ -14,6 +14,7 @@ def app():
         'TESTING': True,
         'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
         'SQLALCHEMY_ENGINE_OPTIONS': {},
+        'JWT_COOKIE_CSRF_PROTECT': False,
     })
     with app.app_context():
         db.create_all()
@@ -23,4 +24,79 @@ def app():
 
 @pytest.fixture
 def client(app):
-    return app.test_client()
\ No newline at end of file
+    return app.test_client()
+
+@pytest.fixture
+def owner(app):
+    from app.models.user import User
+    user = User(full_name="Owner", email="owner@example.com", role="owner")
+    user.set_password("StrongPass1!")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def neighborhood(app):
+    from app.models.neighborhood import Neighborhood
+    hood = Neighborhood(name="الحي الأول")
+    db.session.add(hood)
+    db.session.commit()
+    return hood
+
+
+@pytest.fixture
+def make_apartment(app, owner, neighborhood):
+    from app.models.apartment import Apartment
+
+    def _make(**overrides):
+        fields = dict(
+            title="شقة للطلاب",
+            address="شارع الجامعة",
+            price=1500,
+            rooms=2,
+            bathrooms=1,
+            kitchens=1,
+            total_beds=4,
+            available_beds=2,
+            residence_type="شقة كاملة",
+            owner_id=owner.id,
+            neighborhood_id=neighborhood.id,
+        )
+        fields.update(overrides)
+        apartment = Apartment(**fields)
+        db.session.add(apartment)
+        db.session.commit()
+        return apartment
+
+    return _make
+
+
+@pytest.fixture
+def login(client):
+    from flask_jwt_extended import create_access_token
+
+    def _login(user):
+        token = create_access_token(identity=user.uuid)
+        client.set_cookie('access_token_cookie', token)
+        return user
+
+    return _login
+
+
+@pytest.fixture
+def admin_headers(app):
+    import datetime
+
+    import jwt
+    from app.models.admin import Admin
+
+    admin = Admin(username='admin', email='admin@example.com', password='x')
+    db.session.add(admin)
+    db.session.commit()
+    token = jwt.encode(
+        {'admin_id': admin.id, 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1)},
+        app.config['SECRET_KEY'],
+        algorithm='HS256',
+    )
+    return {'Authorization': f'Bearer {token}'}
@@ -0,0 +1,110 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app import db
+from app.models.favorite import Favorite
+from app.models.image import Image
+from app.models.review import Review
+from app.models.user import User
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def add_reviews(apartment, count):
+    for index in range(count):
+        reviewer = User(full_name=f'Reviewer {index}', email=f'r{index}@example.com')
+        reviewer.set_password('StrongPass1!')
+        db.session.add(reviewer)
+        db.session.flush()
+        db.session.add(Review(
+            rating=4, comment=f'comment {index}',
+            user_id=reviewer.id, apartment_id=apartment.id,
+        ))
+    db.session.commit()
+
+
+def test_details_load_in_two_queries_with_reviews_and_favorite(client, app, make_apartment, owner, login):
+    apartment = make_apartment()
+    db.session.add_all([Image(url=f'{i}.jpg', apartment_id=apartment.id) for i in range(3)])
+    add_reviews(apartment, 7)
+    db.session.add(Favorite(user_id=owner.id, apartment_id=apartment.id))
+    db.session.commit()
+    login(owner)
+
+    url = f'/api/v1/apartments/{apartment.uuid}?include_reviews=true'
+    with count_queries() as statements:
+        response = client.get(url)
+    data = response.get_json()
+
+    # id المستخدم + مفضلاته (للـ ETag) + الـ probe + استعلام الشقة + UNION الصور والتقييمات
+    assert response.status_code == 200
+    assert len(statements) == 5
+    assert data['images'] == ['0.jpg', '1.jpg', '2.jpg']
+    assert data['isFavorite'] is True
+    assert data['owner']['fullName'] == 'Owner'
+    assert len(data['reviews']) == app.config['DETAIL_REVIEWS_PAGE_SIZE']
+    assert data['reviews'][0]['comment'] == 'comment 6'
+
+    # نفس النسخة: الكاش يغني عن id المستخدم واستعلام الصور والتقييمات
+    with count_queries() as statements:
+        assert client.get(url).get_json() == data
+    assert len(statements) == 3
+
+
+def test_detail_cache_follows_review_edits_and_favorites(client, make_apartment, owner, login):
+    apartment = make_apartment()
+    add_reviews(apartment, 1)
+    login(owner)
+    url = f'/api/v1/apartments/{apartment.uuid}?include_reviews=true'
+    assert client.get(url).get_json()['isFavorite'] is False
+
+    review = db.session.get(Review, 1)
+    review.comment = 'edited'
+    db.session.add(Favorite(user_id=owner.id, apartment_id=apartment.id))
+    db.session.commit()
+
+    data = client.get(url).get_json()
+    assert data['reviews'][0]['comment'] == 'edited'
+    assert data['isFavorite'] is True
+
+
+def test_featured_and_by_id_match_to_dict(client, make_apartment):
+    apartment = make_apartment()
+    db.session.add(Image(url='main.jpg', apartment_id=apartment.id))
+    db.session.commit()
+
+    by_id = client.get(f'/api/v1/apartments/{apartment.id}').get_json()
+    assert by_id == apartment.to_dict()
+    featured = client.get('/api/v1/apartments/featured').get_json()
+    assert featured[0]['image'] == 'main.jpg'
+    assert featured[0]['images'] == ['main.jpg']
+    assert featured[0]['neighborhood']['name'] == 'الحي الأول'
+
+
+def test_detail_payload_follows_namespace_invalidation(client, make_apartment, owner, login):
+    from app.utils.cache import DETAILS, invalidate_cache
+
+    apartment = make_apartment()
+    login(owner)
+    url = f'/api/v1/apartments/apartment/{apartment.uuid}'
+    client.get(url)
+    with count_queries() as warm:
+        client.get(url)
+
+    invalidate_cache(DETAILS)
+    with count_queries() as cold:
+        client.get(url)
+    assert len(cold) == len(warm) + 1  # استعلام الصور والتقييمات من جديد
@@ -0,0 +1,163 @@
+from datetime import datetime, timedelta
+
+
+def _seed(make_apartment, count):
+    base = datetime(2025, 1, 1)
+    return [
+        make_apartment(title=f"شقة {i}", created_at=base + timedelta(minutes=i))
+        for i in range(count)
+    ]
+
+
+def test_cursor_pagination_walks_every_apartment_once(client, make_apartment):
+    _seed(make_apartment, 7)
+
+    seen = []
+    cursor = None
+    while True:
+        url = '/api/v1/apartments/?paginate=cursor&limit=3'
+        if cursor:
+            url += f'&cursor={cursor}'
+        data = client.get(url).get_json()
+        seen.extend(item['title'] for item in data['items'])
+        cursor = data['next_cursor']
+        if not cursor:
+            break
+
+    assert seen == [f"شقة {i}" for i in range(6, -1, -1)]
+    assert 'total' not in data['pagination']
+
+
+def test_cursor_pagination_optional_total(client, make_apartment):
+    _seed(make_apartment, 3)
+    data = client.get('/api/v1/apartments/verified?paginate=true&limit=2&include_total=true').get_json()
+    assert len(data['items']) == 2
+    assert data['pagination']['total'] == 3
+    assert data['pagination']['has_more'] is True
+
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get('/api/v1/apartments/?cursor=not-a-cursor')
+    assert response.status_code == 400
+
+
+def test_unpaginated_listing_is_capped(client, app, make_apartment):
+    app.config['APARTMENTS_UNPAGINATED_LIMIT'] = 2
+    _seed(make_apartment, 3)
+    response = client.get('/api/v1/apartments/')
+    assert len(response.get_json()) == 2
+    assert response.headers.get('X-Next-Cursor')
+
+
+def test_rating_aggregates_follow_review_writes(client, app, login, owner, make_apartment):
+    from app import db
+    from app.models.apartment import Apartment
+
+    apartment = make_apartment()
+    login(owner)
+
+    response = client.post('/api/v1/reviews/create', json={'apartment_id': apartment.id, 'rating': 4})
+    assert response.status_code == 201
+    review_id = response.get_json()['review']['id']
+
+    client.patch(f'/api/v1/reviews/{review_id}/update', json={'rating': 2})
+    db.session.expire_all()
+    apartment = db.session.get(Apartment, apartment.id)
+    assert (apartment.rating_count, apartment.rating_sum) == (1, 2)
+    assert apartment.rating_histogram == {1: 0, 2: 1, 3: 0, 4: 0, 5: 0}
+    assert apartment.average_rating == 2.0
+
+    client.delete(f'/api/v1/reviews/{review_id}/delete')
+    db.session.expire_all()
+    apartment = db.session.get(Apartment, apartment.id)
+    assert (apartment.rating_count, apartment.rating_sum, apartment.rating_avg) == (0, 0, 0.0)
+
+
+def test_rebuild_rating_aggregates_repairs_drift(app, owner, make_apartment):
+    from app import db
+    from app.models.review import Review
+
+    apartment = make_apartment(rating_count=9, rating_sum=9)
+    db.session.add_all([
+        Review(rating=5, user_id=owner.id, apartment_id=apartment.id),
+        Review(rating=3, user_id=owner.id, apartment_id=apartment.id),
+    ])
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['ratings', 'rebuild'])
+    assert 'Rebuilt rating aggregates for 1' in result.output
+    db.session.expire_all()
+    assert (apartment.rating_count, apartment.rating_sum, apartment.rating_avg) == (2, 8, 4.0)
+    assert apartment.rating_5_count == 1
+
+
+def test_listing_sorted_by_rating(client, make_apartment):
+    make_apartment(title='low', rating_avg=2.0)
+    make_apartment(title='high', rating_avg=4.5)
+    data = client.get('/api/v1/apartments/?sort=rating').get_json()
+    assert [item['title'] for item in data] == ['high', 'low']
+    assert client.get('/api/v1/apartments/?sort=bogus').status_code == 400
+
+
+def test_filter_with_amenities_and_facets(client, make_apartment):
+    make_apartment(title='a', price=800, has_wifi=True, has_ac=True, residence_type='غرفة')
+    make_apartment(title='b', price=1500, has_wifi=True, available_beds=0)
+    make_apartment(title='c', price=6000, has_ac=True, area=120)
+
+    data = client.get('/api/v1/apartments/filter?amenities=wifi&facets=true').get_json()
+    assert sorted(item['title'] for item in data['items']) == ['a', 'b']
+    facets = data['facets']
+    assert facets['total'] == 2
+    assert facets['amenities']['wifi'] == 2 and facets['amenities']['ac'] == 1
+    assert {b['bucket']: b['count'] for b in facets['price']}['0-1000'] == 1
+    assert facets['neighborhoods'][0]['count'] == 2
+
+    data = client.get('/api/v1/apartments/filter?has_wifi=true&has_available_beds=true').get_json()
+    assert [item['title'] for item in data] == ['a']
+
+    data = client.get('/api/v1/apartments/filter?min_area=100').get_json()
+    assert [item['title'] for item in data] == ['c']
+
+    assert client.get('/api/v1/apartments/filter?amenities=pool').status_code == 400
+
+
+def test_features_mask_tracks_amenity_columns(app, make_apartment):
+    from app import db
+    from app.models.apartment import FEATURE_BITS, Apartment
+
+    apartment = make_apartment(has_wifi=True, has_elevator=True)
+    assert apartment.features_mask == FEATURE_BITS['has_wifi'] | FEATURE_BITS['has_elevator']
+
+    apartment.has_wifi = False
+    apartment.near_transport = True
+    db.session.commit()
+    assert apartment.features_mask == FEATURE_BITS['has_elevator'] | FEATURE_BITS['near_transport']
+    with app.test_request_context():
+        assert apartment.to_dict()['features'] == ['مصعد', 'قريب من المواصلات']
+
+    required = FEATURE_BITS['has_elevator'] | FEATURE_BITS['near_transport']
+    assert Apartment.query.filter(Apartment.has_features(required)).count() == 1
+    assert Apartment.query.filter(Apartment.has_features(required | FEATURE_BITS['has_ac'])).count() == 0
+
+
+def test_projected_list_rows_match_to_dict(app, make_apartment):
+    from app import db
+    from app.models.apartment import Apartment
+    from app.models.image import Image
+    from app.schemas.apartment_list import serialize_apartment_ids
+
+    with_images = make_apartment(has_wifi=True, near_transport=True)
+    bare = make_apartment(title='بدون صور')
+    db.session.add_all([
+        Image(url='first.jpg', apartment_id=with_images.id),
+        Image(url='second.jpg', apartment_id=with_images.id),
+    ])
+    db.session.commit()
+
+    ids = [with_images.id, bare.id]
+    favorites = {bare.id}
+    expected = [db.session.get(Apartment, i).to_dict(favorites) for i in ids]
+    assert serialize_apartment_ids(ids, favorite_ids=favorites) == expected
+
+    expected = [db.session.get(Apartment, i).to_dict(include_all_images=True) for i in ids]
+    assert serialize_apartment_ids(ids, include_all_images=True) == expected
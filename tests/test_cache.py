@@ -0,0 +1,107 @@
+from app import db
+from app.utils.cache import LocalSharedCache, LRUCache, ResponseCache
+
+
+def test_listing_served_from_cache_until_apartment_changes(client, make_apartment):
+    apartment = make_apartment(is_verified=True)
+
+    first = client.get('/api/v1/apartments/verified')
+    assert first.headers['X-Cache'] == 'MISS'
+    second = client.get('/api/v1/apartments/verified')
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.get_json() == first.get_json()
+
+    apartment.title = 'شقة مجددة'
+    db.session.commit()
+
+    third = client.get('/api/v1/apartments/verified')
+    assert third.headers['X-Cache'] == 'MISS'
+    assert third.get_json()[0]['title'] == 'شقة مجددة'
+
+
+def test_cache_key_ignores_param_order_and_empty_values(client, make_apartment):
+    make_apartment(is_verified=True)
+
+    assert client.get('/api/v1/apartments/filter?rooms=2&min_price=100').headers['X-Cache'] == 'MISS'
+    response = client.get('/api/v1/apartments/filter?min_price=100&max_price=&rooms=2')
+    assert response.headers['X-Cache'] == 'HIT'
+
+
+def test_review_invalidates_only_that_apartment_detail(client, make_apartment, owner, login):
+    first = make_apartment()
+    other = make_apartment(title='شقة أخرى')
+    client.get(f'/api/v1/apartments/{first.id}')
+    client.get(f'/api/v1/apartments/{other.id}')
+
+    login(owner)
+    client.post(f'/api/v1/apartments/{first.uuid}/reviews', json={'rating': 4})
+    client.delete_cookie('access_token_cookie')
+
+    assert client.get(f'/api/v1/apartments/{first.id}').headers['X-Cache'] == 'MISS'
+    assert client.get(f'/api/v1/apartments/{other.id}').headers['X-Cache'] == 'HIT'
+
+
+def test_lru_evicts_oldest_and_expires_entries(monkeypatch):
+    cache = LRUCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+
+    now = [1000.0]
+    monkeypatch.setattr('app.utils.cache.time.monotonic', lambda: now[0])
+    cache.set('d', 4, ttl=5)
+    now[0] += 6
+    assert cache.get('d') is None
+
+
+def test_shared_backend_propagates_invalidation_between_workers():
+    shared = LocalSharedCache()
+    worker_a = ResponseCache(LRUCache(), shared=shared)
+    worker_b = ResponseCache(LRUCache(), shared=shared)
+
+    worker_a.set(['apartments'], '/x', {'body': b'1'})
+    assert worker_b.get(['apartments'], '/x') == {'body': b'1'}
+
+    worker_b.invalidate('apartments')
+    assert worker_a.get(['apartments'], '/x') is None
+    assert worker_a.stats()['hits'] == 0
+
+
+def test_evicted_generation_does_not_revive_old_entries():
+    shared = LocalSharedCache()
+    cache = ResponseCache(LRUCache(), shared=shared)
+    cache.set(['apartments'], '/x', {'body': b'old'})
+    cache.invalidate('apartments')
+    cache.set(['apartments'], '/x', {'body': b'new'})
+
+    shared.delete('gen:apartments')  # مثل eviction في Redis
+    cache.local.clear()
+    assert cache.get(['apartments'], '/x') is None
+
+
+def test_signup_keeps_cache_and_owner_rename_drops_own_pages(client, make_apartment, owner):
+    from app.models.user import User
+
+    mine = make_apartment()
+    other_owner = User(full_name='Other', email='other@example.com', role='owner')
+    other_owner.set_password('StrongPass1!')
+    db.session.add(other_owner)
+    db.session.commit()
+    theirs = make_apartment(owner_id=other_owner.id)
+    for url in ('/api/v1/apartments/', f'/api/v1/apartments/{mine.id}', f'/api/v1/apartments/{theirs.id}'):
+        client.get(url)
+
+    newcomer = User(full_name='New', email='new@example.com', role='student')
+    newcomer.set_password('StrongPass1!')
+    db.session.add(newcomer)
+    db.session.commit()
+    assert client.get('/api/v1/apartments/').headers['X-Cache'] == 'HIT'
+
+    owner.full_name = 'Owner Renamed'
+    db.session.commit()
+    assert client.get(f'/api/v1/apartments/{mine.id}').headers['X-Cache'] == 'MISS'
+    assert client.get(f'/api/v1/apartments/{theirs.id}').headers['X-Cache'] == 'HIT'
+    assert client.get('/api/v1/apartments/').headers['X-Cache'] == 'MISS'
@@ -0,0 +1,57 @@
+import gzip
+
+from app.utils import compression
+
+
+def _seed(make_apartment, count=10):
+    for i in range(count):
+        make_apartment(title=f'شقة رقم {i}', description='وصف طويل للشقة ' * 20)
+
+
+def test_large_listing_is_gzipped_when_accepted(client, make_apartment):
+    _seed(make_apartment)
+
+    plain = client.get('/api/v1/apartments/')
+    assert 'Content-Encoding' not in plain.headers
+
+    response = client.get('/api/v1/apartments/', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data) == plain.data
+    assert len(response.data) < len(plain.data)
+    assert response.headers['ETag'].endswith('-gzip"')
+
+
+def test_small_responses_are_not_compressed(client):
+    response = client.get('/api/v1/neighborhoods/', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_cache_hit_reuses_compressed_body(client, make_apartment, monkeypatch):
+    _seed(make_apartment)
+    calls = []
+    original = compression.compress_bytes
+    monkeypatch.setattr(
+        'app.utils.cache.compress_bytes',
+        lambda data, encoding: calls.append(encoding) or original(data, encoding),
+    )
+
+    headers = {'Accept-Encoding': 'gzip'}
+    first = client.get('/api/v1/apartments/verified', headers=headers)
+    second = client.get('/api/v1/apartments/verified', headers=headers)
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.data == first.data
+    assert calls == ['gzip']
+
+    not_modified = client.get(
+        '/api/v1/apartments/verified',
+        headers={**headers, 'If-None-Match': first.headers['ETag']},
+    )
+    assert not_modified.status_code == 304
+
+
+def test_streamed_bodies_compress_incrementally(app):
+    chunks = [b'{"id": %d}\n' % i for i in range(1000)]
+    with app.test_request_context():
+        compressed = b''.join(compression.compress_stream(iter(chunks), 'gzip'))
+    assert gzip.decompress(compressed) == b''.join(chunks)
@@ -0,0 +1,81 @@
+from sqlalchemy import event
+
+from app import db
+from app.models.image import Image
+
+
+def test_detail_returns_304_for_matching_etag(client, make_apartment):
+    apartment = make_apartment()
+    url = f'/api/v1/apartments/{apartment.id}'
+
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first.headers['ETag']
+    assert first.headers['Last-Modified']
+
+    again = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.data == b''
+
+
+def test_version_bumps_on_update_image_and_review(client, make_apartment, owner, login):
+    apartment = make_apartment()
+    url = f'/api/v1/apartments/{apartment.id}'
+    etags = [client.get(url).headers['ETag']]
+
+    apartment.price = 1800
+    db.session.commit()
+    etags.append(client.get(url).headers['ETag'])
+
+    db.session.add(Image(url='a.jpg', apartment_id=apartment.id))
+    db.session.commit()
+    etags.append(client.get(url).headers['ETag'])
+
+    login(owner)
+    client.post(f'/api/v1/apartments/{apartment.uuid}/reviews', json={'rating': 5})
+    etags.append(client.get(url).headers['ETag'])
+
+    assert len(set(etags)) == 4
+    db.session.refresh(apartment)
+    assert apartment.version == 4
+
+
+def test_list_etag_changes_when_apartment_added(client, make_apartment):
+    make_apartment(is_verified=True)
+    etag = client.get('/api/v1/apartments/verified').headers['ETag']
+    assert client.get(
+        '/api/v1/apartments/verified', headers={'If-None-Match': etag}
+    ).status_code == 304
+
+    make_apartment(is_verified=True, title='شقة جديدة')
+    response = client.get('/api/v1/apartments/verified', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert len(response.get_json()) == 2
+
+
+def test_cached_listing_state_skips_the_aggregate_query(client, make_apartment):
+    make_apartment(is_verified=True)
+    etag = client.get('/api/v1/apartments/verified').headers['ETag']
+
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.get('/api/v1/apartments/verified', headers={'If-None-Match': etag})
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    assert response.status_code == 304
+    assert statements == []
+
+
+def test_neighborhood_rename_changes_apartment_etag(client, make_apartment, neighborhood):
+    apartment = make_apartment()
+    url = f'/api/v1/apartments/{apartment.id}'
+    etag = client.get(url).headers['ETag']
+
+    neighborhood.name = 'الحي الجديد'
+    db.session.commit()
+
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['neighborhood'] == 'الحي الجديد'
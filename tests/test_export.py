@@ -0,0 +1,35 @@
+import csv
+import io
+import json
+
+
+def test_ndjson_export_streams_every_row_in_batches(app, client, make_apartment, admin_headers):
+    app.config['EXPORT_BATCH_SIZE'] = 2
+    for i in range(5):
+        make_apartment(title=f'شقة {i}')
+
+    response = client.get('/api/v1/admin/apartments?stream=ndjson&fields=id,title', headers=admin_headers)
+    assert response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    # صفحات keyset: الأحدث أولاً بدون تكرار أو نقص عند حدود الصفحات
+    assert [row['title'] for row in rows] == [f'شقة {i}' for i in reversed(range(5))]
+
+
+def test_json_and_csv_exports(client, owner, make_apartment, admin_headers):
+    make_apartment(has_wifi=True, has_ac=True)
+
+    users = client.get('/api/v1/admin/users?stream=json', headers=admin_headers)
+    assert [u['email'] for u in json.loads(users.get_data(as_text=True))] == ['owner@example.com']
+
+    export = client.get(
+        '/api/v1/admin/apartments?stream=csv&fields=title,features', headers=admin_headers
+    )
+    assert 'attachment' in export.headers['Content-Disposition']
+    rows = list(csv.DictReader(io.StringIO(export.get_data(as_text=True))))
+    assert rows == [{'title': 'شقة للطلاب', 'features': 'واي فاي|تكييف'}]
+
+
+def test_unknown_stream_format_is_rejected(client, admin_headers):
+    response = client.get('/api/v1/admin/reviews?stream=xml', headers=admin_headers)
+    assert response.status_code == 400
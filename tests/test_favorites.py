@@ -0,0 +1,48 @@
+from sqlalchemy import event
+
+from app import db
+
+
+def test_listing_flags_viewer_favorites_and_follows_add_remove(client, make_apartment, owner, login):
+    saved = make_apartment(title='محفوظة')
+    make_apartment(title='أخرى')
+    login(owner)
+
+    assert client.post('/api/v1/favorites/add', json={'apartment_id': saved.uuid}).status_code == 201
+    response = client.get('/api/v1/apartments/')
+    assert response.headers['X-Cache'] == 'BYPASS'
+    flags = {item['id']: item['isFavorite'] for item in response.get_json()}
+    assert flags == {saved.id: True, saved.id + 1: False}
+
+    etag = response.headers['ETag']
+    assert client.get('/api/v1/apartments/', headers={'If-None-Match': etag}).status_code == 304
+
+    client.delete(f'/api/v1/favorites/remove/{saved.uuid}')
+    response = client.get('/api/v1/apartments/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert not any(item['isFavorite'] for item in response.get_json())
+
+
+def test_favorites_are_loaded_for_the_page_only(client, make_apartment, owner, login):
+    apartments = [make_apartment(title=f'شقة {i}') for i in range(3)]
+    login(owner)
+    client.post('/api/v1/favorites/add', json={'apartment_id': apartments[0].uuid})
+
+    statements = []
+    record = lambda conn, cursor, statement, params, *args: statements.append((statement, params))
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        items = client.get('/api/v1/apartments/?paginate=cursor&limit=2').get_json()['items']
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    lookups = [params for statement, params in statements if 'favorite.apartment_id IN' in statement]
+    assert len(lookups) == 1
+    assert set(lookups[0]) == {owner.id, *(item['id'] for item in items)}
+
+
+def test_anonymous_listing_still_cached(client, make_apartment):
+    make_apartment()
+    client.get('/api/v1/apartments/')
+    assert client.get('/api/v1/apartments/').headers['X-Cache'] == 'HIT'
+    assert all(not item['isFavorite'] for item in client.get('/api/v1/apartments/').get_json())
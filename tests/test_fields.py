@@ -0,0 +1,35 @@
+from app.models.apartment import Apartment
+from app.schemas.apartment_list import project_listing
+
+
+def test_list_fields_shrink_response_and_query(client, make_apartment):
+    make_apartment()
+
+    response = client.get('/api/v1/apartments/?fields=title,price,main_image')
+    assert response.status_code == 200
+    assert set(response.get_json()[0]) == {'title', 'price', 'main_image'}
+
+    sql = str(project_listing(Apartment.query, frozenset({'title', 'price'})))
+    assert 'JOIN' not in sql
+    assert 'image' not in sql
+
+
+def test_unknown_field_is_rejected(client):
+    response = client.get('/api/v1/apartments/verified?fields=title,password_hash')
+    assert response.status_code == 400
+    assert 'password_hash' in response.get_json()['error']
+
+
+def test_detail_and_review_fields(client, make_apartment, owner, login):
+    apartment = make_apartment()
+    login(owner)
+    client.post(f'/api/v1/apartments/{apartment.uuid}/reviews', json={'rating': 4, 'comment': 'ممتازة'})
+
+    detail = client.get(f'/api/v1/apartments/{apartment.id}?fields=id,ownerName').get_json()
+    assert detail == {'id': apartment.id, 'ownerName': 'Owner'}
+
+    reviews = client.get(f'/api/v1/reviews/apartment/{apartment.id}?fields=rating').get_json()
+    assert reviews == [{'rating': 4}]
+
+    profile = client.get('/api/v1/auth/profile?fields=full_name,reviews_count').get_json()
+    assert profile == {'full_name': 'Owner', 'reviews_count': 1}
@@ -0,0 +1,45 @@
+from app.utils.geo import cover_bbox, encode_geohash, haversine_km
+
+# جامعة أسيوط تقريباً
+CENTER = (27.1870, 31.1670)
+
+
+def test_encode_geohash_known_value():
+    assert encode_geohash(57.64911, 10.40744, 11) == 'u4pruydqqvj'
+
+
+def test_cover_bbox_contains_every_point_in_box():
+    south, west, north, east = 27.10, 31.10, 27.30, 31.25
+    cells = cover_bbox(south, west, north, east, max_cells=16)
+    assert len(cells) <= 16
+    for i in range(11):
+        for j in range(11):
+            lat = south + (north - south) * i / 10
+            lng = west + (east - west) * j / 10
+            assert any(encode_geohash(lat, lng).startswith(cell) for cell in cells)
+
+
+def test_nearby_sorted_by_distance_and_paged(client, make_apartment):
+    far = make_apartment(title='far', latitude=CENTER[0] + 0.03, longitude=CENTER[1])
+    make_apartment(title='near', latitude=CENTER[0] + 0.001, longitude=CENTER[1])
+    make_apartment(title='mid', latitude=CENTER[0], longitude=CENTER[1] + 0.01)
+    make_apartment(title='out', latitude=CENTER[0] + 0.5, longitude=CENTER[1])
+    make_apartment(title='no coordinates')
+
+    url = f'/api/v1/apartments/nearby?lat={CENTER[0]}&lng={CENTER[1]}&radius_km=5&limit=2'
+    first = client.get(url).get_json()
+    assert [item['title'] for item in first['items']] == ['near', 'mid']
+    assert first['items'][0]['distanceKm'] < first['items'][1]['distanceKm']
+
+    second = client.get(url + f"&cursor={first['next_cursor']}").get_json()
+    assert [item['title'] for item in second['items']] == ['far']
+    assert second['next_cursor'] is None
+    assert abs(second['items'][0]['distanceKm'] - haversine_km(*CENTER, far.latitude, far.longitude)) < 1e-3
+
+
+def test_in_bounds_filters_by_box(client, make_apartment):
+    make_apartment(title='inside', latitude=27.18, longitude=31.16)
+    make_apartment(title='outside', latitude=27.40, longitude=31.16)
+    response = client.get('/api/v1/apartments/in-bounds?bbox=31.1,27.1,31.2,27.2')
+    assert [item['title'] for item in response.get_json()] == ['inside']
+    assert client.get('/api/v1/apartments/in-bounds?bbox=1,2,3').status_code == 400
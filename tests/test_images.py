@@ -0,0 +1,252 @@
+import io
+import os
+
+import pytest
+from click.testing import CliRunner
+from PIL import Image as PILImage
+
+from app import db
+from app.commands import images_cli
+from app.models.apartment import Apartment
+from app.models.image import Image
+from app.models.image_blob import ImageBlob
+from app.utils.storage import LocalStorage
+
+
+@pytest.fixture
+def storage(app, tmp_path):
+    app.config['IMAGE_PIPELINE_MODE'] = 'sync'
+    app.config['IMAGE_SPOOL_FOLDER'] = str(tmp_path / 'spool')
+    app.config['IMAGE_RETRY_BACKOFF'] = 0
+    backend = LocalStorage(str(tmp_path / 'store'), '/uploads')
+    app.extensions['image_storage'] = backend
+    return backend
+
+
+def photo(size=(800, 600), color=(200, 30, 30), orientation=None):
+    """JPEG bytes with EXIF (camera model, optional orientation)."""
+    exif = PILImage.Exif()
+    exif[0x0110] = 'Phone 12'
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    PILImage.new('RGB', size, color).save(buffer, 'JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+def stored(storage, url):
+    return storage.path_for(storage.key_for(url))
+
+
+def stored_files(storage):
+    return {
+        os.path.join(folder, name)
+        for folder, _, names in os.walk(storage.root)
+        for name in names
+    }
+
+
+def create(client, neighborhood, *names):
+    return client.post(
+        '/api/v1/apartments/create',
+        data={
+            'title': 'شقة', 'address': 'شارع', 'price': '1000',
+            'neighborhood_id': str(neighborhood.id), 'residence_type': 'غرفة',
+            'images': [(io.BytesIO(photo()), name) for name in names],
+        },
+        content_type='multipart/form-data',
+    )
+
+
+def test_create_apartment_spools_images_and_uploads_after_commit(client, owner, neighborhood, login, storage):
+    login(owner)
+    response = create(client, neighborhood, 'a.jpg', 'b.png')
+
+    assert response.status_code == 201
+    assert response.get_json()['images_pending'] == 2
+    images = Image.query.order_by(Image.id).all()
+    assert [image.status for image in images] == ['ready', 'ready']
+    assert all(image.spool_path is None and image.attempts == 1 for image in images)
+    assert images[1].url.startswith('/uploads/blobs/') and images[1].url.endswith('.jpg')
+    assert os.path.exists(stored(storage, images[0].url))
+
+    apartment_id = response.get_json()['apartment_id']
+    detail = client.get(f'/api/v1/apartments/{apartment_id}').get_json()
+    assert detail['main_image'] == images[0].url
+
+
+def test_failed_uploads_stay_hidden_and_can_be_retried(app, client, owner, neighborhood, login, storage, monkeypatch):
+    app.config['IMAGE_UPLOAD_RETRIES'] = 1
+    calls = []
+
+    def broken(source, key):
+        calls.append(key)
+        raise OSError('storage down')
+
+    monkeypatch.setattr(storage, 'save', broken)
+    login(owner)
+    apartment_id = create(client, neighborhood, 'a.jpg').get_json()['apartment_id']
+
+    image = Image.query.one()
+    assert len(calls) == 2
+    assert (image.status, image.attempts, image.last_error) == ('failed', 2, 'storage down')
+    assert image.url is None and image.spool_path
+    client.delete_cookie('access_token_cookie')
+    assert client.get(f'/api/v1/apartments/{apartment_id}').get_json()['main_image'] is None
+
+    monkeypatch.undo()
+    result = CliRunner().invoke(images_cli, ['process', '--retry-failed'], obj=app.cli)
+    assert 'Processed 1 image(s).' in result.output
+
+    db.session.expire_all()
+    image = db.session.get(Image, image.id)
+    assert image.status == 'ready' and image.spool_path is None
+    assert db.session.get(Apartment, apartment_id).to_dict()['main_image'] == image.url
+
+
+def upload_images(client, apartment_id, *files):
+    return client.post(
+        f'/api/v1/images/upload-image/{apartment_id}',
+        data={'images': [(io.BytesIO(body), name) for name, body in files]},
+        content_type='multipart/form-data',
+    )
+
+
+def test_parallel_upload_reports_each_file(app, client, owner, login, make_apartment, storage, monkeypatch):
+    apartment = make_apartment()
+    version = apartment.version
+    save = storage.save
+
+    def flaky(source, key):
+        # الصورة b وحدها عرضها 100
+        if PILImage.open(source).width == 100:
+            raise OSError('timeout')
+        source.seek(0)
+        return save(source, key)
+
+    monkeypatch.setattr(storage, 'save', flaky)
+    login(owner)
+    response = upload_images(
+        client, apartment.id,
+        ('a.jpg', photo()), ('b.jpg', photo((100, 80))), ('c.txt', b'x'),
+        ('d.png', b'not an image'), ('e.jpg', photo()),
+    )
+    body = response.get_json()
+
+    assert response.status_code == 207
+    assert [result['status'] for result in body['results']] == [
+        'uploaded', 'failed', 'rejected', 'rejected', 'uploaded',
+    ]
+    assert body['results'][1]['error'] == 'timeout'
+    assert [image.url for image in Image.query.order_by(Image.id)] == body['image_urls']
+    db.session.expire_all()
+    assert db.session.get(Apartment, apartment.id).version == version + 1
+
+    listed = client.get(f'/api/v1/images/apartment/{apartment.id}/images').get_json()
+    assert listed['images'] == body['image_urls']
+
+
+def test_upload_removes_stored_files_when_the_insert_fails(app, client, owner, login, make_apartment, storage, monkeypatch):
+    apartment = make_apartment()
+    deleted = []
+
+    def broken_commit():
+        raise RuntimeError('db down')
+
+    monkeypatch.setattr(storage, 'delete', deleted.append)
+    monkeypatch.setattr(db.session, 'commit', broken_commit)
+    login(owner)
+
+    response = upload_images(
+        client, apartment.id, ('a.jpg', photo()), ('b.jpg', photo(color=(0, 90, 0)))
+    )
+
+    assert response.status_code == 500
+    files = {stored(storage, url) for url in deleted}
+    assert len(files) == len(stored_files(storage)) == 14  # الأصل + 3 مقاسات × صيغتين لكل صورة
+    assert files == stored_files(storage)
+    monkeypatch.undo()
+    assert Image.query.count() == 0
+
+
+def test_processing_strips_exif_and_builds_variants(client, owner, login, make_apartment, storage):
+    apartment = make_apartment(is_verified=True)
+    login(owner)
+    # orientation 6: الصورة مخزنة بالعرض وتُعرض بالطول
+    response = upload_images(
+        client, apartment.id, ('tall.jpg', photo((1600, 1200), color=(20, 120, 200), orientation=6))
+    )
+    assert response.status_code == 201
+
+    image = Image.query.one()
+    assert (image.width, image.height) == (1200, 1600)
+    red, green, blue = bytes.fromhex(image.color[1:])
+    assert abs(red - 20) + abs(green - 120) + abs(blue - 200) < 8
+    assert len(image.blurhash) == 28
+    assert sorted(image.variants) == ['jpeg', 'webp']
+    assert sorted(image.variants['webp'], key=int) == ['320', '640', '1200']
+
+    with PILImage.open(stored(storage, image.url)) as original:
+        assert original.size == (1200, 1600) and not original.getexif()
+    with PILImage.open(stored(storage, image.variants['webp']['320'])) as small:
+        assert small.format == 'WEBP' and small.size == (320, 427)
+
+    srcset = image.to_dict()['srcset']
+    assert srcset['jpeg'].split(', ')[0] == f"{image.variants['jpeg']['320']} 320w"
+    assert srcset['webp'].endswith(' 1200w')
+
+    card = client.get('/api/v1/apartments/filter').get_json()[0]
+    assert card['main_image'] == image.url
+    assert card['main_image_set'] == Image.responsive_dict(image)
+    detail = client.get(f'/api/v1/apartments/{apartment.id}').get_json()
+    assert detail['main_image_set'] == card['main_image_set']
+
+
+def test_same_photo_is_stored_once_and_freed_with_its_last_image(app, client, owner, login, make_apartment, storage, monkeypatch):
+    first, second = make_apartment(), make_apartment()
+    login(owner)
+    assert upload_images(client, first.id, ('a.jpg', photo())).status_code == 201
+    files = stored_files(storage)
+    assert len(files) == 7
+
+    saves = []
+    monkeypatch.setattr(storage, 'save', lambda source, key: saves.append(key))
+    response = upload_images(client, second.id, ('copy.jpg', photo()), ('again.jpg', photo()))
+    assert response.status_code == 201
+    assert [result['deduplicated'] for result in response.get_json()['results']] == [True, True]
+    assert saves == [] and stored_files(storage) == files
+
+    blob = ImageBlob.query.one()
+    assert blob.ref_count == 3
+    assert {image.blob_id for image in Image.query} == {blob.id}
+    assert {image.url for image in Image.query} == {blob.url}
+
+    for image in Image.query.filter_by(apartment_id=second.id):
+        db.session.delete(image)
+    db.session.commit()
+    db.session.refresh(blob)
+    assert blob.ref_count == 1 and stored_files(storage) == files
+
+    db.session.delete(Image.query.one())
+    db.session.commit()
+    assert ImageBlob.query.count() == 0
+    assert stored_files(storage) == set()
+
+
+def test_phash_dedupe_and_gc(app, client, owner, login, make_apartment, storage):
+    app.config['IMAGE_PHASH_DEDUPE'] = True
+    apartment = make_apartment()
+    login(owner)
+    upload_images(client, apartment.id, ('a.jpg', photo()))
+    # نفس الصورة بمقاس آخر: ملفاتها الجديدة تُمسح ويُستخدم الـ blob الموجود
+    response = upload_images(client, apartment.id, ('small.jpg', photo((400, 300))))
+    assert response.get_json()['results'][0]['deduplicated'] is True
+    assert ImageBlob.query.one().ref_count == 2
+    assert len(stored_files(storage)) == 7
+
+    # حذف بدون ORM events: gc يعيد العد ويمسح الـ blob وملفاته
+    Image.query.delete()
+    db.session.commit()
+    result = CliRunner().invoke(images_cli, ['gc'], obj=app.cli)
+    assert 'Deleted 1 unused image blob(s).' in result.output
+    assert ImageBlob.query.count() == 0 and stored_files(storage) == set()
@@ -0,0 +1,139 @@
+import io
+import json
+
+from app.models.apartment import Apartment
+from app.models.image import Image
+
+CSV_HEADER = 'title,address,price,bedrooms,residenceType,neighborhood,features,images,latitude,longitude\n'
+
+
+def upload(client, path, body, filename='apartments.csv', **kwargs):
+    return client.post(
+        path,
+        data={'file': (io.BytesIO(body.encode()), filename)},
+        content_type='multipart/form-data',
+        **kwargs,
+    )
+
+
+def test_owner_csv_import_inserts_in_batches_and_reports_bad_rows(app, client, owner, neighborhood, login):
+    app.config['IMPORT_BATCH_SIZE'] = 2
+    login(owner)
+    rows = [
+        'شقة 1,شارع 1,1000,2,شقة كاملة,الحى الاول,واي فاي|تكييف,http://img.example.com/1.jpg|http://img.example.com/2.jpg,30.05,31.23',
+        'شقة 2,شارع 2,900,1,غرفة,الحي الأول,,,,',
+        'شقة 3,شارع 3,abc,1,غرفة,الحي الأول,,,,',
+        'شقة 4,شارع 4,800,1,غرفة,حي غير موجود,,,,',
+        'شقة 5,شارع 5,700,1,غرفة,الحي الأول,مسبح,,,',
+        'شقة 6,شارع 6,600,3,غرفة,الحي الأول,,,,',
+    ]
+    response = upload(client, '/api/v1/apartments/import', CSV_HEADER + '\n'.join(rows))
+    summary = response.get_json()
+
+    assert response.status_code == 201
+    assert (summary['received'], summary['imported'], summary['failed']) == (6, 3, 3)
+    assert [error['line'] for error in summary['errors']] == [4, 5, 6]
+    assert 'price' in summary['errors'][0]['errors']
+    assert 'neighborhood' in summary['errors'][1]['errors']
+
+    first = Apartment.query.filter_by(title='شقة 1').one()
+    assert first.owner_id == owner.id and first.is_verified is False
+    assert first.features_mask == 0b11 and first.has_wifi and first.has_ac
+    assert first.geohash and first.version == 1 and len(first.uuid) == 36
+    assert [image.url for image in first.images] == ['http://img.example.com/1.jpg', 'http://img.example.com/2.jpg']
+
+    # الفهرس والكاش
+    assert client.get('/api/v1/apartments/search?query=شقة').get_json()
+    assert len(client.get('/api/v1/apartments/').get_json()) == 3
+
+
+def test_admin_jsonl_import_with_owner_per_row_and_dry_run(client, owner, neighborhood, admin_headers):
+    lines = [
+        {'title': 'أ', 'address': 'ش', 'price': 1, 'bedrooms': 1, 'residenceType': 'غرفة',
+         'neighborhood_id': neighborhood.id, 'owner_id': owner.id},
+        {'title': 'ب', 'address': 'ش', 'price': 1, 'bedrooms': 1, 'residenceType': 'غرفة',
+         'neighborhood_id': neighborhood.id, 'owner_id': 999},
+        'not json',
+    ]
+    body = '\n'.join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+
+    dry = client.post('/api/v1/admin/apartments/import?dry_run=true&format=jsonl',
+                      data=body, headers=admin_headers)
+    assert dry.status_code == 200
+    assert (dry.get_json()['imported'], dry.get_json()['failed']) == (1, 2)
+    assert Apartment.query.count() == 0
+
+    response = client.post('/api/v1/admin/apartments/import?verified=true',
+                           data=body, headers=admin_headers, content_type='application/x-ndjson')
+    assert response.status_code == 201
+    assert Apartment.query.one().is_verified is True
+    assert Image.query.count() == 0
+
+
+def test_import_rejects_unknown_format(client, owner, login):
+    login(owner)
+    response = upload(client, '/api/v1/apartments/import', 'x', filename='apartments.xlsx')
+    assert response.status_code == 400
+
+
+def test_owner_import_ignores_row_owner_and_needs_an_existing_user(client, owner, neighborhood, login):
+    from app import db
+    from app.models.user import User
+
+    other, ghost = (User(full_name=name, email=f'{name}@example.com', role='owner') for name in ('other', 'ghost'))
+    for user in (other, ghost):
+        user.set_password('StrongPass1!')
+        db.session.add(user)
+    db.session.commit()
+    row = json.dumps({'title': 'أ', 'address': 'ش', 'price': 1, 'bedrooms': 1, 'residenceType': 'غرفة',
+                      'neighborhood_id': neighborhood.id, 'owner_id': owner.id})
+
+    login(other)
+    assert upload(client, '/api/v1/apartments/import', row, filename='a.jsonl').status_code == 201
+    assert Apartment.query.one().owner_id == other.id
+
+    # توكن صالح لمستخدم محذوف
+    login(ghost)
+    db.session.delete(ghost)
+    db.session.commit()
+    response = upload(client, '/api/v1/apartments/import', row, filename='a.jsonl')
+    assert response.status_code == 404
+    assert Apartment.query.filter_by(owner_id=owner.id).count() == 0
+
+
+def test_rehost_fetches_only_public_http_urls(app, client, owner, neighborhood, login):
+    app.config.update(IMPORT_REHOST_IMAGES=True, IMAGE_PIPELINE_MODE='sync', IMAGE_RETRY_BACKOFF=0)
+    login(owner)
+    row = 'شقة,شارع,1000,2,غرفة,الحي الأول,,http://127.0.0.1/a.jpg|http://169.254.169.254/x,,'
+    response = upload(client, '/api/v1/apartments/import', CSV_HEADER + row)
+
+    assert response.get_json()['images_pending'] == 2
+    images = Image.query.all()
+    assert [image.status for image in images] == [Image.FAILED] * 2
+    assert all(image.attempts == 1 and image.last_error for image in images)
+
+
+def test_import_rejects_file_paths_and_delete_stays_in_upload_folder(app, client, owner, neighborhood, login, tmp_path):
+    from app import db
+
+    victim = tmp_path / 'victim'
+    victim.write_text('x')
+    login(owner)
+    rows = [f'شقة {n},شارع,1000,2,غرفة,الحي الأول,,{path},,' for n, path in
+            enumerate((str(victim), '../victim', 'file:///etc/hosts'))]
+    summary = upload(client, '/api/v1/apartments/import', CSV_HEADER + '\n'.join(rows)).get_json()
+    assert (summary['imported'], summary['failed']) == (0, 3)
+    assert all('images' in error['errors'] for error in summary['errors'])
+
+    # صفوف قديمة من قبل التحقق: الحذف لا يخرج من UPLOAD_FOLDER
+    app.config['UPLOAD_FOLDER'] = str(tmp_path / 'uploads')
+    (tmp_path / 'uploads').mkdir()
+    upload(client, '/api/v1/apartments/import', CSV_HEADER + 'شقة,شارع,1000,2,غرفة,الحي الأول,,,,')
+    apartment = Apartment.query.one()
+    db.session.add_all([Image(url=str(victim), apartment_id=apartment.id),
+                        Image(url='../victim', apartment_id=apartment.id)])
+    db.session.commit()
+    response = client.delete(f'/api/v1/apartments/{apartment.uuid}/delete')
+    assert response.status_code == 200
+    assert victim.exists()
+    assert Image.query.count() == 0
@@ -0,0 +1,68 @@
+import pytest
+
+from app.utils.search import normalize_arabic, tokenize
+
+
+def test_normalize_arabic_folds_spelling_variants():
+    assert normalize_arabic('أَحْمَد') == normalize_arabic('احمد')
+    assert normalize_arabic('إسكندرية') == 'اسكندريه'
+    assert normalize_arabic('مستشفى') == 'مستشفي'
+    assert normalize_arabic('شـــقة') == 'شقه'
+    assert tokenize('شقة ٣ غرف, WiFi') == ['شقه', '3', 'غرف', 'wifi']
+
+
+@pytest.mark.parametrize('backend', ['fts5', 'memory'])
+def test_search_ranks_and_tracks_writes(client, app, make_apartment, backend):
+    from app import db
+    from app.utils.search import BACKENDS
+
+    app.extensions['search'] = BACKENDS[backend]()
+    in_title = make_apartment(title='غرفة قريبة من الكلية', is_verified=False)
+    in_description = make_apartment(title='غرفه قريبه', description='بجوار الكلية', is_verified=False)
+    boosted = make_apartment(title='غرفة قريبة', is_verified=True, rating_avg=5.0)
+    make_apartment(title='استوديو', address='المنطقة الصناعية')
+
+    data = client.get('/api/v1/apartments/search?query=الكليه').get_json()
+    assert [item['id'] for item in data] == [in_title.id, in_description.id]
+
+    data = client.get('/api/v1/apartments/search?query=غرفة قريبه').get_json()
+    assert [item['id'] for item in data][0] == boosted.id
+    assert len(data) == 3
+
+    boosted.title = 'شقة'
+    db.session.commit()
+    data = client.get('/api/v1/apartments/search?query=غرفة').get_json()
+    assert boosted.id not in [item['id'] for item in data]
+
+    db.session.delete(in_title)
+    db.session.commit()
+    data = client.get('/api/v1/apartments/search?query=الكلية').get_json()
+    assert [item['id'] for item in data] == [in_description.id]
+
+
+def test_search_cursor_pages(client, make_apartment):
+    for i in range(5):
+        make_apartment(title=f'شقة رقم {i}')
+
+    first = client.get('/api/v1/apartments/search?query=شقه&paginate=cursor&limit=3').get_json()
+    second = client.get(
+        f"/api/v1/apartments/search?query=شقه&cursor={first['next_cursor']}&limit=3"
+    ).get_json()
+    ids = [item['id'] for item in first['items'] + second['items']]
+    assert len(ids) == 5 and len(set(ids)) == 5
+    assert second['next_cursor'] is None
+
+
+@pytest.mark.parametrize('backend', ['fts5', 'memory'])
+def test_neighborhood_rename_reindexes_its_apartments(client, app, make_apartment, neighborhood, backend):
+    from app import db
+    from app.utils.search import BACKENDS
+
+    app.extensions['search'] = BACKENDS[backend]()
+    apartment = make_apartment()
+    neighborhood.name = 'الزمالك'
+    db.session.commit()
+
+    data = client.get('/api/v1/apartments/search?query=الزمالك').get_json()
+    assert [item['id'] for item in data] == [apartment.id]
+    assert client.get('/api/v1/apartments/search?query=الأول').get_json() == []
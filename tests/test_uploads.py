@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+
+@pytest.fixture
+def uploads(app, tmp_path):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    os.makedirs(tmp_path / 'apartments' / '1')
+    (tmp_path / 'apartments' / '1' / '0123456789abcdef0123456789abcdef_320.webp').write_bytes(b'0123456789')
+    (tmp_path / 'legacy-photo.jpg').write_bytes(b'legacy')
+    return tmp_path
+
+
+HASHED = '/uploads/apartments/1/0123456789abcdef0123456789abcdef_320.webp'
+
+
+def test_hashed_uploads_are_immutable_with_etag_and_ranges(client, uploads):
+    response = client.get(HASHED)
+    assert response.status_code == 200 and response.data == b'0123456789'
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert response.headers['ETag'] == '"0123456789abcdef0123456789abcdef_320.webp"'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+
+    assert client.get(HASHED, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+    partial = client.get(HASHED, headers={'Range': 'bytes=2-5'})
+    assert partial.status_code == 206
+    assert partial.data == b'2345'
+    assert partial.headers['Content-Range'] == 'bytes 2-5/10'
+
+    legacy = client.get('/uploads/legacy-photo.jpg')
+    assert legacy.headers['Cache-Control'] == 'public, max-age=3600'
+    assert client.get('/uploads/legacy-photo.jpg', headers={'If-None-Match': legacy.headers['ETag']}).status_code == 304
+
+    assert client.get('/uploads/../config.py').status_code == 404
+    assert client.get('/uploads/missing.jpg').status_code == 404
+
+
+def test_proxy_modes_hand_the_bytes_to_the_web_server(app, client, uploads):
+    app.config['UPLOADS_SENDFILE'] = 'x-accel'
+    response = client.get(HASHED)
+    assert response.status_code == 200 and response.data == b''
+    assert response.headers['X-Accel-Redirect'] == (
+        '/protected-uploads/apartments/1/0123456789abcdef0123456789abcdef_320.webp'
+    )
+    assert response.mimetype == 'image/webp'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert client.get(HASHED, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+    app.config['UPLOADS_SENDFILE'] = 'x-sendfile'
+    response = client.get('/uploads/legacy-photo.jpg')
+    assert response.headers['X-Sendfile'] == str(uploads / 'legacy-photo.jpg')
+    assert response.data == b''
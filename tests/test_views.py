@@ -0,0 +1,281 @@
+import pytest
+
+from app import db
+from app.models.apartment_view import ApartmentView
+from app.utils.view_buffer import ViewBuffer
+
+
+@pytest.fixture
+def sync_views(app):
+    app.config['VIEW_BUFFER_MODE'] = 'sync'
+    app.extensions['view_buffer'] = ViewBuffer(app)
+    return app.extensions['view_buffer']
+
+
+@pytest.fixture
+def make_buffer(app):
+    buffers = []
+
+    def _make(**config):
+        # الـ flusher لا يستيقظ وحده أثناء الاختبار: الـ flush يدوي
+        app.config.update(
+            VIEW_BUFFER_MODE='thread', VIEW_FLUSH_INTERVAL_MS=600000, VIEW_FLUSH_BATCH=1000,
+            **config,
+        )
+        buffer = ViewBuffer(app)
+        buffers.append(buffer)
+        return buffer
+
+    yield _make
+    for buffer in buffers:
+        buffer.flush()
+        buffer.close()
+
+
+def track(client, apartment, ip='10.0.0.1'):
+    return client.post(f'/api/views/track/{apartment.uuid}', environ_base={'REMOTE_ADDR': ip})
+
+
+def test_track_view_dedupes_per_visitor_without_queries(app, client, owner, login, make_apartment, sync_views):
+    apartment, other = make_apartment(), make_apartment()
+    assert track(client, apartment).status_code == 201
+    # زائر آخر لنفس الشقة يُحسب، ونفس الزائر لشقة أخرى يُحسب
+    assert track(client, apartment, ip='10.0.0.2').status_code == 201
+    assert track(client, other).status_code == 201
+    assert client.post('/api/views/track/missing').status_code == 404
+
+    statements = []
+    db.event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    assert track(client, apartment).status_code == 200
+    assert statements == []
+
+    login(owner)
+    assert track(client, apartment).status_code == 201
+    assert track(client, apartment, ip='10.0.0.9').status_code == 200
+    views = ApartmentView.query.order_by(ApartmentView.id).all()
+    assert [(view.ip_address, view.user_id) for view in views] == [
+        ('10.0.0.1', None), ('10.0.0.2', None), ('10.0.0.1', None), ('10.0.0.1', owner.id),
+    ]
+    assert sync_views.stats()['flushed'] == 4
+
+
+def test_signed_in_user_view_counts_once_by_default(monkeypatch):
+    from app.utils.cache import LRUCache
+    from app.utils.view_dedupe import ViewDeduper
+
+    now = [1000.0]
+    monkeypatch.setattr('app.utils.cache.time.monotonic', lambda: now[0])
+    deduper = ViewDeduper(LRUCache())
+    assert deduper.first_view(1, user_id=7)
+    assert deduper.first_view(1, ip_address='1.1.1.1')
+    now[0] += 30 * 86400
+    assert not deduper.first_view(1, user_id=7)
+    assert deduper.first_view(1, ip_address='1.1.1.1')
+
+
+def test_shared_dedupe_backend_is_seen_by_every_worker(app):
+    from app.utils.cache import LocalSharedCache, LRUCache
+    from app.utils.view_dedupe import ViewDeduper
+
+    shared = LocalSharedCache()
+    workers = [ViewDeduper(LRUCache(), shared=shared, anonymous_ttl=60) for _ in range(2)]
+    assert workers[0].first_view(1, ip_address='10.0.0.1')
+    assert not workers[1].first_view(1, ip_address='10.0.0.1')
+    assert workers[1].first_view(1, user_id=7)
+    assert workers[0].stats()['first'] == 1 and workers[1].stats()['repeat'] == 1
+
+
+def test_buffered_views_are_written_in_one_batch(app, make_apartment, make_buffer):
+    apartment = make_apartment()
+    buffer = make_buffer(VIEW_BUFFER_MAX_EVENTS=3)
+    for ip in ('1.1.1.1', '2.2.2.2', '3.3.3.3'):
+        assert buffer.push(apartment.id, ip_address=ip)
+    assert not buffer.push(apartment.id, ip_address='4.4.4.4')  # الـ buffer ممتلئ
+    assert ApartmentView.query.count() == 0
+
+    statements = []
+    db.event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    assert buffer.flush() == 3
+    assert len([sql for sql in statements if sql.startswith('INSERT INTO apartment_views')]) == 1
+    assert {view.ip_address for view in ApartmentView.query} == {'1.1.1.1', '2.2.2.2', '3.3.3.3'}
+
+    stats = buffer.stats()
+    assert (stats['buffered'], stats['flushed'], stats['dropped'], stats['high_water']) == (0, 3, 1, 3)
+
+
+def test_unflushed_views_are_recovered_from_the_spool(app, make_apartment, make_buffer, tmp_path):
+    apartment = make_apartment()
+    spool = str(tmp_path / 'views.jsonl')
+    crashed = make_buffer(VIEW_SPOOL_PATH=spool)
+    crashed.push(apartment.id, ip_address='1.1.1.1')
+    crashed.push(apartment.id, ip_address='2.2.2.2')
+    crashed.discard(apartment.id)  # العملية "ماتت" قبل الـ flush
+
+    restarted = make_buffer(VIEW_SPOOL_PATH=spool)
+    assert restarted.recover() == 2
+    assert restarted.flush() == 2
+    assert ApartmentView.query.count() == 2
+    assert make_buffer(VIEW_SPOOL_PATH=spool).recover() == 0
+
+
+def test_spool_files_are_per_process_and_only_dead_ones_are_recovered(app, make_apartment, make_buffer, tmp_path, monkeypatch):
+    import os
+    import subprocess
+    import sys
+
+    apartment = make_apartment()
+    spool = str(tmp_path / 'views.jsonl')
+    pid = [os.getppid()]  # عملية حية غيرنا
+    monkeypatch.setattr('app.utils.view_buffer.os.getpid', lambda: pid[0])
+    live = make_buffer(VIEW_SPOOL_PATH=spool)
+    live.push(apartment.id, ip_address='1.1.1.1')
+
+    dead = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                          capture_output=True, text=True).stdout.strip()
+    pid[0] = int(dead)
+    crashed = make_buffer(VIEW_SPOOL_PATH=spool)
+    crashed.push(apartment.id, ip_address='2.2.2.2')
+    crashed.discard(apartment.id)
+
+    # عامل ثالث: الـ flush لا يلمس ملفات الآخرين، والاسترجاع يأخذ ملف الميت فقط
+    pid[0] = os.getpid() + 100000
+    worker = make_buffer(VIEW_SPOOL_PATH=spool)
+    worker.push(apartment.id, ip_address='3.3.3.3')
+    assert worker.flush() == 1
+    assert worker.recover() == 1
+    assert worker.flush() == 1
+    assert os.path.exists(f'{spool}.{os.getppid()}')
+    assert not os.path.exists(f'{spool}.{dead}')
+    assert sorted(view.ip_address for view in ApartmentView.query) == ['2.2.2.2', '3.3.3.3']
+
+
+def test_daily_rollups_follow_flushes_and_feed_dashboards(app, client, owner, login, make_apartment, make_buffer):
+    from datetime import datetime, timedelta
+
+    from app.models.apartment_view_daily import ApartmentViewDaily
+    from app.utils.view_rollups import rebuild_daily_views
+
+    apartment, other = make_apartment(), make_apartment()
+    today = datetime.utcnow().replace(hour=12)
+    yesterday = today - timedelta(days=1)
+    buffer = make_buffer()
+    for ip, when in (('1.1.1.1', yesterday), ('1.1.1.1', today), ('2.2.2.2', today)):
+        buffer.push(apartment.id, ip_address=ip, created_at=when)
+    buffer.flush()
+    # الدفعة الثانية: زائر رجع نفس اليوم وزائر جديد
+    buffer.push(apartment.id, ip_address='1.1.1.1', created_at=today)
+    buffer.push(apartment.id, user_id=owner.id, ip_address='1.1.1.1', created_at=today)
+    buffer.push(other.id, ip_address='3.3.3.3', created_at=today)
+    buffer.flush()
+
+    def rollups():
+        return {
+            (row.apartment_id, row.day): (row.total_views, row.unique_visitors)
+            for row in ApartmentViewDaily.query
+        }
+
+    expected = {
+        (apartment.id, yesterday.date()): (1, 1),
+        (apartment.id, today.date()): (4, 3),
+        (other.id, today.date()): (1, 1),
+    }
+    assert rollups() == expected
+    assert rebuild_daily_views() == 3
+    assert rollups() == expected
+
+    login(owner)
+    statements = []
+    db.event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    details = client.get('/api/views/owner/details').get_json()
+    assert [(row['views'], row['unique_visitors']) for row in details] == [(5, 3), (1, 1)]
+    my = client.get('/api/v1/apartments/my-apartments').get_json()
+    assert my['stats']['total_views'] == 6
+    assert not [sql for sql in statements if 'FROM apartment_views' in sql]
+
+    start = (today.date() - timedelta(days=2)).isoformat()
+    daily = client.get(f'/api/views/owner/daily?from={start}').get_json()
+    days = daily['apartments'][0]['days']
+    assert [(day['views'], day['unique_visitors']) for day in days] == [(0, 0), (1, 1), (4, 3)]
+    # 1.1.1.1 زار في اليومين: يُحسب مرة واحدة في الفترة
+    assert daily['apartments'][0]['views'] == 5
+    assert daily['apartments'][0]['unique_visitors'] == 3
+    assert client.get('/api/views/owner/daily?from=2026-01-01&to=2025-01-01').status_code == 400
+
+
+def test_hyperloglog_estimates_and_merges():
+    from app.utils.hyperloglog import HyperLogLog
+
+    first = HyperLogLog().update(f'ip{n}' for n in range(60000))
+    second = HyperLogLog().update(f'ip{n}' for n in range(40000, 100000))
+    assert abs(first.count() - 60000) / 60000 < 0.05
+    union = HyperLogLog.from_bytes(first.to_bytes()).merge(second)
+    assert abs(union.count() - 100000) / 100000 < 0.05
+    assert len(first.to_bytes()) < 2100
+    assert HyperLogLog().update(['a', 'b', 'a']).count() == 2
+    assert HyperLogLog.merged([None, HyperLogLog().update(['a']).to_bytes()]).count() == 1
+
+
+def test_compaction_folds_old_views_into_rollups_and_deletes_them(app, make_apartment, make_buffer, tmp_path):
+    import gzip
+    from datetime import datetime, timedelta
+
+    from app.models.apartment_view_daily import ApartmentViewCompaction, ApartmentViewDaily, ApartmentViewTotal
+    from app.utils.view_retention import compact_views
+    from app.utils.view_rollups import rebuild_daily_views
+
+    apartment = make_apartment()
+    now = datetime.utcnow()
+    old = [now - timedelta(days=100), now - timedelta(days=100), now - timedelta(days=99)]
+    # مشاهدات قديمة من قبل الملخصات، ومشاهدة حديثة عبر الـ buffer
+    db.session.add_all(
+        ApartmentView(apartment_id=apartment.id, ip_address=f'1.1.1.{n}', created_at=when)
+        for n, when in enumerate(old)
+    )
+    db.session.commit()
+    buffer = make_buffer()
+    buffer.push(apartment.id, ip_address='9.9.9.9', created_at=now)
+    buffer.flush()
+
+    preview = compact_views(retention_days=30, dry_run=True)
+    assert [day['deleted'] for day in preview['days']] == [2, 1]
+    assert ApartmentView.query.count() == 4
+
+    result = compact_views(retention_days=30, batch_size=1, archive_dir=str(tmp_path))
+    assert [(day['raw_views'], day['deleted']) for day in result['days']] == [(2, 2), (1, 1)]
+    assert [view.ip_address for view in ApartmentView.query] == ['9.9.9.9']
+    assert all(marker.finished_at for marker in ApartmentViewCompaction.query)
+    with gzip.open(tmp_path / f'apartment_views-{old[0].date().isoformat()}.jsonl.gz', 'rt') as f:
+        assert len(f.readlines()) == 2
+
+    def rollups():
+        daily = {row.day: (row.total_views, row.unique_visitors) for row in ApartmentViewDaily.query}
+        total = db.session.get(ApartmentViewTotal, apartment.id)
+        return daily, (total.total_views, total.unique_visitors)
+
+    expected = (
+        {old[0].date(): (2, 2), old[2].date(): (1, 1), now.date(): (1, 1)},
+        (4, 4),
+    )
+    assert rollups() == expected
+    # إعادة البناء من الخام لا تمسح الأيام التي حُذفت مشاهداتها
+    rebuild_daily_views()
+    assert rollups() == expected
+    assert compact_views(retention_days=30)['days'] == []
+
+
+def test_admin_delete_removes_views_and_rollups(app, client, make_apartment, make_buffer, admin_headers):
+    from sqlalchemy import text
+
+    from app.models.apartment_view_daily import ApartmentViewDaily, ApartmentViewTotal
+
+    apartment = make_apartment()
+    buffer = make_buffer()
+    buffer.push(apartment.id, ip_address='1.1.1.1')
+    buffer.flush()
+    # مثل MySQL: المفاتيح الأجنبية بدون cascade تمنع حذف الشقة
+    db.session.commit()
+    db.session.execute(text('PRAGMA foreign_keys=ON'))
+
+    response = client.delete(f'/api/v1/admin/apartments/{apartment.uuid}', headers=admin_headers)
+    assert response.status_code == 200
+    assert (ApartmentView.query.count(), ApartmentViewDaily.query.count(), ApartmentViewTotal.query.count()) == (0, 0, 0)